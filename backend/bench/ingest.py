@@ -0,0 +1,139 @@
+"""
+Offline throughput test of bulk ingestion.
+
+Generates a partner batch of applicants (VIN and manual vehicles, some with
+several vehicles, a share with a missing or invalid field), writes it as
+CSV or NDJSON and loads it with the same code path as `cli.py ingest`,
+against a scratch SQLite database with NHTSA replaced by a local fake.
+
+    python -m bench.ingest --rows 20000 --format csv
+    python -m bench.ingest --rows 20000 --nhtsa-latency lognormal:80:0.5 --concurrency 50
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import httpx
+
+from bench.load_test import FIRST_NAMES, LAST_NAMES, MAKES, Latency, fake_upstream_transport, make_vin
+
+
+def _vehicle(rng: random.Random, serial: int) -> Dict[str, Any]:
+    if rng.random() < 0.6:
+        vehicle = {"vin": make_vin(serial)}
+    else:
+        vehicle = {"year": rng.randint(2005, 2024), "make": rng.choice(MAKES).title(),
+                   "body_type": rng.choice(["Sedan", "SUV", "Truck"])}
+    vehicle["blind_spot_warning"] = rng.choice([True, False])
+    if rng.random() < 0.5:
+        vehicle.update(vehicle_use="commuting", days_per_week=rng.randint(1, 7), one_way_miles=rng.randint(2, 60))
+    else:
+        vehicle.update(vehicle_use=rng.choice(["business", "farming", "commercial"]),
+                       annual_mileage=rng.randint(5, 30) * 1000)
+    return vehicle
+
+
+def make_record(rng: random.Random, serial: int, bad_share: float) -> Dict[str, Any]:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    record = {
+        "zip_code": f"{rng.randint(10000, 99999)}",
+        "full_name": f"{first} {last}",
+        "email": f"{first}.{last}{serial}@example.com".lower(),
+        "vehicles": [_vehicle(rng, serial * 3 + i) for i in range(rng.choice([1, 1, 1, 2, 3]))],
+        "license_type": rng.choice(["personal", "commercial"]),
+        "license_status": rng.choice(["valid", "suspended"]),
+    }
+    if rng.random() < bad_share:
+        # Half invalid (rejected), half missing (inserted incomplete)
+        if rng.random() < 0.5:
+            record[rng.choice(["zip_code", "email"])] = "n/a"
+        else:
+            del record["license_status"]
+    return record
+
+
+def write_batch(path: str, fmt: str, records: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "ndjson":
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            return
+        from ingest import APPLICANT_COLUMN, APPLICANT_FIELDS, RECORD_VEHICLE_FIELDS
+
+        writer = csv.DictWriter(f, fieldnames=(APPLICANT_COLUMN,) + APPLICANT_FIELDS + RECORD_VEHICLE_FIELDS)
+        writer.writeheader()
+        for serial, record in enumerate(records):
+            applicant = {name: record.get(name) for name in APPLICANT_FIELDS}
+            for vehicle in record["vehicles"]:
+                writer.writerow(dict(applicant, applicant=f"A{serial}", **vehicle))
+
+
+async def run(args, path: str) -> Dict[str, Any]:
+    from database import SessionLocal, init_db
+    from ingest import ingest, read_records
+    from services import http_client
+
+    calls: Dict[str, int] = defaultdict(int)
+    transport = fake_upstream_transport(args.nhtsa_latency, Latency("0"), random.Random(args.seed), calls)
+    for name, upstream in http_client.UPSTREAMS.items():
+        http_client._clients[name] = httpx.AsyncClient(base_url=upstream["base_url"], transport=transport)
+
+    await init_db()
+    counts: Dict[str, int] = defaultdict(int)
+    started = time.perf_counter()
+    with open(path, encoding="utf-8", newline="") as source:
+        async with SessionLocal() as db:
+            async for result in ingest(read_records(source, args.format), db,
+                                       concurrency=args.concurrency, batch_size=args.batch_size):
+                counts[result["status"]] += 1
+    elapsed = time.perf_counter() - started
+    await http_client.close_clients()
+
+    rows = sum(counts.values())
+    return {
+        "rows": rows,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        "results": dict(counts),
+        "nhtsa_calls": calls["nhtsa"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="Applicants in the batch")
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="ndjson")
+    parser.add_argument("--bad-share", type=float, default=0.05, help="Share of applicants with a bad field")
+    parser.add_argument("--nhtsa-latency", type=Latency, default=Latency("0"), help="Fake NHTSA latency")
+    parser.add_argument("--concurrency", type=int, default=20, help="VIN decodes in flight")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per insert transaction")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Read by config.py at import, so set before the app modules are imported
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("OPENAI_API_KEY", "offline-bench")
+        os.environ["VIN_CACHE_DB_PATH"] = ""
+        os.environ["VPIC_SNAPSHOT_PATH"] = ""
+
+        rng = random.Random(args.seed)
+        path = os.path.join(tmp, f"batch.{args.format}")
+        write_batch(path, args.format, [make_record(rng, serial, args.bad_share) for serial in range(args.rows)])
+        result = asyncio.run(run(args, path))
+
+    print(json.dumps(result, indent=2))
+    if not result["rows"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
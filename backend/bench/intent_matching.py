@@ -0,0 +1,91 @@
+"""
+Accuracy and speed of keyword intent matching.
+
+Scores the compiled matchers in intents.py against the labeled messages in
+intent_labels.jsonl, next to the per-keyword substring scan they replaced,
+then times both on the same messages.
+
+    python -m bench.intent_matching --repeat 2000
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+from intents import DEFAULT_INTENTS, MATCHERS
+
+
+LABELS_PATH = os.path.join(os.path.dirname(__file__), "intent_labels.jsonl")
+
+# Label priority of the substring scan (affirmative answers were checked first)
+SUBSTRING_ORDER = {
+    "blind_spot_warning": ("yes", "no"),
+    "add_another_vehicle": ("yes", "no"),
+}
+
+
+def substring_first(intent, text):
+    """The previous matcher: `keyword in text` for each keyword in turn."""
+    labels = DEFAULT_INTENTS[intent]
+    lower = text.lower()
+    for label in SUBSTRING_ORDER.get(intent, tuple(labels)):
+        if any(keyword.rstrip("*") in lower for keyword in labels[label]):
+            return label
+    return None
+
+
+def compiled_first(intent, text):
+    return MATCHERS[intent].first(text)
+
+
+def load_labels(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(rows, match):
+    correct = defaultdict(int)
+    total = defaultdict(int)
+    misses = []
+    for row in rows:
+        total[row["set"]] += 1
+        got = match(row["set"], row["text"])
+        if got == row["label"]:
+            correct[row["set"]] += 1
+        else:
+            misses.append((row["set"], row["text"], row["label"], got))
+    return correct, total, misses
+
+
+def time_per_message(rows, match, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            match(row["set"], row["text"])
+    return (time.perf_counter() - start) / (repeat * len(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labels", default=LABELS_PATH, help="Labeled messages (JSON lines)")
+    parser.add_argument("--repeat", type=int, default=1000, help="Passes over the messages when timing")
+    parser.add_argument("--misses", action="store_true", help="List misclassified messages")
+    args = parser.parse_args()
+
+    rows = load_labels(args.labels)
+    print(f"{len(rows)} labeled messages\n")
+    print(f"{'matcher':<10} {'accuracy':>9} {'us/msg':>8}   per set")
+    for name, match in (("substring", substring_first), ("compiled", compiled_first)):
+        correct, total, misses = score(rows, match)
+        accuracy = sum(correct.values()) / len(rows)
+        per_set = ", ".join(f"{s} {correct[s]}/{total[s]}" for s in total)
+        elapsed = time_per_message(rows, match, args.repeat) * 1e6
+        print(f"{name:<10} {accuracy:>9.1%} {elapsed:>8.2f}   {per_set}")
+        if args.misses:
+            for intent, text, expected, got in misses:
+                print(f"    {intent}: {text!r} expected {expected}, got {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""
+Offline load test of full onboarding conversations.
+
+Replays scripted conversations (VIN and manual entry, several vehicles,
+frustrated users, multi-field answers) against the FastAPI app in process,
+through /api/conversation/start and /api/chat (or /api/chat/stream). OpenAI,
+NHTSA and ZenQuotes are replaced by local fakes with configurable latency,
+and the app runs on a scratch SQLite database, so nothing leaves the
+machine and no API is billed.
+
+    python -m bench.load_test --sessions 200 --concurrency 20 --json before.json
+    python -m bench.load_test --sessions 200 --concurrency 20 --compare before.json
+
+Latencies are given as "0", "fixed:MS", "uniform:LOW_MS:HIGH_MS" or
+"lognormal:MEDIAN_MS:SIGMA". Scripts, data and latencies come from one
+seeded generator, so runs with the same arguments replay the same load.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+
+# --- Latency distributions ----------------------------------------------------
+
+class Latency:
+    """A latency distribution, sampled in seconds."""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        try:
+            values = [float(p) / 1000 for p in params]
+            if kind in ("0", "none"):
+                self._sample = lambda rng: 0.0
+            elif kind == "fixed":
+                (ms,) = values
+                self._sample = lambda rng: ms
+            elif kind == "uniform":
+                low, high = values
+                self._sample = lambda rng: rng.uniform(low, high)
+            elif kind == "lognormal":
+                median, sigma = values[0], float(params[1])
+                self._sample = lambda rng: median * math.exp(rng.gauss(0, sigma))
+            else:
+                raise ValueError(kind)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid latency: {spec}") from None
+
+    def sample(self, rng: random.Random) -> float:
+        return self._sample(rng)
+
+    def __repr__(self) -> str:
+        return self.spec
+
+
+# --- Fake upstreams -----------------------------------------------------------
+
+MAKES = ("TOYOTA", "HONDA", "FORD", "CHEVROLET", "TESLA", "SUBARU", "MERCEDES-BENZ", "BMW")
+
+
+class FakeCompletions:
+    """Stands in for `AsyncOpenAI().chat.completions`."""
+
+    def __init__(self, latency: Latency, token_latency: Latency, rng: random.Random):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.rng = rng
+        self.calls = 0
+
+    async def create(self, messages, stream=False, response_format=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample(self.rng))
+        if response_format is not None:
+            text = "{}"
+        else:
+            text = "Thanks for that! Let's keep going with the next question, whenever you're ready."
+        if stream:
+            return self._stream(text)
+        usage = SimpleNamespace(prompt_tokens=sum(len(m["content"]) // 4 for m in messages), completion_tokens=len(text) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+    async def _stream(self, text):
+        for index, word in enumerate(text.split(" ")):
+            if index:
+                await asyncio.sleep(self.token_latency.sample(self.rng))
+            delta = SimpleNamespace(content=(" " if index else "") + word)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def fake_upstream_transport(nhtsa: Latency, zenquotes: Latency, rng: random.Random, counts: Dict[str, int]):
+    """One mock transport answering the NHTSA vPIC and ZenQuotes endpoints."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        upstream = "zenquotes" if request.url.host == "zenquotes.io" else "nhtsa"
+        counts[upstream] += 1
+        await asyncio.sleep((zenquotes if upstream == "zenquotes" else nhtsa).sample(rng))
+        if upstream == "zenquotes":
+            return httpx.Response(200, json=[{"q": f"Calm quote {i}.", "a": "Bench"} for i in range(50)])
+        if "/DecodeVinValues/" in path:
+            vin = path.rsplit("/", 1)[-1]
+            return httpx.Response(200, json={"Results": [{
+                "ErrorCode": "0", "Make": MAKES[sum(map(ord, vin)) % len(MAKES)],
+                "Model": "Bench", "ModelYear": "2003", "BodyClass": "Sedan/Saloon",
+            }]})
+        if "/GetAllMakes" in path:
+            return httpx.Response(200, json={"Results": [{"Make_Name": make} for make in MAKES]})
+        if "/GetMakesForVehicleType/" in path:
+            return httpx.Response(200, json={"Results": [{"MakeName": make} for make in MAKES]})
+        if "/GetModelsForMakeYear/" in path:
+            return httpx.Response(200, json={"Count": 5})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+# --- Scripted conversations ---------------------------------------------------
+
+FIRST_NAMES = ("Jane", "John", "Maria", "Wei", "Aisha", "Carlos", "Priya", "Tom")
+LAST_NAMES = ("Doe", "Smith", "Garcia", "Chen", "Khan", "Lopez", "Patel", "Brown")
+
+
+def make_vin(serial: int) -> str:
+    """A structurally valid North American VIN (correct check digit)."""
+    from services.vin import compute_check_digit
+
+    vin = f"1HGCM826X3A{serial % 1_000_000:06d}"
+    return vin[:8] + compute_check_digit(vin) + vin[9:]
+
+
+def _person(rng: random.Random, serial: int) -> List[str]:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return [f"{rng.randint(10000, 99999)}", f"{first} {last}", f"{first}.{last}{serial}@example.com".lower()]
+
+
+def _vin_vehicle(rng: random.Random, serial: int) -> List[str]:
+    return ["VIN", make_vin(serial), "commuting", rng.choice(["yes", "no"]), str(rng.randint(1, 7)), str(rng.randint(2, 60))]
+
+
+def _manual_vehicle(rng: random.Random, serial: int) -> List[str]:
+    return [
+        "manual", str(rng.randint(2005, 2024)), rng.choice(MAKES).title(), rng.choice(["Sedan", "SUV", "Truck"]),
+        rng.choice(["business", "farming", "commercial"]), rng.choice(["yes", "no"]), f"{rng.randint(5, 30) * 1000}",
+    ]
+
+
+def _license(rng: random.Random) -> List[str]:
+    return rng.choice([["personal", "valid"], ["commercial", "suspended"], ["foreign"]])
+
+
+def _script_vin(rng, serial):
+    return _person(rng, serial) + _vin_vehicle(rng, serial) + ["no"] + _license(rng)
+
+
+def _script_manual(rng, serial):
+    return _person(rng, serial) + _manual_vehicle(rng, serial) + ["no"] + _license(rng)
+
+
+def _script_multi_vehicle(rng, serial):
+    return (_person(rng, serial) + _vin_vehicle(rng, serial) + ["yes"]
+            + _manual_vehicle(rng, serial) + ["no"] + _license(rng))
+
+
+def _script_frustrated(rng, serial):
+    # An invalid answer, a question and a frustrated outburst: LLM and quote turns
+    zip_code, name, email = _person(rng, serial)
+    return (["1234", zip_code, name, "why do you need my email?", "This is ridiculous, I want a real person",
+             email] + _vin_vehicle(rng, serial) + ["no"] + _license(rng))
+
+
+def _script_multi_field(rng, serial):
+    # Several answers per message
+    zip_code, name, email = _person(rng, serial)
+    return [f"{zip_code}, my name is {name}, {email}", "manual",
+            f"{rng.randint(2005, 2024)}; {rng.choice(MAKES).title()}; SUV",
+            "commuting, blind spot: yes, 5 days, 12 miles", "no", "personal, valid"]
+
+
+SCRIPTS: Dict[str, Callable[[random.Random, int], List[str]]] = {
+    "vin": _script_vin,
+    "manual": _script_manual,
+    "multi_vehicle": _script_multi_vehicle,
+    "frustrated": _script_frustrated,
+    "multi_field": _script_multi_field,
+}
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """"vin=4,manual=3" -> weights per script."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCRIPTS:
+            raise argparse.ArgumentTypeError(f"Unknown script: {name} (choose from {', '.join(SCRIPTS)})")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+# --- Measurement --------------------------------------------------------------
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(_percentile(values, 50) * 1000, 3),
+        "p95_ms": round(_percentile(values, 95) * 1000, 3),
+        "p99_ms": round(_percentile(values, 99) * 1000, 3),
+    }
+
+
+class DatabaseTimer:
+    """Wall time spent in SQL statements and the number of commits."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.seconds = 0.0
+        self.statements = 0
+        self.commits = 0
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+        event.listen(sync_engine, "commit", self._commit)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("bench_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.seconds += time.perf_counter() - conn.info["bench_started"].pop()
+        self.statements += 1
+
+    def _commit(self, conn):
+        self.commits += 1
+
+    def reset(self):
+        self.seconds = 0.0
+        self.statements = 0
+        self.commits = 0
+
+
+class Recorder:
+    def __init__(self):
+        self.turns: Dict[str, List[float]] = defaultdict(list)
+        self.first_token: List[float] = []
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+        self.incomplete = 0
+
+
+async def _send(client: httpx.AsyncClient, session_id: str, message: str, stream: bool, recorder: Recorder) -> str:
+    """One chat turn. Returns the state after it."""
+    payload = {"session_id": session_id, "message": message}
+    if not stream:
+        response = await client.post("/api/chat", json=payload)
+        response.raise_for_status()
+        return response.json()["current_state"]
+
+    started = time.perf_counter()
+    done = None
+    event = None
+    async with client.stream("POST", "/api/chat/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "token" and started is not None:
+                    recorder.first_token.append(time.perf_counter() - started)
+                    started = None
+            elif line.startswith("data: ") and event == "done":
+                done = json.loads(line[6:])
+    return done["current_state"]
+
+
+async def run_conversation(client, script: List[str], stream: bool, recorder: Recorder):
+    start = time.perf_counter()
+    response = await client.post("/api/conversation/start")
+    response.raise_for_status()
+    recorder.turns["start"].append(time.perf_counter() - start)
+    body = response.json()
+    session_id, state = body["session_id"], body["current_state"]
+
+    for message in script:
+        start = time.perf_counter()
+        state_after = await _send(client, session_id, message, stream, recorder)
+        # Latency is keyed by the state the message answered
+        recorder.turns[state].append(time.perf_counter() - start)
+        state = state_after
+
+    if state == "complete":
+        recorder.completed += 1
+    else:
+        recorder.incomplete += 1
+
+
+def git_revision() -> Dict[str, Optional[str]]:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"sha": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def _configure_environment(args, tmp: str):
+    # Read by config.py at import, so set before the app is imported
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault("OPENAI_API_KEY", "offline-bench")
+    os.environ["SESSION_CACHE_ENABLED"] = "true" if args.session_cache else "false"
+    os.environ["SESSION_JOURNAL_PATH"] = os.path.join(tmp, "session_journal.jsonl")
+    os.environ["VIN_CACHE_DB_PATH"] = ""
+    os.environ["VPIC_SNAPSHOT_PATH"] = ""
+    os.environ["RESPONSE_POLICY_PATH"] = ""
+
+
+async def run(args) -> Dict:
+    import main as app_module
+    from database import engine
+    from services import http_client
+    from state_machine import STATES
+
+    rng = random.Random(args.seed)
+    upstream_calls: Dict[str, int] = defaultdict(int)
+    completions = FakeCompletions(args.openai_latency, args.token_latency, random.Random(rng.random()))
+    app_module.conversation_engine.openai_service.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=completions)
+    )
+    # Injected before the lifespan opens clients, so these are the ones used
+    transport = fake_upstream_transport(args.nhtsa_latency, args.zenquotes_latency, random.Random(rng.random()), upstream_calls)
+    for name, upstream in http_client.UPSTREAMS.items():
+        http_client._clients[name] = httpx.AsyncClient(base_url=upstream["base_url"], transport=transport)
+
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    plan = [rng.choices(names, weights)[0] for _ in range(args.warmup + args.sessions)]
+    scripts = [SCRIPTS[name](random.Random(rng.random()), serial) for serial, name in enumerate(plan)]
+
+    db_timer = DatabaseTimer(engine)
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(client, script, rec):
+        async with semaphore:
+            try:
+                await run_conversation(client, script, args.stream, rec)
+            except Exception as e:
+                rec.errors[type(e).__name__] += 1
+
+    async with app_module.lifespan(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            warmup = Recorder()
+            await asyncio.gather(*[one(client, script, warmup) for script in scripts[:args.warmup]])
+
+            db_timer.reset()
+            llm_calls = completions.calls
+            calls_before = dict(upstream_calls)
+            started = time.perf_counter()
+            await asyncio.gather(*[one(client, script, recorder) for script in scripts[args.warmup:]])
+            elapsed = time.perf_counter() - started
+
+    turns = sum(len(latencies) for latencies in recorder.turns.values())
+    all_latencies = [latency for latencies in recorder.turns.values() for latency in latencies]
+    return {
+        "git": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "args": {key: (repr(value) if isinstance(value, Latency) else value) for key, value in vars(args).items()
+                 if key not in ("json", "compare")},
+        "summary": {
+            "sessions": args.sessions,
+            "completed": recorder.completed,
+            "incomplete": recorder.incomplete,
+            "errors": dict(recorder.errors),
+            "turns": turns,
+            "elapsed_s": round(elapsed, 3),
+            "turns_per_sec": round(turns / elapsed, 1) if elapsed else 0.0,
+            "latency": _summary(all_latencies),
+            "first_token": _summary(recorder.first_token) if args.stream else None,
+            "db_ms_per_turn": round(db_timer.seconds / turns * 1000, 3) if turns else 0.0,
+            "db_share": round(db_timer.seconds / elapsed / args.concurrency, 4) if elapsed else 0.0,
+            "statements_per_turn": round(db_timer.statements / turns, 2) if turns else 0.0,
+            "commits_per_turn": round(db_timer.commits / turns, 2) if turns else 0.0,
+            "llm_calls": completions.calls - llm_calls,
+            "upstream_calls": {name: count - calls_before.get(name, 0) for name, count in upstream_calls.items()},
+        },
+        # In flow order
+        "states": {
+            state: _summary(recorder.turns[state]) for state in ["start", *STATES] if recorder.turns.get(state)
+        },
+    }
+
+
+def print_report(result: Dict, baseline: Optional[Dict] = None):
+    summary = result["summary"]
+    git = result["git"]
+    revision = (git["sha"] or "unknown")[:12] + (" (dirty)" if git["dirty"] else "")
+
+    def delta(value, old):
+        if old in (None, 0):
+            return ""
+        return f" ({(value - old) / old:+.1%})"
+
+    old_summary = baseline["summary"] if baseline else {}
+    old_states = baseline["states"] if baseline else {}
+    print(f"revision {revision}, {summary['sessions']} sessions, {summary['turns']} turns in {summary['elapsed_s']}s")
+    print(f"completed {summary['completed']}, incomplete {summary['incomplete']}, errors {summary['errors'] or 0}")
+    print(f"turns/s          {summary['turns_per_sec']:>10}{delta(summary['turns_per_sec'], old_summary.get('turns_per_sec'))}")
+    for pct in ("p50", "p95", "p99"):
+        value = summary["latency"][f"{pct}_ms"]
+        old = old_summary.get("latency", {}).get(f"{pct}_ms")
+        print(f"turn {pct:<11} {value:>10.1f}ms{delta(value, old)}")
+    if summary["first_token"]:
+        print(f"first token p95  {summary['first_token']['p95_ms']:>10.1f}ms")
+    print(f"db per turn      {summary['db_ms_per_turn']:>10.2f}ms{delta(summary['db_ms_per_turn'], old_summary.get('db_ms_per_turn'))}"
+          f"  ({summary['statements_per_turn']} statements, {summary['commits_per_turn']} commits)")
+    print(f"llm calls        {summary['llm_calls']:>10}   upstream calls {summary['upstream_calls']}")
+    print()
+    print(f"{'state':<22}{'turns':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for state, stats in result["states"].items():
+        old = old_states.get(state, {}).get("p95_ms")
+        print(f"{state:<22}{stats['count']:>7}{stats['p50_ms']:>8.1f}ms{stats['p95_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms"
+              f"{delta(stats['p95_ms'], old)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100, help="Measured conversations")
+    parser.add_argument("--concurrency", type=int, default=10, help="Conversations in flight at once")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured conversations run first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(",".join(SCRIPTS)),
+                        help=f"Script weights, e.g. vin=4,manual=2 (scripts: {', '.join(SCRIPTS)})")
+    parser.add_argument("--stream", action="store_true", help="Use /api/chat/stream instead of /api/chat")
+    parser.add_argument("--session-cache", action="store_true", help="Run with SESSION_CACHE_ENABLED")
+    parser.add_argument("--openai-latency", type=Latency, default=Latency("lognormal:600:0.4"))
+    parser.add_argument("--token-latency", type=Latency, default=Latency("fixed:15"), help="Between streamed tokens")
+    parser.add_argument("--nhtsa-latency", type=Latency, default=Latency("lognormal:250:0.5"))
+    parser.add_argument("--zenquotes-latency", type=Latency, default=Latency("lognormal:200:0.5"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to show changes against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_environment(args, tmp)
+        result = asyncio.run(run(args))
+
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nresults written to {args.json}")
+    if result["summary"]["errors"] or result["summary"]["incomplete"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
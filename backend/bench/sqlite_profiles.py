@@ -0,0 +1,120 @@
+"""
+Compare SQLite connection profiles under concurrent chat load.
+
+Each simulated session writes one transaction per turn (user message,
+assistant message, conversation update) while reader tasks run the admin
+conversation list query.
+
+    python -m bench.sqlite_profiles --sessions 20 --turns 15 --readers 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database import Base, SQLITE_PROFILES, install_sqlite_pragmas, sqlite_pragmas
+from models import Conversation, Message
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def _session(make_session, turns, latencies, errors):
+    async with make_session() as db:
+        conversation = Conversation(session_id=str(uuid.uuid4()), messages=[], vehicles=[])
+        db.add(conversation)
+        try:
+            await db.commit()
+        except Exception:
+            # "database is locked": the whole session is lost
+            errors.extend(range(turns))
+            return
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                conversation.messages.append(Message(role="user", content=f"answer {turn}"))
+                conversation.messages.append(Message(role="assistant", content=f"question {turn + 1}"))
+                conversation.current_state = f"state_{turn}"
+                await db.commit()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors.append(turn)
+                await db.rollback()
+
+
+async def _reader(make_session, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        async with make_session() as db:
+            await db.execute(
+                select(Conversation.id, func.count(Message.id))
+                .join(Message, isouter=True)
+                .group_by(Conversation.id)
+                .order_by(Conversation.id.desc())
+                .limit(50)
+            )
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+
+
+async def run_profile(profile, sessions, turns, readers):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        install_sqlite_pragmas(engine, sqlite_pragmas(profile))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        make_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        write_latencies, read_latencies, errors = [], [], []
+        stop = asyncio.Event()
+        reader_tasks = [asyncio.create_task(_reader(make_session, stop, read_latencies)) for _ in range(readers)]
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _session(make_session, turns, write_latencies, errors) for _ in range(sessions)
+        ])
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await asyncio.gather(*reader_tasks)
+        await engine.dispose()
+
+    return {
+        "profile": profile,
+        "turns_per_sec": len(write_latencies) / elapsed,
+        "write_p50_ms": statistics.median(write_latencies) * 1000 if write_latencies else 0.0,
+        "write_p95_ms": _percentile(write_latencies, 95) * 1000,
+        "read_p95_ms": _percentile(read_latencies, 95) * 1000,
+        "reads": len(read_latencies),
+        "errors": len(errors),
+    }
+
+
+async def main(args):
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.readers} readers\n")
+    print(f"{'profile':<12}{'turns/s':>10}{'write p50':>12}{'write p95':>12}{'read p95':>12}{'reads':>8}{'errors':>8}")
+    for profile in args.profiles:
+        r = await run_profile(profile, args.sessions, args.turns, args.readers)
+        print(
+            f"{r['profile']:<12}{r['turns_per_sec']:>10.0f}{r['write_p50_ms']:>10.1f}ms"
+            f"{r['write_p95_ms']:>10.1f}ms{r['read_p95_ms']:>10.1f}ms{r['reads']:>8}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=15)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES))
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,203 @@
+"""
+WebSocket chat transport: one connection per session for many turns.
+
+The socket keeps one database session for its whole life, and the
+conversation is re-read through `refresh` at the start of each turn. That
+re-read is a memory lookup when the session cache is on. Frames are JSON
+objects with a "type":
+
+    client -> server   {"type": "message", "message": "..."}
+                       {"type": "ping"}          answered with a pong
+                       {"type": "pong"}          answer to a server ping
+    server -> client   {"type": "ready", "session_id", "current_state", "is_complete"}
+                       {"type": "typing"}        a turn has started
+                       {"type": "token", "text"}
+                       {"type": "done", "session_id", "response", "current_state", "is_complete"}
+                       {"type": "ping"}          heartbeat; answer with a pong
+                       {"type": "error", "detail"}
+
+Turns run one at a time in the order received. Up to `max_pending`
+messages wait behind the running turn; more are refused with an error
+rather than buffered without bound. Replies are sent frame by frame, each
+send waiting for the socket to drain, so a slow reader slows the token
+stream instead of growing a buffer; a client that accepts nothing for
+`send_timeout` seconds is disconnected. So is a client that sends nothing,
+pongs included, for `idle_timeout` seconds. A turn that is running when
+the client goes away still completes and is committed.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from fastapi import WebSocket
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from models import Conversation
+from services.session_cache import SessionState
+
+
+Session = Union[Conversation, SessionState]
+
+# Close codes (4000-4999 are for applications)
+CLOSE_NOT_FOUND = 4404
+CLOSE_IDLE = 4408
+CLOSE_STALLED = 1013  # try again later
+
+
+class ChatSocket:
+    """One open WebSocket chat connection, bound to a session."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        engine,
+        db: AsyncSession,
+        conversation: Session,
+        refresh: Optional[Callable[[], Awaitable[Optional[Session]]]] = None,
+        heartbeat_interval: float = config.WS_HEARTBEAT_INTERVAL,
+        idle_timeout: float = config.WS_IDLE_TIMEOUT,
+        send_timeout: float = config.WS_SEND_TIMEOUT,
+        max_pending: int = config.WS_MAX_PENDING
+    ):
+        self.websocket = websocket
+        self.engine = engine
+        self.db = db
+        self.conversation = conversation
+        # Re-resolves the session before each turn (None if it no longer exists)
+        self.refresh = refresh
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.pending: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_pending)
+        self.busy = False
+        self.last_seen = time.monotonic()
+        self.close_code: Optional[int] = None
+        self._closed = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def _close(self, code: int):
+        if not self.closed:
+            self.close_code = code
+            self._closed.set()
+
+    async def send(self, event: Dict[str, Any]):
+        """Send one frame, waiting for the socket to drain. No-op once closed."""
+        if self.closed:
+            return
+        async with self._send_lock:
+            try:
+                await asyncio.wait_for(self.websocket.send_text(json.dumps(event)), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._close(CLOSE_STALLED)
+            except Exception:
+                # Disconnected
+                self._close(1000)
+
+    def _state(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.conversation.session_id,
+            "current_state": self.conversation.current_state,
+            "is_complete": self.conversation.current_state == "complete",
+        }
+
+    async def run(self):
+        """Serve the connection until the client leaves or is dropped."""
+        await self.send(dict(type="ready", **self._state()))
+        receiver = asyncio.create_task(self._receive())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        worker = asyncio.create_task(self._work())
+        await self._closed.wait()
+
+        receiver.cancel()
+        heartbeat.cancel()
+        # A turn in progress still commits; it just can't reply any more
+        if not self.busy:
+            worker.cancel()
+        await asyncio.gather(receiver, heartbeat, worker, return_exceptions=True)
+
+        if self.close_code != 1000:
+            try:
+                await asyncio.wait_for(self.websocket.close(code=self.close_code), self.send_timeout)
+            except Exception:
+                pass
+
+    async def _receive(self):
+        while True:
+            try:
+                message = await self.websocket.receive()
+            except Exception:
+                # Disconnected without a disconnect message
+                self._close(1000)
+                return
+            if message["type"] == "websocket.disconnect":
+                self._close(1000)
+                return
+            self.last_seen = time.monotonic()
+            try:
+                frame = json.loads(message.get("text") or message.get("bytes") or "")
+                kind = frame["type"]
+            except (ValueError, TypeError, KeyError):
+                await self.send({"type": "error", "detail": "Frames must be JSON objects with a type"})
+                continue
+
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "message":
+                text = frame.get("message")
+                if not isinstance(text, str) or not text.strip():
+                    await self.send({"type": "error", "detail": "Message must be a non-empty string"})
+                    continue
+                try:
+                    self.pending.put_nowait(text)
+                except asyncio.QueueFull:
+                    await self.send({"type": "error", "detail": "Too many messages waiting; wait for the reply"})
+            elif kind != "pong":
+                await self.send({"type": "error", "detail": f"Unknown frame type: {kind}"})
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if time.monotonic() - self.last_seen > self.idle_timeout:
+                self._close(CLOSE_IDLE)
+                return
+            await self.send({"type": "ping"})
+
+    async def _work(self):
+        while not self.closed:
+            message = await self.pending.get()
+            self.busy = True
+            try:
+                await self._turn(message)
+            finally:
+                self.busy = False
+
+    async def _turn(self, message: str):
+        await self.send({"type": "typing"})
+        chunks = []
+        try:
+            if self.refresh is not None:
+                conversation = await self.refresh()
+                if conversation is None:
+                    await self.send({"type": "error", "detail": "Conversation not found"})
+                    self._close(CLOSE_NOT_FOUND)
+                    return
+                self.conversation = conversation
+
+            async for chunk in self.engine.stream_message(
+                conversation=self.conversation,
+                user_message=message,
+                db=self.db
+            ):
+                chunks.append(chunk)
+                await self.send({"type": "token", "text": chunk})
+        except Exception:
+            # Rolled back by the engine; the next turn starts from a fresh read
+            await self.send({"type": "error", "detail": "Failed to process message"})
+            return
+        await self.send(dict(type="done", response="".join(chunks).strip(), **self._state()))
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import config
+
+
+def import_vpic(args):
+    """Build the offline vPIC snapshot from dump files."""
+    from services.vpic_snapshot import build_snapshot
+
+    path = args.output or config.VPIC_SNAPSHOT_PATH
+    if not path:
+        sys.exit("No output path: pass --output or set VPIC_SNAPSHOT_PATH.")
+
+    counts = build_snapshot(
+        path,
+        wmi_files=args.wmi,
+        make_files=args.makes,
+        pattern_files=args.patterns
+    )
+    print(f"Wrote {path}: {counts['wmi']} WMIs, {counts['makes']} makes, {counts['patterns']} patterns")
+
+
+def check_query_plans(args):
+    """Fail if a hot query's plan falls back to a table scan or a temp sort."""
+    from query_plans import check_query_plans as run_checks
+
+    failed = False
+    for report in run_checks():
+        status = "FAIL" if report["problems"] else "ok"
+        print(f"[{status}] {report['query']}: {report['sql'][:80]}")
+        if args.verbose or report["problems"]:
+            for detail in report["plan"]:
+                print(f"         {detail}")
+        for problem in report["problems"]:
+            print(f"         -> {problem}")
+        failed = failed or bool(report["problems"])
+    if failed:
+        sys.exit(1)
+
+
+async def _ingest(args) -> dict:
+    from database import SessionLocal, init_db
+    from ingest import ingest, read_records
+    from services.http_client import close_clients, open_clients
+    from services.vin_cache import vin_cache
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    counts = {"complete": 0, "incomplete": 0, "failed": 0}
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+
+    await init_db()
+    await open_clients()
+    await vin_cache.open()
+    try:
+        async with SessionLocal() as db:
+            async for result in ingest(read_records(source, fmt), db, concurrency=args.concurrency,
+                                       batch_size=args.batch_size):
+                counts[result["status"]] += 1
+                if report:
+                    report.write(json.dumps(result) + "\n")
+                elif result["status"] == "failed":
+                    field = f"{result['field']}: " if result["field"] else ""
+                    print(f"row {result['row']}: {field}{result['error']}", file=sys.stderr)
+    finally:
+        await vin_cache.close()
+        await close_clients()
+        if source is not sys.stdin:
+            source.close()
+        if report:
+            report.close()
+    return counts
+
+
+def ingest_applicants(args):
+    """Bulk-load pre-filled applicants through the onboarding validators."""
+    started = time.perf_counter()
+    try:
+        counts = asyncio.run(_ingest(args))
+    except (OSError, ValueError) as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    print(f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f}/s): {counts['complete']} complete, "
+          f"{counts['incomplete']} incomplete, {counts['failed']} failed")
+    if counts["failed"]:
+        sys.exit(1)
+
+
+async def _export(args, since):
+    from database import SessionLocal
+    from export import ApplicationExport
+
+    async with SessionLocal() as db:
+        export = ApplicationExport(db, since=since, batch_size=args.batch_size)
+        if args.format == "parquet":
+            await export.write_parquet(args.output)
+            return export
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+        try:
+            async for chunk in export.text_chunks(args.format):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return export
+
+
+def export_applications(args):
+    """Export completed applications, optionally since a stored watermark."""
+    from datetime import datetime
+
+    if not args.format:
+        extension = args.output.rsplit(".", 1)[-1].lower()
+        args.format = extension if extension in ("csv", "parquet") else "ndjson"
+    if args.format == "parquet" and args.output == "-":
+        sys.exit("Parquet needs an output file: pass --output.")
+
+    since = args.since
+    if since is None and args.watermark_file:
+        try:
+            with open(args.watermark_file, encoding="utf-8") as f:
+                since = f.read().strip() or None
+        except FileNotFoundError:
+            pass
+    try:
+        since = datetime.fromisoformat(since) if since else None
+        export = asyncio.run(_export(args, since))
+    except (OSError, RuntimeError, ValueError) as e:
+        sys.exit(str(e))
+
+    watermark = export.watermark.isoformat() if export.watermark else None
+    # Only moved forward once the export is written, so a failed run is repeated
+    if args.watermark_file and watermark:
+        with open(args.watermark_file, "w", encoding="utf-8") as f:
+            f.write(watermark + "\n")
+    print(f"Exported {export.count} applications (watermark: {watermark or 'none'})", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Insurance Onboarding Chatbot management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    vpic = subparsers.add_parser("import-vpic", help="Build the offline vPIC snapshot from dump files")
+    vpic.add_argument("--output", help="Snapshot path (default: VPIC_SNAPSHOT_PATH)")
+    vpic.add_argument("--wmi", action="append", default=[], help="WMI dump file (CSV or JSON)")
+    vpic.add_argument("--makes", action="append", default=[], help="Make list dump file (CSV or JSON)")
+    vpic.add_argument("--patterns", action="append", default=[], help="VIN pattern dump file (CSV or JSON)")
+    vpic.set_defaults(func=import_vpic)
+
+    plans = subparsers.add_parser("check-query-plans", help="Check hot queries use indexes (exits 1 on a table scan)")
+    plans.add_argument("--verbose", action="store_true", help="Print every query plan")
+    plans.set_defaults(func=check_query_plans)
+
+    ingest = subparsers.add_parser("ingest", help="Bulk-load pre-filled applicants (exits 1 if any row fails)")
+    ingest.add_argument("path", help="CSV or NDJSON file ('-' for stdin)")
+    ingest.add_argument("--format", choices=("csv", "ndjson"), help="Input format (default: from the file extension)")
+    ingest.add_argument("--concurrency", type=int, default=config.INGEST_VIN_CONCURRENCY,
+                        help="VIN decodes in flight (default: INGEST_VIN_CONCURRENCY)")
+    ingest.add_argument("--batch-size", type=int, default=config.INGEST_BATCH_SIZE,
+                        help="Records per insert transaction (default: INGEST_BATCH_SIZE)")
+    ingest.add_argument("--report", help="Write every row's result here as NDJSON (default: failed rows to stderr)")
+    ingest.set_defaults(func=ingest_applicants)
+
+    export = subparsers.add_parser("export", help="Export completed applications (NDJSON, CSV or Parquet)")
+    export.add_argument("--output", default="-", help="Output file (default: stdout)")
+    export.add_argument("--format", choices=("ndjson", "csv", "parquet"),
+                        help="Output format (default: from the file extension, else NDJSON)")
+    export.add_argument("--since", help="Only applications updated after this ISO timestamp")
+    export.add_argument("--watermark-file",
+                        help="Read --since from this file and store the new watermark in it after the export")
+    export.add_argument("--batch-size", type=int, default=config.EXPORT_BATCH_SIZE,
+                        help="Rows per database fetch (default: EXPORT_BATCH_SIZE)")
+    export.set_defaults(func=export_applications)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
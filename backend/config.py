@@ -0,0 +1,131 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    try:
+        return int(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    try:
+        return float(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Database (sqlite:/// and postgresql:// URLs are mapped to aiosqlite/asyncpg)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./chatbot.db")
+
+# SQLite connection profile ("production" or "default") and per-PRAGMA overrides
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_PRAGMAS = os.getenv("SQLITE_PRAGMAS", "")
+SQLITE_MAINTENANCE_INTERVAL = _env_float("SQLITE_MAINTENANCE_INTERVAL", 15 * 60)
+
+# /api/conversations page size (default and maximum)
+CONVERSATIONS_PAGE_SIZE = _env_int("CONVERSATIONS_PAGE_SIZE", 50)
+CONVERSATIONS_MAX_PAGE_SIZE = _env_int("CONVERSATIONS_MAX_PAGE_SIZE", 200)
+
+# Chat history sent to the LLM: the last HISTORY_WINDOW messages, trimmed
+# oldest-first to HISTORY_TOKEN_BUDGET estimated tokens (0 = no budget)
+HISTORY_WINDOW = _env_int("HISTORY_WINDOW", 10)
+HISTORY_TOKEN_BUDGET = _env_int("HISTORY_TOKEN_BUDGET", 0)
+
+# ZenQuotes quote pool: refilled in the background when it drops to the low
+# water mark, at most once per QUOTE_FETCH_MIN_INTERVAL seconds (ZenQuotes
+# allows about 5 requests per 30 seconds)
+QUOTE_POOL_SIZE = _env_int("QUOTE_POOL_SIZE", 100)
+QUOTE_POOL_LOW_WATER = _env_int("QUOTE_POOL_LOW_WATER", 10)
+QUOTE_FETCH_MIN_INTERVAL = _env_float("QUOTE_FETCH_MIN_INTERVAL", 30.0)
+
+# Resident session state with write-behind persistence (opt-in). Committed
+# turns are appended to the journal before they are acknowledged and
+# written to the database in batches by a background task.
+SESSION_CACHE_ENABLED = _env_bool("SESSION_CACHE_ENABLED", False)
+SESSION_CACHE_IDLE_TTL = _env_float("SESSION_CACHE_IDLE_TTL", 15 * 60)
+SESSION_JOURNAL_PATH = os.getenv("SESSION_JOURNAL_PATH", "./session_journal.jsonl")  # empty = memory only
+SESSION_JOURNAL_FSYNC = _env_bool("SESSION_JOURNAL_FSYNC", True)
+SESSION_WRITE_BEHIND_DELAY = _env_float("SESSION_WRITE_BEHIND_DELAY", 0.5)
+SESSION_WRITE_BEHIND_BATCH = _env_int("SESSION_WRITE_BEHIND_BATCH", 500)
+# A turn that fails this many times on its own is set aside in the rejected file
+SESSION_WRITE_MAX_ATTEMPTS = _env_int("SESSION_WRITE_MAX_ATTEMPTS", 5)
+SESSION_REJECTED_PATH = os.getenv("SESSION_REJECTED_PATH", "./session_rejected.jsonl")  # empty = not kept
+
+# Bulk ingestion (POST /api/ingest, `cli.py ingest`): VIN decodes in flight
+# and records per insert transaction
+INGEST_VIN_CONCURRENCY = _env_int("INGEST_VIN_CONCURRENCY", 20)
+INGEST_BATCH_SIZE = _env_int("INGEST_BATCH_SIZE", 1000)
+
+# Export of completed applications (GET /api/export, `cli.py export`):
+# rows fetched per server-side cursor batch
+EXPORT_BATCH_SIZE = _env_int("EXPORT_BATCH_SIZE", 1000)
+# An incremental export re-reads this many seconds before its watermark, so
+# rows committed late (write-behind) or sharing the watermark's timestamp are
+# not missed; the re-read applications are exported again
+EXPORT_WATERMARK_OVERLAP = _env_float("EXPORT_WATERMARK_OVERLAP", 300.0)
+
+# WebSocket chat (/ws/chat/{session_id}): server ping interval, seconds
+# without any frame from the client before it is dropped, seconds a send
+# may wait on a client that isn't reading, and messages queued per
+# connection behind the running turn
+WS_HEARTBEAT_INTERVAL = _env_float("WS_HEARTBEAT_INTERVAL", 20.0)
+WS_IDLE_TIMEOUT = _env_float("WS_IDLE_TIMEOUT", 60.0)
+WS_SEND_TIMEOUT = _env_float("WS_SEND_TIMEOUT", 10.0)
+WS_MAX_PENDING = _env_int("WS_MAX_PENDING", 4)
+
+# Outbound HTTP connection pools (one app-lifetime client per upstream)
+HTTP_MAX_CONNECTIONS = _env_int("HTTP_MAX_CONNECTIONS", 20)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = _env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10)
+HTTP_KEEPALIVE_EXPIRY = _env_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+HTTP2_ENABLED = _env_bool("HTTP2_ENABLED", True)
+
+# NHTSA make catalog refresh interval (seconds)
+MAKE_CATALOG_TTL = _env_float("MAKE_CATALOG_TTL", 24 * 60 * 60)
+# Max seconds a turn waits to learn whether a make has models in a year
+MAKE_YEAR_LOOKUP_TIMEOUT = _env_float("MAKE_YEAR_LOOKUP_TIMEOUT", 3.0)
+
+# VIN decode result cache
+VIN_CACHE_SIZE = _env_int("VIN_CACHE_SIZE", 10000)
+VIN_CACHE_TTL = _env_float("VIN_CACHE_TTL", 30 * 24 * 60 * 60)
+VIN_CACHE_NEGATIVE_TTL = _env_float("VIN_CACHE_NEGATIVE_TTL", 60 * 60)
+VIN_CACHE_DB_PATH = os.getenv("VIN_CACHE_DB_PATH", "")  # e.g. ./vin_cache.db; empty = memory only
+
+# Offline vPIC snapshot (built with `python cli.py import-vpic`); empty = live API only
+VPIC_SNAPSHOT_PATH = os.getenv("VPIC_SNAPSHOT_PATH", "")
+VPIC_SNAPSHOT_MMAP_SIZE = _env_int("VPIC_SNAPSHOT_MMAP_SIZE", 256 * 1024 * 1024)
+
+# Response policy overrides (JSON with "rules" and "templates"); empty = built-in defaults
+RESPONSE_POLICY_PATH = os.getenv("RESPONSE_POLICY_PATH", "")
+
+# Keyword overrides for frustration and answer intents (JSON,
+# {"<set>": {"<label>": [keywords]}}); empty = built-in keywords
+INTENT_KEYWORDS_PATH = os.getenv("INTENT_KEYWORDS_PATH", "")
+
+# Ask the LLM for the fields of a multi-field message that the local
+# extractors could not place (one extra completion on those turns only)
+LLM_FIELD_EXTRACTION = _env_bool("LLM_FIELD_EXTRACTION", False)
+
+# Generated-reply cache: size and the states that opt in ("*" = all)
+RESPONSE_CACHE_SIZE = _env_int("RESPONSE_CACHE_SIZE", 2000)
+RESPONSE_CACHE_STATES = frozenset(
+    state.strip()
+    for state in os.getenv(
+        "RESPONSE_CACHE_STATES",
+        "zip_code,email,vehicle_choice,vehicle_vin,vehicle_year,vehicle_use,blind_spot_warning,"
+        "commute_days,commute_miles,annual_mileage,add_another_vehicle,license_type,license_status"
+    ).split(",")
+    if state.strip()
+)
@@ -1,11 +1,51 @@
-import re
-from typing import Dict, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Conversation, Message, Vehicle, ConversationState
+import config
+from models import Conversation, Message, Vehicle
 from services.openai_service import OpenAIService
 from services.nhtsa import NHTSAService
 from services.zenquotes import ZenQuotesService
+from services.response_policy import ResponsePolicy
+from services.history import HistoryProvider
+from services.session_cache import CachedTurn, SessionState, session_cache
+from services.metrics import TurnTimer
+from state_machine import NO_MATCH, STATES, current_vehicle, split_fields
+
+
+class _DatabaseTurn:
+    """
+    One chat turn staged on the request's session and committed in a single
+    transaction, or rolled back together on failure.
+    """
+    
+    def __init__(self, conversation: Conversation, db: AsyncSession, history: HistoryProvider):
+        self.conversation = conversation
+        self.db = db
+        self.history_provider = history
+    
+    async def __aenter__(self) -> "_DatabaseTurn":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            await self.db.rollback()
+            return
+        try:
+            await self.db.commit()
+        except BaseException:
+            await self.db.rollback()
+            raise
+    
+    def add_message(self, role: str, content: str):
+        # Added through the session so the transcript is never loaded
+        self.db.add(Message(conversation=self.conversation, role=role, content=content))
+    
+    async def history(self) -> List[Dict[str, str]]:
+        # Prior turns only: this turn's message is staged but not yet flushed
+        return await self.history_provider.recent(self.db, self.conversation.id)
 
 
 class ConversationEngine:
@@ -15,6 +55,11 @@ class ConversationEngine:
         self.openai_service = OpenAIService()
         self.nhtsa_service = NHTSAService()
         self.zenquotes_service = ZenQuotesService()
+        self.response_policy = ResponsePolicy.from_config()
+        self.history = HistoryProvider()
+        self.multi_field_turns = 0
+        self.fields_prefilled = 0
+        self.llm_extractions = 0
     
     def _get_context(self, conversation: Conversation) -> Dict[str, Any]:
         """Get current context from conversation."""
@@ -28,427 +73,330 @@ class ConversationEngine:
         }
         return {k: v for k, v in context.items() if v is not None}
     
+    def _get_template_params(self, conversation: Conversation) -> Dict[str, Any]:
+        """Values available to response templates."""
+        params = self._get_context(conversation)
+        if conversation.full_name:
+            params["first_name"] = conversation.full_name.split()[0].title()
+        vehicle = self._get_current_vehicle(conversation)
+        if vehicle:
+            params.update({
+                "year": vehicle.year,
+                "make": vehicle.make,
+                "body_type": vehicle.body_type,
+                "vehicle_use": vehicle.vehicle_use
+            })
+        return {k: v for k, v in params.items() if v is not None}
+    
     def _get_current_vehicle(self, conversation: Conversation) -> Optional[Vehicle]:
         """Get the current vehicle being configured."""
-        if conversation.vehicles:
-            return conversation.vehicles[-1]
-        return None
+        return current_vehicle(conversation)
     
     async def _validate_and_extract(
         self, 
         state: str, 
         user_input: str,
-        conversation: Conversation
+        conversation: Union[Conversation, SessionState]
     ) -> Tuple[bool, Any, Optional[str]]:
         """
         Validate user input for current state.
         Returns: (is_valid, extracted_value, error_message)
         """
-        user_input = user_input.strip()
-        
-        if state == ConversationState.ZIP_CODE.value:
-            # Extract 5-digit zip code
-            match = re.search(r'\b(\d{5})\b', user_input)
-            if match:
-                return True, match.group(1), None
-            return False, None, "Please provide a valid 5-digit ZIP code."
-        
-        elif state == ConversationState.FULL_NAME.value:
-            # Accept any non-empty string with at least 2 characters
-            if len(user_input) >= 2:
-                return True, user_input, None
-            return False, None, "Please provide your full name."
-        
-        elif state == ConversationState.EMAIL.value:
-            # Basic email validation
-            email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-            match = re.search(email_pattern, user_input)
-            if match:
-                return True, match.group(0).lower(), None
-            return False, None, "Please provide a valid email address."
-        
-        elif state == ConversationState.VEHICLE_CHOICE.value:
-            lower = user_input.lower()
-            # Check if user provided a VIN directly (17 alphanumeric characters)
-            vin_match = re.search(r'\b([A-HJ-NPR-Z0-9]{17})\b', user_input.upper())
-            if vin_match:
-                # User provided VIN directly, validate it immediately
-                vin = vin_match.group(1)
-                result = await self.nhtsa_service.decode_vin(vin)
-                if result.get('valid'):
-                    result['vin'] = vin
-                    return True, {'choice': 'vin', 'vin_data': result}, None
-                return False, None, result.get('error', 'Invalid VIN.')
-            elif 'vin' in lower:
-                return True, 'vin', None
-            elif any(word in lower for word in ['year', 'make', 'manual', 'type', 'other']):
-                return True, 'manual', None
-            return False, None, None  # Will re-ask
-        
-        elif state == ConversationState.VEHICLE_VIN.value:
-            # VIN is 17 characters
-            vin_match = re.search(r'\b([A-HJ-NPR-Z0-9]{17})\b', user_input.upper())
-            if vin_match:
-                vin = vin_match.group(1)
-                # Validate with NHTSA
-                result = await self.nhtsa_service.decode_vin(vin)
-                if result.get('valid'):
-                    result['vin'] = vin  # Include the VIN in the result
-                    return True, result, None
-                return False, None, result.get('error', 'Invalid VIN.')
-            return False, None, "Please provide a valid 17-character VIN."
-        
-        elif state == ConversationState.VEHICLE_YEAR.value:
-            match = re.search(r'\b(19\d{2}|20\d{2})\b', user_input)
-            if match:
-                year = int(match.group(1))
-                if 1900 <= year <= 2026:
-                    return True, year, None
-            return False, None, "Please provide a valid vehicle year (e.g., 2020)."
-        
-        elif state == ConversationState.VEHICLE_MAKE.value:
-            if len(user_input) >= 2:
-                # Validate with NHTSA
-                vehicle = self._get_current_vehicle(conversation)
-                year = vehicle.year if vehicle else 2020
-                result = await self.nhtsa_service.validate_year_make(year, user_input)
-                if result.get('valid'):
-                    return True, user_input.title(), None
-                return False, None, result.get('error', 'Invalid make.')
-            return False, None, "Please provide the vehicle make."
-        
-        elif state == ConversationState.VEHICLE_BODY.value:
-            valid_bodies = ['sedan', 'suv', 'truck', 'coupe', 'hatchback', 'van', 
-                          'wagon', 'convertible', 'minivan', 'pickup']
-            lower = user_input.lower()
-            for body in valid_bodies:
-                if body in lower:
-                    return True, body.title(), None
-            # Accept any reasonable input
-            if len(user_input) >= 2:
-                return True, user_input.title(), None
-            return False, None, "Please provide the body type (e.g., Sedan, SUV, Truck)."
-        
-        elif state == ConversationState.VEHICLE_USE.value:
-            lower = user_input.lower()
-            if 'commut' in lower:
-                return True, 'commuting', None
-            elif 'commercial' in lower:
-                return True, 'commercial', None
-            elif 'farm' in lower:
-                return True, 'farming', None
-            elif 'business' in lower:
-                return True, 'business', None
-            return False, None, "Please specify: Commuting, Commercial, Farming, or Business."
-        
-        elif state == ConversationState.BLIND_SPOT_WARNING.value:
-            lower = user_input.lower()
-            if any(word in lower for word in ['yes', 'yeah', 'yep', 'have', 'equipped', 'does']):
-                return True, True, None
-            elif any(word in lower for word in ['no', 'nope', 'not', "don't", "doesn't"]):
-                return True, False, None
-            return False, None, "Please answer Yes or No."
-        
-        elif state == ConversationState.COMMUTE_DAYS.value:
-            match = re.search(r'\b([1-7])\b', user_input)
-            if match:
-                return True, int(match.group(1)), None
-            return False, None, "Please provide days per week (1-7)."
-        
-        elif state == ConversationState.COMMUTE_MILES.value:
-            match = re.search(r'\b(\d+)\b', user_input)
-            if match:
-                miles = int(match.group(1))
-                if miles > 0:
-                    return True, miles, None
-            return False, None, "Please provide the one-way distance in miles."
-        
-        elif state == ConversationState.ANNUAL_MILEAGE.value:
-            match = re.search(r'\b(\d+)\b', user_input.replace(',', ''))
-            if match:
-                mileage = int(match.group(1))
-                if mileage > 0:
-                    return True, mileage, None
-            return False, None, "Please provide estimated annual mileage."
-        
-        elif state == ConversationState.ADD_ANOTHER_VEHICLE.value:
-            lower = user_input.lower()
-            if any(word in lower for word in ['yes', 'yeah', 'yep', 'another', 'add', 'more']):
-                return True, True, None
-            elif any(word in lower for word in ['no', 'nope', 'done', "that's all", "that's it"]):
-                return True, False, None
-            return False, None, "Would you like to add another vehicle? (Yes/No)"
-        
-        elif state == ConversationState.LICENSE_TYPE.value:
-            lower = user_input.lower()
-            if 'foreign' in lower:
-                return True, 'foreign', None
-            elif 'personal' in lower:
-                return True, 'personal', None
-            elif 'commercial' in lower or 'cdl' in lower:
-                return True, 'commercial', None
-            return False, None, "Please specify: Foreign, Personal, or Commercial."
-        
-        elif state == ConversationState.LICENSE_STATUS.value:
-            lower = user_input.lower()
-            if 'valid' in lower or 'active' in lower or 'good' in lower:
-                return True, 'valid', None
-            elif 'suspend' in lower:
-                return True, 'suspended', None
-            return False, None, "Please specify: Valid or Suspended."
-        
-        return True, user_input, None
+        spec = STATES.get(state)
+        if spec is None:
+            # Not part of the flow (e.g. stored by an older version): accept as-is
+            return True, user_input.strip(), None
+        leading = self._leading_answer(state, user_input)
+        if leading is not NO_MATCH:
+            # The first segment of a multi-field message answers this state
+            return await spec.check(leading, conversation, self.nhtsa_service)
+        return await spec.parse(user_input.strip(), conversation, self.nhtsa_service)
+    
+    @staticmethod
+    def _leading_answer(state: str, user_input: str) -> Any:
+        """
+        The current state's value from the first segment of a message with
+        several segments ("94107, Jane Doe, jane@x.com"), or NO_MATCH.
+        Only split when the second segment answers a state that can come
+        next, so a comma inside one answer ("John Smith, Jr.") is kept.
+        """
+        spec = STATES.get(state)
+        if spec is None or spec.scan is None:
+            return NO_MATCH
+        segments = split_fields(user_input)
+        if len(segments) < 2:
+            return NO_MATCH
+        following = [STATES[target].scan for target in spec.targets if STATES[target].scan]
+        if not any(scan(segments[1]) is not NO_MATCH for scan in following):
+            return NO_MATCH
+        return (spec.lead or spec.scan)(segments[0])
+    
+    async def _fill_following(
+        self,
+        answered_state: str,
+        user_message: str,
+        conversation: Union[Conversation, SessionState]
+    ):
+        """
+        Fill the states after the one just answered from the rest of a
+        multi-field message. Segments are taken in order, each by the state
+        that is current at that point, and stop at the first one that does
+        not fit; what is left can go to the LLM extractor when enabled.
+        """
+        if self._leading_answer(answered_state, user_message) is NO_MATCH:
+            return
+        self.multi_field_turns += 1
+        remaining = split_fields(user_message)[1:]
+        while remaining:
+            spec = STATES.get(conversation.current_state)
+            if spec is None or spec.scan is None:
+                break
+            value = spec.scan(remaining[0])
+            if value is NO_MATCH or not await self._fill(spec, value, conversation):
+                break
+            remaining.pop(0)
+        
+        if remaining and config.LLM_FIELD_EXTRACTION:
+            await self._fill_extracted("; ".join(remaining), conversation)
+    
+    async def _fill_extracted(self, text: str, conversation: Union[Conversation, SessionState]):
+        """Fill states in flow order from fields the LLM found in the text."""
+        fields = {state: spec.describe for state, spec in STATES.items() if spec.describe}
+        extracted = await self.openai_service.extract_fields(text, fields)
+        if extracted:
+            self.llm_extractions += 1
+        while conversation.current_state in extracted:
+            spec = STATES[conversation.current_state]
+            value = spec.extract(str(extracted.pop(spec.state)).strip())
+            if value is NO_MATCH or not await self._fill(spec, value, conversation):
+                break
+    
+    async def _fill(self, spec, value: Any, conversation: Union[Conversation, SessionState]) -> bool:
+        """Validate, save and advance past one prefilled state."""
+        is_valid, value, _ = await spec.check(value, conversation, self.nhtsa_service)
+        if not is_valid or value is None:
+            return False
+        spec.apply(conversation, value)
+        conversation.current_state = spec.next_state(value, conversation)
+        self.fields_prefilled += 1
+        return True
     
     def _get_next_state(
         self, 
         current_state: str, 
         value: Any,
-        conversation: Conversation
+        conversation: Union[Conversation, SessionState]
     ) -> str:
         """Determine the next state based on current state and value."""
-        
-        state_transitions = {
-            ConversationState.ZIP_CODE.value: ConversationState.FULL_NAME.value,
-            ConversationState.FULL_NAME.value: ConversationState.EMAIL.value,
-            ConversationState.EMAIL.value: ConversationState.VEHICLE_CHOICE.value,
-        }
-        
-        if current_state == ConversationState.VEHICLE_CHOICE.value:
-            # If user provided VIN data directly, skip to VEHICLE_USE
-            if isinstance(value, dict) and 'vin_data' in value:
-                return ConversationState.VEHICLE_USE.value
-            # If user said they want to provide VIN, go to VIN state
-            elif value == 'vin':
-                return ConversationState.VEHICLE_VIN.value
-            # Otherwise, go to manual entry (year)
-            return ConversationState.VEHICLE_YEAR.value
-        
-        if current_state == ConversationState.VEHICLE_VIN.value:
-            return ConversationState.VEHICLE_USE.value
-        
-        if current_state == ConversationState.VEHICLE_YEAR.value:
-            return ConversationState.VEHICLE_MAKE.value
-        
-        if current_state == ConversationState.VEHICLE_MAKE.value:
-            return ConversationState.VEHICLE_BODY.value
-        
-        if current_state == ConversationState.VEHICLE_BODY.value:
-            return ConversationState.VEHICLE_USE.value
-        
-        if current_state == ConversationState.VEHICLE_USE.value:
-            return ConversationState.BLIND_SPOT_WARNING.value
-        
-        if current_state == ConversationState.BLIND_SPOT_WARNING.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle and vehicle.vehicle_use == 'commuting':
-                return ConversationState.COMMUTE_DAYS.value
-            return ConversationState.ANNUAL_MILEAGE.value
-        
-        if current_state == ConversationState.COMMUTE_DAYS.value:
-            return ConversationState.COMMUTE_MILES.value
-        
-        if current_state == ConversationState.COMMUTE_MILES.value:
-            # After commute vehicle is done, ask if they want to add another
-            return ConversationState.ADD_ANOTHER_VEHICLE.value
-        
-        if current_state == ConversationState.ANNUAL_MILEAGE.value:
-            # After commercial/farming/business vehicle is done, ask if they want to add another
-            return ConversationState.ADD_ANOTHER_VEHICLE.value
-        
-        if current_state == ConversationState.ADD_ANOTHER_VEHICLE.value:
-            if value:  # User wants to add another vehicle
-                return ConversationState.VEHICLE_CHOICE.value
-            # User is done adding vehicles, now collect license info
-            return ConversationState.LICENSE_TYPE.value
-        
-        if current_state == ConversationState.LICENSE_TYPE.value:
-            if value == 'foreign':
-                # Foreign license, skip status and complete
-                return ConversationState.COMPLETE.value
-            return ConversationState.LICENSE_STATUS.value
-        
-        if current_state == ConversationState.LICENSE_STATUS.value:
-            # All done!
-            return ConversationState.COMPLETE.value
-        
-        return state_transitions.get(current_state, current_state)
+        spec = STATES.get(current_state)
+        return spec.next_state(value, conversation) if spec else current_state
     
     async def _save_value(
         self,
         state: str,
         value: Any,
-        conversation: Conversation,
-        db: Session
+        conversation: Union[Conversation, SessionState]
     ):
-        """Save the extracted value to the appropriate field."""
-        
-        if state == ConversationState.ZIP_CODE.value:
-            conversation.zip_code = value
-        
-        elif state == ConversationState.FULL_NAME.value:
-            conversation.full_name = value
-        
-        elif state == ConversationState.EMAIL.value:
-            conversation.email = value
-        
-        elif state == ConversationState.VEHICLE_CHOICE.value:
-            # Create a new vehicle entry
-            vehicle = Vehicle(conversation_id=conversation.id)
-            db.add(vehicle)
-            db.commit()
-            
-            # If user provided VIN directly, save the VIN data
-            if isinstance(value, dict) and 'vin_data' in value:
-                vin_data = value['vin_data']
-                vehicle.vin = vin_data.get('vin')
-                vehicle.year = int(vin_data.get('year')) if vin_data.get('year') else None
-                vehicle.make = vin_data.get('make')
-                vehicle.body_type = vin_data.get('body_class')
-                db.commit()
-        
-        elif state == ConversationState.VEHICLE_VIN.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle and isinstance(value, dict):
-                vehicle.vin = value.get('vin')
-                vehicle.year = int(value.get('year')) if value.get('year') else None
-                vehicle.make = value.get('make')
-                vehicle.body_type = value.get('body_class')
-        
-        elif state == ConversationState.VEHICLE_YEAR.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.year = value
-        
-        elif state == ConversationState.VEHICLE_MAKE.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.make = value
-        
-        elif state == ConversationState.VEHICLE_BODY.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.body_type = value
-        
-        elif state == ConversationState.VEHICLE_USE.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.vehicle_use = value
-        
-        elif state == ConversationState.BLIND_SPOT_WARNING.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.blind_spot_warning = value
-        
-        elif state == ConversationState.COMMUTE_DAYS.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.days_per_week = value
-        
-        elif state == ConversationState.COMMUTE_MILES.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.one_way_miles = value
-        
-        elif state == ConversationState.ANNUAL_MILEAGE.value:
-            vehicle = self._get_current_vehicle(conversation)
-            if vehicle:
-                vehicle.annual_mileage = value
-        
-        elif state == ConversationState.LICENSE_TYPE.value:
-            conversation.license_type = value
-        
-        elif state == ConversationState.LICENSE_STATUS.value:
-            conversation.license_status = value
-        
-        db.commit()
+        """Stage the extracted value on the appropriate field (committed with the turn)."""
+        spec = STATES.get(state)
+        if spec:
+            spec.apply(conversation, value)
     
-    async def process_message(
+    @staticmethod
+    async def _cancel(task: asyncio.Task):
+        """Cancel a task that is no longer needed and wait for it to unwind."""
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    
+    def _begin_turn(
         self,
-        conversation: Conversation,
+        conversation: Union[Conversation, SessionState],
+        db: AsyncSession
+    ) -> Union[_DatabaseTurn, CachedTurn]:
+        """
+        The unit of work for one turn: a database transaction, or the
+        session cache's journal for resident sessions.
+        """
+        if isinstance(conversation, SessionState):
+            return session_cache.begin(conversation)
+        return _DatabaseTurn(conversation, db, self.history)
+    
+    async def _prepare_turn(
+        self,
+        conversation: Union[Conversation, SessionState],
         user_message: str,
-        db: Session
-    ) -> str:
-        """Process a user message and return the bot's response."""
+        turn: Union[_DatabaseTurn, CachedTurn],
+        timer: TurnTimer
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Run everything in a turn up to response generation.
+        Returns (response, None) when the reply is already known, or
+        (None, generate_kwargs) when it still has to be generated.
+        Changes are only staged on the turn; the caller commits them.
+        """
         
-        # Save user message
-        user_msg = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=user_message
-        )
-        db.add(user_msg)
-        db.commit()
+        current_state = conversation.current_state
         
-        # Check for frustration
-        is_frustrated = await self.openai_service.check_frustration(user_message)
+        with timer.span("frustration_check"):
+            is_frustrated = await self.openai_service.check_frustration(user_message)
         
         if is_frustrated:
-            quote = await self.zenquotes_service.get_quote()
+            timer.outcome = "frustrated"
+            with timer.span("quote"):
+                quote = await self.zenquotes_service.get_quote()
+            turn.add_message("user", user_message)
             response = f"I understand this can be frustrating. Here's something to brighten your day:\n\n{quote}\n\nI'm here to help. Let's continue when you're ready."
-        else:
-            current_state = conversation.current_state
+            return response, None
+        
+        # Validation may call NHTSA and the history is a database read, so
+        # both are awaited together
+        async def validate():
+            with timer.span("validation"):
+                return await self._validate_and_extract(current_state, user_message, conversation)
+        
+        async def load_history():
+            with timer.span("history"):
+                return await turn.history()
+        
+        tasks = [asyncio.create_task(validate()), asyncio.create_task(load_history())]
+        try:
+            (is_valid, value, error_msg), conversation_history = await asyncio.gather(*tasks)
+        finally:
+            # If one failed, don't leave the other running on the session
+            for task in tasks:
+                await self._cancel(task)
+        
+        turn.add_message("user", user_message)
+        context = self._get_context(conversation)
+        
+        additional_context = None
+        accepted = is_valid and value is not None
+        
+        if accepted:
+            # Save the value
+            await self._save_value(current_state, value, conversation)
             
-            # Validate and extract value
-            is_valid, value, error_msg = await self._validate_and_extract(
-                current_state, user_message, conversation
-            )
+            # Move to next state
+            next_state = self._get_next_state(current_state, value, conversation)
+            conversation.current_state = next_state
             
-            context = self._get_context(conversation)
-            conversation_history = [
-                {"role": m.role, "content": m.content}
-                for m in conversation.messages[-10:]
-            ]
-            
-            additional_context = None
+            # The same message may answer the following questions too
+            with timer.span("prefill"):
+                await self._fill_following(current_state, user_message, conversation)
             
-            if is_valid and value is not None:
-                # Save the value
-                await self._save_value(current_state, value, conversation, db)
+            # Refresh context after saving
+            context = self._get_context(conversation)
+        else:
+            if error_msg:
+                additional_context = f"The user's input was invalid. Error: {error_msg}"
+        
+        # Routine turns are answered from templates without calling the LLM
+        outcome = self.response_policy.classify(accepted, error_msg, user_message)
+        timer.outcome = outcome
+        params = self._get_template_params(conversation)
+        if error_msg:
+            params["error"] = error_msg
+        response = self.response_policy.render(
+            current_state, conversation.current_state, outcome, params
+        )
+        if response is not None:
+            return response, None
+        
+        return None, {
+            "current_state": conversation.current_state,
+            "user_message": user_message,
+            "conversation_history": conversation_history,
+            "context": context,
+            "additional_context": additional_context
+        }
+    
+    async def process_message(
+        self,
+        conversation: Union[Conversation, SessionState],
+        user_message: str,
+        db: AsyncSession
+    ) -> str:
+        """
+        Process a user message and return the bot's response.
+        The whole turn is one unit of work: every change is committed in a
+        single transaction at the end, or rolled back together on failure.
+        """
+        
+        timer = TurnTimer(conversation.current_state)
+        try:
+            async with self._begin_turn(conversation, db) as turn:
+                response, generate_kwargs = await self._prepare_turn(conversation, user_message, turn, timer)
                 
-                # Move to next state
-                next_state = self._get_next_state(current_state, value, conversation)
-                conversation.current_state = next_state
-                db.commit()
+                if response is None:
+                    # Generate response using OpenAI
+                    with timer.span("generation"):
+                        response = await self.openai_service.generate_response(**generate_kwargs)
                 
-                # Refresh context after saving
-                context = self._get_context(conversation)
-            else:
-                if error_msg:
-                    additional_context = f"The user's input was invalid. Error: {error_msg}"
-            
-            # Generate response using OpenAI
-            response = await self.openai_service.generate_response(
-                current_state=conversation.current_state,
-                user_message=user_message,
-                conversation_history=conversation_history,
-                context=context,
-                additional_context=additional_context
-            )
-        
-        # Save assistant response
-        assistant_msg = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=response
-        )
-        db.add(assistant_msg)
-        db.commit()
+                turn.add_message("assistant", response)
+                commit_started = time.perf_counter()
+            timer.add("commit", time.perf_counter() - commit_started)
+        except BaseException:
+            timer.finish("error")
+            raise
+        timer.finish()
         
         return response
     
-    async def get_welcome_message(self, conversation: Conversation, db: Session) -> str:
+    async def stream_message(
+        self,
+        conversation: Union[Conversation, SessionState],
+        user_message: str,
+        db: AsyncSession
+    ) -> AsyncIterator[str]:
+        """
+        Process a user message, yielding the bot's response in chunks as they
+        are generated. The turn is committed in one transaction once the
+        stream ends, and rolled back if it fails or is abandoned.
+        """
+        
+        timer = TurnTimer(conversation.current_state)
+        try:
+            async with self._begin_turn(conversation, db) as turn:
+                response, generate_kwargs = await self._prepare_turn(conversation, user_message, turn, timer)
+                
+                if response is not None:
+                    yield response
+                else:
+                    chunks = []
+                    # Includes the time the client takes to read the stream
+                    with timer.span("generation"):
+                        async for chunk in self.openai_service.stream_response(**generate_kwargs):
+                            chunks.append(chunk)
+                            yield chunk
+                    response = "".join(chunks).strip()
+                
+                turn.add_message("assistant", response)
+                commit_started = time.perf_counter()
+            timer.add("commit", time.perf_counter() - commit_started)
+        except BaseException:
+            timer.finish("error")
+            raise
+        timer.finish()
+    
+    async def get_welcome_message(
+        self,
+        conversation: Union[Conversation, SessionState],
+        db: AsyncSession
+    ) -> str:
         """Generate the initial welcome message."""
         
         welcome = "👋 Hi there! Welcome to our insurance onboarding. I'll help you get set up quickly. Let's start with your ZIP code - what is it?"
         
         # Save the welcome message
-        assistant_msg = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=welcome
-        )
-        db.add(assistant_msg)
-        db.commit()
+        async with self._begin_turn(conversation, db) as turn:
+            turn.add_message("assistant", welcome)
         
         return welcome
+    
+    def extraction_stats(self) -> Dict[str, int]:
+        return {
+            "multi_field_turns": self.multi_field_turns,
+            "fields_prefilled": self.fields_prefilled,
+            "llm_extractions": self.llm_extractions,
+        }
 
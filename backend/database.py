@@ -1,21 +1,124 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import os
+from typing import Dict
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./chatbot.db"
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+import config
+
+
+# SQLite connection profiles, applied as PRAGMAs on every new connection
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    # SQLite defaults: rollback journal, full sync
+    "default": {},
+    # Concurrent readers alongside one writer, fsync only at checkpoints
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,  # negative = KiB, so ~64 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+
+def _async_url(url: str) -> str:
+    """Map plain SQLite/Postgres URLs onto their async drivers."""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def sqlite_pragmas(profile: str, overrides: str = "") -> Dict[str, object]:
+    """
+    PRAGMAs for a named profile plus "name=value,..." overrides
+    (e.g. SQLITE_PRAGMAS="cache_size=-20000,busy_timeout=10000").
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{profile}' (choose from {', '.join(SQLITE_PROFILES)})")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for item in overrides.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            pragmas[name.strip()] = value.strip()
+    return pragmas
+
+
+def install_sqlite_pragmas(engine: AsyncEngine, pragmas: Dict[str, object]):
+    """Apply PRAGMAs to every connection the engine opens."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+SQLALCHEMY_DATABASE_URL = _async_url(config.DATABASE_URL)
+
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+install_sqlite_pragmas(engine, sqlite_pragmas(config.SQLITE_PROFILE, config.SQLITE_PRAGMAS))
+# Objects stay usable after commit; async sessions can't lazily reload them
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+# Schema that Base.metadata.create_all built before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def migrate(connection: Connection, revision: str = "head"):
+    """Upgrade the schema on an open (sync) connection with Alembic."""
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(ALEMBIC_INI)
+    cfg.attributes["connection"] = connection
+    tables = inspect(connection).get_table_names()
+    if "conversations" in tables and "alembic_version" not in tables:
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, revision)
+
+
+async def init_db():
+    """Create or upgrade database tables to the latest migration."""
+    async with engine.begin() as conn:
+        await conn.run_sync(migrate)
 
+
+async def run_maintenance():
+    """Checkpoint and truncate the WAL, and refresh query planner statistics."""
+    if engine.dialect.name != "sqlite":
+        return
+    async with engine.connect() as conn:
+        await conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        await conn.execute(text("PRAGMA optimize"))
+
+
+async def maintenance_loop(interval: float = config.SQLITE_MAINTENANCE_INTERVAL):
+    """Run SQLite maintenance periodically (until cancelled)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_maintenance()
+        except Exception:
+            # Busy or locked; try again next interval
+            pass
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
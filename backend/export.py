@@ -0,0 +1,156 @@
+"""
+Streaming export of completed applications for underwriting.
+
+Completed conversations are read with their vehicles in one joined query
+(queries.completed_applications) through a server-side cursor, `batch_size`
+rows at a time, and written out batch by batch, so memory stays flat however
+many applications there are. Applications come out in updated_at order:
+the last one's updated_at is the watermark to pass as `since` next time to
+export what completed or changed after it. Each run also re-reads the
+`EXPORT_WATERMARK_OVERLAP` seconds before `since`, so the export is
+at-least-once: consumers keep the latest copy of each session_id.
+
+Formats: NDJSON (one application per line, vehicles nested), CSV (one row
+per vehicle, with the applicant columns repeated) and, when pyarrow is
+installed, Parquet (the CSV rows, one row group per batch).
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from ingest import APPLICANT_FIELDS, RECORD_VEHICLE_FIELDS
+from queries import completed_applications
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+CONVERSATION_COLUMNS = ("session_id", "created_at", "updated_at") + APPLICANT_FIELDS
+FLAT_COLUMNS = CONVERSATION_COLUMNS + RECORD_VEHICLE_FIELDS
+
+Application = Dict[str, Any]
+
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def flat_rows(application: Application) -> Iterator[Dict[str, Any]]:
+    """One row per vehicle (one row without vehicle columns if there are none)."""
+    applicant = {name: application[name] for name in CONVERSATION_COLUMNS}
+    if not application["vehicles"]:
+        yield dict(applicant, **{name: None for name in RECORD_VEHICLE_FIELDS})
+    for vehicle in application["vehicles"]:
+        yield dict(applicant, **vehicle)
+
+
+def ndjson_chunk(applications: List[Application]) -> str:
+    return "".join(
+        json.dumps({name: _isoformat(value) for name, value in application.items()}) + "\n"
+        for application in applications
+    )
+
+
+def csv_chunk(applications: List[Application], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FLAT_COLUMNS)
+    for application in applications:
+        for row in flat_rows(application):
+            writer.writerow([_isoformat(row[name]) for name in FLAT_COLUMNS])
+    return buffer.getvalue()
+
+
+def _parquet_schema():
+    string, integer = pyarrow.string(), pyarrow.int32()
+    types = {
+        "created_at": pyarrow.timestamp("us"),
+        "updated_at": pyarrow.timestamp("us"),
+        "year": integer,
+        "blind_spot_warning": pyarrow.bool_(),
+        "days_per_week": integer,
+        "one_way_miles": integer,
+        "annual_mileage": integer,
+    }
+    return pyarrow.schema([(name, types.get(name, string)) for name in FLAT_COLUMNS])
+
+
+class ApplicationExport:
+    """
+    One export run. `count` and `watermark` (the latest updated_at read, and
+    never earlier than `since`) are updated as batches are read.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        since: Optional[datetime] = None,
+        batch_size: int = config.EXPORT_BATCH_SIZE,
+        overlap: float = config.EXPORT_WATERMARK_OVERLAP
+    ):
+        self.db = db
+        self.since = since
+        self.batch_size = batch_size
+        self.overlap = overlap
+        self.watermark = since
+        self.count = 0
+
+    async def batches(self) -> AsyncIterator[List[Application]]:
+        """Completed applications in updated_at order, a cursor batch at a time."""
+        since = self.since - timedelta(seconds=self.overlap) if self.since else None
+        query = completed_applications(since).execution_options(yield_per=self.batch_size)
+        result = await self.db.stream(query)
+        current: Optional[Application] = None
+        async for partition in result.partitions():
+            batch = []
+            for row in partition:
+                if current is None or row.session_id != current["session_id"]:
+                    if current is not None:
+                        batch.append(current)
+                    current = {name: getattr(row, name) for name in CONVERSATION_COLUMNS}
+                    current["vehicles"] = []
+                if row.vehicle_id is not None:
+                    current["vehicles"].append({name: getattr(row, name) for name in RECORD_VEHICLE_FIELDS})
+            # The last application may continue in the next partition
+            if batch:
+                yield self._seen(batch)
+        if current is not None:
+            yield self._seen([current])
+
+    def _seen(self, batch: List[Application]) -> List[Application]:
+        self.count += len(batch)
+        # The overlap re-reads rows from before `since`; don't move back to them
+        latest = batch[-1]["updated_at"]
+        if latest is not None and (self.watermark is None or latest > self.watermark):
+            self.watermark = latest
+        return batch
+
+    async def text_chunks(self, fmt: str) -> AsyncIterator[str]:
+        """The export as NDJSON or CSV text, one chunk per batch."""
+        if fmt == "csv":
+            # The header goes out even when nothing is exported
+            yield csv_chunk([], header=True)
+        async for batch in self.batches():
+            yield csv_chunk(batch) if fmt == "csv" else ndjson_chunk(batch)
+
+    async def write_parquet(self, path: str):
+        """Write the export to a Parquet file, one row group per batch."""
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        schema = _parquet_schema()
+        with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+            async for batch in self.batches():
+                rows = [row for application in batch for row in flat_rows(application)]
+                writer.write_table(pyarrow.Table.from_pylist(rows, schema=schema))
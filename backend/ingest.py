@@ -0,0 +1,335 @@
+"""
+Bulk ingestion of pre-filled applicants (partner batches) from CSV or NDJSON.
+
+Each record is walked through the onboarding flow with its fields as the
+answers, so it passes exactly the validation a chat turn applies
+(StateSpec.parse), with no LLM involved. Records are processed in batches:
+the records of a batch are walked concurrently, with at most `concurrency`
+VIN decodes in flight, and the accepted ones are inserted with one
+executemany per table.
+
+NDJSON records look like
+
+    {"zip_code": "94107", "full_name": "Jane Doe", "email": "jane@example.com",
+     "vehicles": [{"vin": "...", "vehicle_use": "commuting", "blind_spot_warning": true,
+                   "days_per_week": 5, "one_way_miles": 12}],
+     "license_type": "personal", "license_status": "valid"}
+
+CSV rows have the same columns, with one vehicle per row; consecutive rows
+with the same `applicant` value are the vehicles of one applicant.
+
+A record that stops early (a missing field) is still inserted, at the
+question that is still open, so the applicant can finish in the chat. A
+record with an invalid field is not inserted.
+"""
+import asyncio
+import csv
+import json
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from models import Conversation, ConversationState as S, Vehicle
+from services.nhtsa import NHTSAService
+from services.session_cache import CONVERSATION_FIELDS, VEHICLE_FIELDS, VehicleState
+from state_machine import INITIAL_STATE, STATES, TERMINAL_STATES
+
+
+APPLICANT_FIELDS = ("zip_code", "full_name", "email", "license_type", "license_status")
+RECORD_VEHICLE_FIELDS = tuple(name for name in VEHICLE_FIELDS if name != "created_at")
+# Groups CSV rows into applicants
+APPLICANT_COLUMN = "applicant"
+CSV_COLUMNS = frozenset((APPLICANT_COLUMN,) + APPLICANT_FIELDS + RECORD_VEHICLE_FIELDS)
+
+Row = Tuple[int, Any]  # (input line number, record dict or the parse error)
+
+
+# --- Reading -----------------------------------------------------------------
+
+def _cell(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip()
+    return value or None
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Row]:
+    """One record per non-blank line."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {e}")
+            continue
+        yield number, record if isinstance(record, dict) else ValueError("Record must be a JSON object")
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Row]:
+    """
+    One vehicle per row. Rows are numbered by input line (the header is
+    line 1); an applicant spanning several rows takes its first row's number.
+    Raises ValueError on unknown columns.
+    """
+    reader = csv.DictReader(lines)
+    unknown = set(reader.fieldnames or ()) - CSV_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown CSV columns: {', '.join(sorted(unknown))}")
+
+    record: Optional[Dict[str, Any]] = None
+    number = 0
+    for row in reader:
+        key = _cell(row.get(APPLICANT_COLUMN))
+        if record is None or key is None or key != record[APPLICANT_COLUMN]:
+            if record is not None:
+                yield number, record
+            number = reader.line_num
+            record = {name: _cell(row.get(name)) for name in APPLICANT_FIELDS}
+            record[APPLICANT_COLUMN] = key
+            record["vehicles"] = []
+        vehicle = {name: _cell(row.get(name)) for name in RECORD_VEHICLE_FIELDS}
+        if any(value is not None for value in vehicle.values()):
+            record["vehicles"].append(vehicle)
+    if record is not None:
+        yield number, record
+
+
+def read_records(file: TextIO, fmt: str) -> Iterator[Row]:
+    if fmt == "csv":
+        return read_csv(file)
+    if fmt == "ndjson":
+        return read_ndjson(file)
+    raise ValueError(f"Unknown format '{fmt}' (choose from csv, ndjson)")
+
+
+# --- Walking the flow ----------------------------------------------------------
+
+class Applicant:
+    """A record's answers so far: the attributes the state machine reads and sets."""
+
+    __slots__ = CONVERSATION_FIELDS + ("vehicles",)
+
+    def __init__(self):
+        for name in CONVERSATION_FIELDS:
+            setattr(self, name, None)
+        self.current_state = INITIAL_STATE
+        self.vehicles: List[VehicleState] = []
+
+    def add_vehicle(self) -> VehicleState:
+        vehicle = VehicleState()
+        self.vehicles.append(vehicle)
+        return vehicle
+
+
+class RowError(Exception):
+    def __init__(self, field: str, error: str):
+        super().__init__(error)
+        self.field = field
+        self.error = error
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return str(value).strip() or None
+
+
+def _flag(value: Any) -> Optional[str]:
+    text = _text(value)
+    if text is not None and text.lower() in ("true", "t", "1", "y"):
+        return "yes"
+    if text is not None and text.lower() in ("false", "f", "0", "n"):
+        return "no"
+    return text
+
+
+def _vehicle_choice(vehicle: Dict[str, Any]) -> Optional[str]:
+    # The VIN itself is answered at the VIN question, for its error message
+    if _text(vehicle.get("vin")):
+        return "vin"
+    if any(_text(vehicle.get(name)) for name in ("year", "make", "body_type")):
+        return "manual"
+    return None
+
+
+def _on_vehicle(name: str, convert: Callable[[Any], Optional[str]] = _text):
+    return name, lambda vehicle: convert(vehicle.get(name))
+
+
+# The record field answering each state: applicant fields by name, vehicle
+# fields (name, getter) applied to the vehicle being entered
+APPLICANT_ANSWERS: Dict[str, str] = {
+    S.ZIP_CODE.value: "zip_code",
+    S.FULL_NAME.value: "full_name",
+    S.EMAIL.value: "email",
+    S.LICENSE_TYPE.value: "license_type",
+    S.LICENSE_STATUS.value: "license_status",
+}
+VEHICLE_ANSWERS: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Optional[str]]]] = {
+    S.VEHICLE_CHOICE.value: ("vin", _vehicle_choice),
+    S.VEHICLE_VIN.value: _on_vehicle("vin"),
+    S.VEHICLE_YEAR.value: _on_vehicle("year"),
+    S.VEHICLE_MAKE.value: _on_vehicle("make"),
+    S.VEHICLE_BODY.value: _on_vehicle("body_type"),
+    S.VEHICLE_USE.value: _on_vehicle("vehicle_use"),
+    S.BLIND_SPOT_WARNING.value: _on_vehicle("blind_spot_warning", _flag),
+    S.COMMUTE_DAYS.value: _on_vehicle("days_per_week"),
+    S.COMMUTE_MILES.value: _on_vehicle("one_way_miles"),
+    S.ANNUAL_MILEAGE.value: _on_vehicle("annual_mileage"),
+}
+
+
+def _answer(state: str, record: Dict[str, Any], applicant: Applicant) -> Tuple[str, Optional[str]]:
+    """(field, answer text) for the state, from the record; None if missing."""
+    if state in APPLICANT_ANSWERS:
+        name = APPLICANT_ANSWERS[state]
+        return name, _text(record.get(name))
+
+    vehicles = record.get("vehicles") or []
+    if state == S.ADD_ANOTHER_VEHICLE.value:
+        return "vehicles", "yes" if len(applicant.vehicles) < len(vehicles) else "no"
+
+    # The choice starts the next vehicle; the other questions are about the last one
+    index = len(applicant.vehicles) - (0 if state == S.VEHICLE_CHOICE.value else 1)
+    name, getter = VEHICLE_ANSWERS[state]
+    if index >= len(vehicles):
+        return f"vehicles[{index}]", None
+    return f"vehicles[{index}].{name}", getter(vehicles[index])
+
+
+def _check_record(record: Dict[str, Any]):
+    unknown = set(record) - set(APPLICANT_FIELDS) - {APPLICANT_COLUMN, "vehicles"}
+    if unknown:
+        raise RowError(sorted(unknown)[0], f"Unknown fields: {', '.join(sorted(unknown))}")
+    vehicles = record.get("vehicles")
+    if vehicles is None:
+        return
+    if not isinstance(vehicles, list) or not all(isinstance(vehicle, dict) for vehicle in vehicles):
+        raise RowError("vehicles", "vehicles must be a list of objects")
+    for index, vehicle in enumerate(vehicles):
+        unknown = set(vehicle) - set(RECORD_VEHICLE_FIELDS)
+        if unknown:
+            raise RowError(f"vehicles[{index}]", f"Unknown vehicle fields: {', '.join(sorted(unknown))}")
+
+
+async def walk(record: Dict[str, Any], nhtsa) -> Applicant:
+    """
+    Answer the flow's questions from the record until it completes or a
+    field is missing. Raises RowError on a field the flow rejects.
+    """
+    _check_record(record)
+    applicant = Applicant()
+    while applicant.current_state not in TERMINAL_STATES:
+        spec = STATES[applicant.current_state]
+        field, text = _answer(spec.state, record, applicant)
+        if text is None:
+            break
+        is_valid, value, error = await spec.parse(text, applicant, nhtsa)
+        if not is_valid or value is None:
+            raise RowError(field, error or spec.error or f"Unrecognized answer: {text!r}")
+        spec.apply(applicant, value)
+        applicant.current_state = spec.next_state(value, applicant)
+    return applicant
+
+
+class BoundedNHTSA:
+    """NHTSAService with at most `limit` VIN decodes in flight."""
+
+    def __init__(self, limit: int, nhtsa=NHTSAService):
+        self.nhtsa = nhtsa
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def decode_vin(self, vin: str) -> Dict[str, Any]:
+        async with self.semaphore:
+            return await self.nhtsa.decode_vin(vin)
+
+    async def validate_year_make(self, year: int, make: str) -> Dict[str, Any]:
+        return await self.nhtsa.validate_year_make(year, make)
+
+
+# --- Ingesting -----------------------------------------------------------------
+
+def _batches(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    batch: List[Row] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _walk_row(row: Row, nhtsa) -> Dict[str, Any]:
+    number, record = row
+    if isinstance(record, Exception):
+        return {"row": number, "status": "failed", "field": None, "error": str(record)}
+    try:
+        applicant = await walk(record, nhtsa)
+    except RowError as e:
+        return {"row": number, "status": "failed", "field": e.field, "error": e.error}
+    complete = applicant.current_state in TERMINAL_STATES
+    return {
+        "row": number,
+        "status": "complete" if complete else "incomplete",
+        "session_id": str(uuid.uuid4()),
+        "current_state": applicant.current_state,
+        "applicant": applicant,
+    }
+
+
+async def _insert(db: AsyncSession, accepted: List[Dict[str, Any]]):
+    """Insert a batch of applicants: one executemany per table, one commit."""
+    # Core inserts: the ORM's bulk insert splits rows by which fields are None
+    conversations = Conversation.__table__
+    now = datetime.utcnow()
+    result = await db.execute(
+        insert(conversations).returning(conversations.c.session_id, conversations.c.id),
+        [
+            dict(
+                {name: getattr(item["applicant"], name) for name in CONVERSATION_FIELDS},
+                session_id=item["session_id"],
+                created_at=now,
+                updated_at=now
+            )
+            for item in accepted
+        ]
+    )
+    ids = dict(result.all())
+    vehicles = [
+        dict(vehicle.to_dict(), conversation_id=ids[item["session_id"]])
+        for item in accepted
+        for vehicle in item["applicant"].vehicles
+    ]
+    if vehicles:
+        await db.execute(insert(Vehicle.__table__), vehicles)
+    await db.commit()
+
+
+async def ingest(
+    rows: Iterable[Row],
+    db: AsyncSession,
+    nhtsa=NHTSAService,
+    concurrency: int = config.INGEST_VIN_CONCURRENCY,
+    batch_size: int = config.INGEST_BATCH_SIZE
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Validate and insert records, yielding one result per record in input
+    order once its batch is committed: {"row", "status"} plus "session_id"
+    and "current_state" when inserted ("complete"/"incomplete"), or "field"
+    and "error" when rejected ("failed").
+    """
+    bounded = BoundedNHTSA(concurrency, nhtsa)
+    for batch in _batches(rows, batch_size):
+        results = await asyncio.gather(*(_walk_row(row, bounded) for row in batch))
+        accepted = [result for result in results if result["status"] != "failed"]
+        if accepted:
+            await _insert(db, accepted)
+        for result in results:
+            result.pop("applicant", None)
+            yield result
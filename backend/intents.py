@@ -0,0 +1,138 @@
+"""
+Keyword intent matching for user messages.
+
+Each intent set (frustration, yes/no answers, the multiple-choice questions)
+maps labels to keywords and is compiled into one regex alternation, so a
+message is scanned once however many keywords there are. Keywords match
+whole words only ("agent" does not match "management", "no" does not match
+"know"); a trailing `*` matches any word starting with the keyword
+("commut*" matches "commuting"), and spaces in a phrase match any whitespace.
+"""
+import json
+import re
+from typing import Dict, Iterable, Optional, Set
+
+import config
+
+
+# Labels are listed in priority order: when a message contains keywords of
+# several labels, the first label wins
+DEFAULT_INTENTS: Dict[str, Dict[str, tuple]] = {
+    "frustration": {
+        "frustrated": (
+            "frustrat*", "angry", "annoy*", "speak to human", "talk to someone",
+            "real person", "agent", "representative", "this is ridiculous",
+            "hate this", "stupid", "useless", "waste of time", "give up",
+            "help me", "not working", "doesn't work", "broken",
+        ),
+    },
+    "vehicle_choice": {
+        "vin": ("vin",),
+        "manual": ("year", "make", "manual", "type", "other"),
+    },
+    "vehicle_use": {
+        "commuting": ("commut*",),
+        "commercial": ("commercial",),
+        "farming": ("farm*",),
+        "business": ("business*",),
+    },
+    # Negative first: "I don't have it", "no, it doesn't" are answers of no
+    "blind_spot_warning": {
+        "no": ("no", "nope", "not", "don't", "doesn't"),
+        "yes": ("yes", "yeah", "yep", "have", "equipped", "does"),
+    },
+    "add_another_vehicle": {
+        "no": ("no", "nope", "done", "that's all", "that's it"),
+        "yes": ("yes", "yeah", "yep", "another", "add", "more"),
+    },
+    "license_type": {
+        "foreign": ("foreign",),
+        "personal": ("personal",),
+        "commercial": ("commercial", "cdl"),
+    },
+    "license_status": {
+        "valid": ("valid", "active", "good"),
+        "suspended": ("suspend*",),
+    },
+}
+
+
+# Apostrophes count as part of a word, so "does" doesn't match "doesn't"
+WORD_START = r"(?<![\w'’])"
+WORD_END = r"(?![\w'’])"
+
+
+def _keyword_pattern(keyword: str) -> str:
+    keyword = keyword.strip().lower()
+    prefix = keyword.endswith("*")
+    words = keyword.rstrip("*").split()
+    pattern = r"\s+".join(re.escape(word).replace("'", "['’]") for word in words)
+    return pattern + (r"[\w'’]*" if prefix else "")
+
+
+class KeywordMatcher:
+    """One intent set compiled into a single case-insensitive alternation."""
+
+    def __init__(self, intents: Dict[str, Iterable[str]]):
+        self.labels = list(intents)
+        groups = []
+        # Label priority by capture group number (match.lastindex)
+        self._priority = [None]
+        for index, keywords in enumerate(intents.values()):
+            # Longest first, so a phrase wins over a keyword it starts with
+            alternatives = sorted({_keyword_pattern(k) for k in keywords if k.strip()}, key=len, reverse=True)
+            if alternatives:
+                groups.append(f"({'|'.join(alternatives)})")
+                self._priority.append(index)
+        # The word boundaries sit outside the alternation, so each position
+        # is checked once rather than once per keyword
+        body = f"{WORD_START}(?:{'|'.join(groups)}){WORD_END}" if groups else r"(?!)"
+        self.pattern = re.compile(body, re.IGNORECASE)
+
+    def matches(self, text: str) -> bool:
+        """Whether the text contains any keyword of the set."""
+        return self.pattern.search(text) is not None
+
+    def found(self, text: str) -> Set[str]:
+        """Labels with at least one keyword in the text."""
+        return {self.labels[self._priority[m.lastindex]] for m in self.pattern.finditer(text)}
+
+    def first(self, text: str) -> Optional[str]:
+        """The highest-priority label found in the text, if any."""
+        best = None
+        for match in self.pattern.finditer(text):
+            index = self._priority[match.lastindex]
+            if index == 0:
+                return self.labels[0]
+            if best is None or index < best:
+                best = index
+        return None if best is None else self.labels[best]
+
+
+def load_intents(path: str = "") -> Dict[str, Dict[str, tuple]]:
+    """
+    The default intent sets, with keyword lists replaced per label from a
+    JSON file ({"<set>": {"<label>": ["keyword", ...]}}). Unknown sets and
+    labels are rejected, since the conversation flow maps labels to values.
+    """
+    intents = {name: dict(labels) for name, labels in DEFAULT_INTENTS.items()}
+    if not path:
+        return intents
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    for name, labels in overrides.items():
+        if name not in intents:
+            raise ValueError(f"Unknown intent set: {name}")
+        for label, keywords in labels.items():
+            if label not in intents[name]:
+                raise ValueError(f"Unknown label for intent set {name}: {label}")
+            if isinstance(keywords, str) or not isinstance(keywords, list):
+                raise ValueError(f"Keywords for {name}.{label} must be a list")
+            intents[name][label] = tuple(keywords)
+    return intents
+
+
+MATCHERS: Dict[str, KeywordMatcher] = {
+    name: KeywordMatcher(labels)
+    for name, labels in load_intents(config.INTENT_KEYWORDS_PATH).items()
+}
@@ -1,20 +1,76 @@
+import asyncio
+import base64
+import io
+import json
+import tempfile
+import time
 import uuid
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
+from typing import Optional, Tuple, Union
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import engine, get_db, Base
-from models import Conversation, Message
-from schemas import ChatRequest, ChatResponse, ConversationResponse
+from database import get_db, init_db, maintenance_loop, SessionLocal
+import config
+from models import Conversation
+from queries import conversation_by_session, conversation_page
+from schemas import (
+    ChatRequest, ChatResponse, ConversationResponse, ConversationPage, ConversationSummary, IngestReport
+)
+from chat_socket import CLOSE_NOT_FOUND, ChatSocket
 from conversation_engine import ConversationEngine
+from export import MEDIA_TYPES, ApplicationExport
+from ingest import ingest, read_records
+from services.http_client import open_clients, close_clients
+from services.make_catalog import make_catalog
+from services.zenquotes import quote_pool
+from services import metrics
+from services.vin_cache import vin_cache
+from services.session_cache import SessionState, session_cache
+
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables
+    await init_db()
+    # Periodic WAL checkpoint / PRAGMA optimize (no-op on other databases)
+    maintenance = asyncio.create_task(maintenance_loop())
+    try:
+        # Open pooled upstream HTTP clients once for the app lifetime
+        await open_clients()
+        # Load the NHTSA make catalog and keep it fresh in the background
+        await make_catalog.start()
+        # Prefetch calming quotes so frustrated turns never wait on ZenQuotes
+        quote_pool.start()
+        await vin_cache.open()
+        if config.SESSION_CACHE_ENABLED:
+            # Catch the database up from the journal before serving turns
+            await session_cache.open()
+        yield
+    finally:
+        # Each step is safe to run on a service that never started, and the
+        # rest still run if the final session cache flush fails
+        try:
+            if config.SESSION_CACHE_ENABLED:
+                await session_cache.close()
+        finally:
+            maintenance.cancel()
+            # Let a maintenance pass that is mid-statement unwind first
+            with suppress(asyncio.CancelledError):
+                await maintenance
+            await make_catalog.stop()
+            await quote_pool.stop()
+            await vin_cache.close()
+            await close_clients()
 
 app = FastAPI(
     title="Insurance Onboarding Chatbot",
     description="Conversational chatbot for insurance onboarding",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -35,18 +91,47 @@ async def root():
     return {"message": "Insurance Onboarding Chatbot API", "status": "running"}
 
 
+async def _get_conversation(db: AsyncSession, session_id: str, with_messages: bool = False) -> Conversation:
+    """Load a conversation with its vehicles (and optionally messages), or raise 404."""
+    
+    result = await db.execute(conversation_by_session(session_id, with_messages))
+    conversation = result.scalars().first()
+    
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    return conversation
+
+
+async def _get_session(db: AsyncSession, session_id: str) -> Union[Conversation, SessionState]:
+    """
+    Load what a chat turn runs against: the resident session when the
+    session cache is enabled, otherwise the conversation row. 404 if unknown.
+    """
+    
+    if not config.SESSION_CACHE_ENABLED:
+        return await _get_conversation(db, session_id)
+    
+    state = await session_cache.get(db, session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    return state
+
+
 @app.post("/api/conversation/start")
-async def start_conversation(db: Session = Depends(get_db)):
+async def start_conversation(db: AsyncSession = Depends(get_db)):
     """Start a new conversation session."""
     
     session_id = str(uuid.uuid4())
     
-    conversation = Conversation(session_id=session_id)
-    db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    if config.SESSION_CACHE_ENABLED:
+        conversation = session_cache.create(session_id)
+    else:
+        conversation = Conversation(session_id=session_id, messages=[], vehicles=[])
+        db.add(conversation)
     
-    # Get welcome message
+    # Get welcome message (commits the conversation and message together)
     welcome_message = await conversation_engine.get_welcome_message(conversation, db)
     
     return {
@@ -57,16 +142,11 @@ async def start_conversation(db: Session = Depends(get_db)):
 
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(request: ChatRequest, db: AsyncSession = Depends(get_db)):
     """Process a chat message."""
     
     # Find conversation
-    conversation = db.query(Conversation).filter(
-        Conversation.session_id == request.session_id
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation = await _get_session(db, request.session_id)
     
     # Process the message
     response = await conversation_engine.process_message(
@@ -75,8 +155,6 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
         db=db
     )
     
-    db.refresh(conversation)
-    
     return ChatResponse(
         session_id=request.session_id,
         response=response,
@@ -85,41 +163,248 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
     )
 
 
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Process a chat message, streaming the response as Server-Sent Events.
+    Sends `token` events as text is generated, then one `done` event with the
+    same fields as /api/chat.
+    """
+    
+    # The session must outlive this handler, so it is owned by the stream
+    db = SessionLocal()
+    
+    try:
+        conversation = await _get_session(db, request.session_id)
+    except HTTPException:
+        await db.close()
+        raise
+    
+    async def event_stream():
+        try:
+            chunks = []
+            async for chunk in conversation_engine.stream_message(
+                conversation=conversation,
+                user_message=request.message,
+                db=db
+            ):
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+            
+            yield _sse("done", {
+                "session_id": request.session_id,
+                "response": "".join(chunks).strip(),
+                "current_state": conversation.current_state,
+                "is_complete": conversation.current_state == "complete"
+            })
+        finally:
+            await db.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/ws/chat/{session_id}")
+async def chat_socket(websocket: WebSocket, session_id: str):
+    """
+    Chat over one WebSocket per session (see chat_socket.py for the frames).
+    The socket keeps one database session; the conversation is re-read at
+    the start of each turn.
+    """
+    
+    await websocket.accept()
+    
+    async with SessionLocal() as db:
+        try:
+            conversation = await _get_session(db, session_id)
+        except HTTPException as e:
+            await websocket.close(code=CLOSE_NOT_FOUND, reason=e.detail)
+            return
+        
+        async def cached_session():
+            # A memory lookup; reloads the session if it was evicted while idle
+            return await session_cache.get(db, session_id)
+        
+        async def conversation_row():
+            # Re-read so a rolled-back turn or a turn sent over HTTP isn't missed
+            db.expire_all()
+            try:
+                return await _get_conversation(db, session_id)
+            except HTTPException:
+                return None
+        
+        refresh = cached_session if config.SESSION_CACHE_ENABLED else conversation_row
+        await ChatSocket(websocket, conversation_engine, db, conversation, refresh=refresh).run()
+
+
 @app.get("/api/conversation/{session_id}", response_model=ConversationResponse)
-async def get_conversation(session_id: str, db: Session = Depends(get_db)):
+async def get_conversation(session_id: str, db: AsyncSession = Depends(get_db)):
     """Get conversation details and history."""
     
-    conversation = db.query(Conversation).filter(
-        Conversation.session_id == session_id
-    ).first()
+    if config.SESSION_CACHE_ENABLED:
+        # Read-your-writes: land queued turns before reading the database
+        await session_cache.flush()
     
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    return await _get_conversation(db, session_id, with_messages=True)
+
+
+def _encode_cursor(created_at: datetime, conversation_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), conversation_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, conversation_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(conversation_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/api/conversations", response_model=ConversationPage)
+async def list_conversations(
+    cursor: Optional[str] = None,
+    limit: int = Query(config.CONVERSATIONS_PAGE_SIZE, ge=1, le=config.CONVERSATIONS_MAX_PAGE_SIZE),
+    state: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List conversations, newest first (for admin/debugging).
+    Keyset-paginated on (created_at, id): pass `next_cursor` back as `cursor`
+    for the next page. Counts come from correlated subqueries in the same
+    query, so no messages or vehicles are loaded.
+    """
     
-    return conversation
+    if config.SESSION_CACHE_ENABLED:
+        await session_cache.flush()
+    
+    result = await db.execute(conversation_page(
+        limit,
+        cursor=_decode_cursor(cursor) if cursor else None,
+        state=state,
+        created_after=created_after,
+        created_before=created_before
+    ))
+    rows = result.all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return ConversationPage(
+        conversations=[ConversationSummary.model_validate(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+
+# Request bodies above this size are spooled to a temporary file
+INGEST_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+@app.post("/api/ingest", response_model=IngestReport)
+async def ingest_applicants(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Bulk-load pre-filled applicants from a CSV or NDJSON body (format from
+    `format`, else the Content-Type: text/csv means CSV). Every record goes
+    through the chat's validators; the report has one result per record.
+    """
+    
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    started = time.perf_counter()
+    
+    with tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_SIZE) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        text = io.TextIOWrapper(body, encoding="utf-8-sig", newline="")
+        try:
+            results = [result async for result in ingest(read_records(text, fmt), db)]
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            text.detach()
+    
+    counts = {status: 0 for status in ("complete", "incomplete", "failed")}
+    for result in results:
+        counts[result["status"]] += 1
+    
+    return IngestReport(
+        rows=len(results),
+        seconds=round(time.perf_counter() - started, 3),
+        results=results,
+        **counts
+    )
 
 
-@app.get("/api/conversations")
-async def list_conversations(db: Session = Depends(get_db)):
-    """List all conversations (for admin/debugging)."""
-    
-    conversations = db.query(Conversation).order_by(
-        Conversation.created_at.desc()
-    ).limit(50).all()
-    
-    return [
-        {
-            "session_id": c.session_id,
-            "current_state": c.current_state,
-            "full_name": c.full_name,
-            "email": c.email,
-            "vehicles_count": len(c.vehicles),
-            "messages_count": len(c.messages),
-            "created_at": c.created_at,
-            "updated_at": c.updated_at
-        }
-        for c in conversations
-    ]
+@app.get("/api/export")
+async def export_applications(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None
+):
+    """
+    Stream every completed application with its vehicles, in updated_at
+    order: NDJSON (vehicles nested) or CSV (one row per vehicle). With
+    `since`, only applications updated after it (less the watermark
+    overlap); pass the last exported `updated_at` to continue an
+    incremental export, keeping the latest copy of each session_id.
+    """
+    
+    if config.SESSION_CACHE_ENABLED:
+        await session_cache.flush()
+    
+    # The session must outlive this handler, so it is owned by the stream
+    db = SessionLocal()
+    export = ApplicationExport(db, since=since)
+    
+    async def body():
+        try:
+            async for chunk in export.text_chunks(format):
+                yield chunk
+        finally:
+            await db.close()
+    
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="applications.{format}"'}
+    )
+
+
+@app.get("/api/stats")
+async def get_stats():
+    """Cache statistics (for admin/debugging)."""
+    
+    return {
+        "vin_cache": vin_cache.stats(),
+        "response_policy": conversation_engine.response_policy.stats(),
+        "response_cache": conversation_engine.openai_service.response_cache.stats(),
+        "extraction": conversation_engine.extraction_stats(),
+        "quote_pool": quote_pool.stats(),
+        "session_cache": session_cache.stats() if config.SESSION_CACHE_ENABLED else None
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Turn, span and upstream timings in the Prometheus text format."""
+    
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
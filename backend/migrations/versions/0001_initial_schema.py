@@ -0,0 +1,78 @@
+"""Initial schema (as created by Base.metadata.create_all before migrations)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "conversations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(length=36), nullable=True),
+        sa.Column("current_state", sa.String(length=50), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("zip_code", sa.String(length=10), nullable=True),
+        sa.Column("full_name", sa.String(length=255), nullable=True),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("license_type", sa.String(length=20), nullable=True),
+        sa.Column("license_status", sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_conversations_id", "conversations", ["id"])
+    op.create_index("ix_conversations_session_id", "conversations", ["session_id"], unique=True)
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("conversation_id", sa.Integer(), nullable=True),
+        sa.Column("role", sa.String(length=20), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["conversation_id"], ["conversations.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_messages_id", "messages", ["id"])
+
+    op.create_table(
+        "vehicles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("conversation_id", sa.Integer(), nullable=True),
+        sa.Column("vin", sa.String(length=17), nullable=True),
+        sa.Column("year", sa.Integer(), nullable=True),
+        sa.Column("make", sa.String(length=100), nullable=True),
+        sa.Column("body_type", sa.String(length=100), nullable=True),
+        sa.Column("vehicle_use", sa.String(length=20), nullable=True),
+        sa.Column("blind_spot_warning", sa.Boolean(), nullable=True),
+        sa.Column("days_per_week", sa.Integer(), nullable=True),
+        sa.Column("one_way_miles", sa.Integer(), nullable=True),
+        sa.Column("annual_mileage", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["conversation_id"], ["conversations.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_vehicles_id", "vehicles", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_vehicles_id", table_name="vehicles")
+    op.drop_table("vehicles")
+    op.drop_index("ix_messages_id", table_name="messages")
+    op.drop_table("messages")
+    op.drop_index("ix_conversations_session_id", table_name="conversations")
+    op.drop_index("ix_conversations_id", table_name="conversations")
+    op.drop_table("conversations")
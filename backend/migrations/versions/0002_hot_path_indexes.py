@@ -0,0 +1,35 @@
+"""Composite indexes for per-turn child loads and the admin conversation list
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_messages_conversation_id_id", "messages", ["conversation_id", "id"])
+    op.create_index("ix_vehicles_conversation_id_id", "vehicles", ["conversation_id", "id"])
+    op.create_index("ix_conversations_created_at_id", "conversations", ["created_at", "id"])
+    op.create_index(
+        "ix_conversations_current_state_created_at",
+        "conversations",
+        ["current_state", "created_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_conversations_current_state_created_at", table_name="conversations")
+    op.drop_index("ix_conversations_created_at_id", table_name="conversations")
+    op.drop_index("ix_vehicles_conversation_id_id", table_name="vehicles")
+    op.drop_index("ix_messages_conversation_id_id", table_name="messages")
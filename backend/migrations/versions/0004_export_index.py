@@ -0,0 +1,29 @@
+"""Index for exporting completed applications by updated_at
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_conversations_current_state_updated_at",
+        "conversations",
+        ["current_state", "updated_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_conversations_current_state_updated_at", table_name="conversations")
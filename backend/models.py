@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -46,6 +46,13 @@ class ConversationState(str, enum.Enum):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Admin list: newest first, keyset-paginated, optionally by state
+        Index("ix_conversations_created_at_id", "created_at", "id"),
+        Index("ix_conversations_current_state_created_at", "current_state", "created_at", "id"),
+        # Export of completed applications, resumable from an updated_at watermark
+        Index("ix_conversations_current_state_updated_at", "current_state", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(36), unique=True, index=True)
@@ -62,11 +69,22 @@ class Conversation(Base):
     
     # Relationships
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
-    vehicles = relationship("Vehicle", back_populates="conversation", cascade="all, delete-orphan")
+    # Ordered so positions match the session cache's vehicle list (see SessionCache._apply)
+    vehicles = relationship("Vehicle", back_populates="conversation", cascade="all, delete-orphan", order_by="Vehicle.id")
+    
+    def add_vehicle(self) -> "Vehicle":
+        """Start a new vehicle on this conversation."""
+        vehicle = Vehicle()
+        self.vehicles.append(vehicle)
+        return vehicle
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Loaded per conversation on every turn, in id order
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"))
@@ -79,6 +97,9 @@ class Message(Base):
 
 class Vehicle(Base):
     __tablename__ = "vehicles"
+    __table_args__ = (
+        Index("ix_vehicles_conversation_id_id", "conversation_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"))
@@ -104,3 +125,10 @@ class Vehicle(Base):
     
     conversation = relationship("Conversation", back_populates="vehicles")
 
+
+class WriteBehindCheckpoint(Base):
+    """Last journal sequence number applied to the database, per journal."""
+    __tablename__ = "write_behind_checkpoints"
+
+    name = Column(String(50), primary_key=True)
+    seq = Column(Integer, nullable=False)
@@ -0,0 +1,127 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.orm import selectinload
+
+from models import Conversation, ConversationState, Message, Vehicle
+
+
+# Hot-path queries, shared by the API and `cli.py check-query-plans` so the
+# plans being checked are the ones actually served.
+
+
+def conversation_by_session(session_id: str, with_messages: bool = False) -> Select:
+    """
+    A conversation with its vehicles (loaded on every turn). The transcript
+    is only loaded when asked for; turns read a bounded window with
+    recent_messages instead.
+    """
+    options = [selectinload(Conversation.vehicles)]
+    if with_messages:
+        options.append(selectinload(Conversation.messages))
+    return select(Conversation).options(*options).where(Conversation.session_id == session_id)
+
+
+def recent_messages(conversation_id: int, limit: int) -> Select:
+    """The last `limit` messages of a conversation, newest first."""
+    return (
+        select(Message.role, Message.content)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.id.desc())
+        .limit(limit)
+    )
+
+
+def conversation_page(
+    limit: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    state: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+) -> Select:
+    """
+    One page of conversation summaries, newest first, keyset-paginated on
+    (created_at, id). Fetches limit + 1 rows so the caller can tell whether
+    there is a next page.
+    """
+    vehicles_count = (
+        select(func.count(Vehicle.id))
+        .where(Vehicle.conversation_id == Conversation.id)
+        .scalar_subquery()
+    )
+    messages_count = (
+        select(func.count(Message.id))
+        .where(Message.conversation_id == Conversation.id)
+        .scalar_subquery()
+    )
+
+    query = select(
+        Conversation.id,
+        Conversation.session_id,
+        Conversation.current_state,
+        Conversation.full_name,
+        Conversation.email,
+        Conversation.created_at,
+        Conversation.updated_at,
+        vehicles_count.label("vehicles_count"),
+        messages_count.label("messages_count")
+    )
+
+    if cursor:
+        query = query.where(tuple_(Conversation.created_at, Conversation.id) < tuple_(*cursor))
+    if state:
+        query = query.where(Conversation.current_state == state)
+    if created_after:
+        query = query.where(Conversation.created_at >= created_after)
+    if created_before:
+        query = query.where(Conversation.created_at < created_before)
+
+    return query.order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit + 1)
+
+
+# Columns of a completed application, as exported
+APPLICATION_COLUMNS = (
+    Conversation.session_id,
+    Conversation.created_at,
+    Conversation.updated_at,
+    Conversation.zip_code,
+    Conversation.full_name,
+    Conversation.email,
+    Conversation.license_type,
+    Conversation.license_status,
+)
+APPLICATION_VEHICLE_COLUMNS = (
+    Vehicle.vin,
+    Vehicle.year,
+    Vehicle.make,
+    Vehicle.body_type,
+    Vehicle.vehicle_use,
+    Vehicle.blind_spot_warning,
+    Vehicle.days_per_week,
+    Vehicle.one_way_miles,
+    Vehicle.annual_mileage,
+)
+
+
+def completed_applications(since: Optional[datetime] = None) -> Select:
+    """
+    Completed conversations joined to their vehicles, one row per vehicle
+    (one row of NULL vehicle columns for a conversation without any),
+    ordered by (updated_at, id) so an export can resume from an updated_at
+    watermark (see export.ApplicationExport for the overlap it re-reads).
+    Rows of one conversation are adjacent, in vehicle order.
+    """
+    query = (
+        select(
+            Conversation.id,
+            *APPLICATION_COLUMNS,
+            Vehicle.id.label("vehicle_id"),
+            *APPLICATION_VEHICLE_COLUMNS
+        )
+        .outerjoin(Vehicle, Vehicle.conversation_id == Conversation.id)
+        .where(Conversation.current_state == ConversationState.COMPLETE.value)
+    )
+    if since:
+        query = query.where(Conversation.updated_at > since)
+    return query.order_by(Conversation.updated_at, Conversation.id, Vehicle.id)
@@ -0,0 +1,109 @@
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import Select, create_engine, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import migrate
+from models import Conversation, Message, Vehicle
+import queries
+
+
+SAMPLE_SESSION = "00000000-0000-0000-0000-000000000000"
+SAMPLE_TIME = datetime(2024, 1, 1)
+
+# Hot queries as the app issues them
+HOT_QUERIES: Dict[str, Callable[[], Select]] = {
+    "conversation by session": lambda: queries.conversation_by_session(SAMPLE_SESSION),
+    "conversation with transcript": lambda: queries.conversation_by_session(SAMPLE_SESSION, with_messages=True),
+    "recent messages": lambda: queries.recent_messages(1, 10),
+    "conversation list": lambda: queries.conversation_page(50),
+    "conversation list, next page": lambda: queries.conversation_page(50, cursor=(SAMPLE_TIME, 1)),
+    "conversation list by state": lambda: queries.conversation_page(50, state="complete"),
+    "conversation list by state, next page": lambda: queries.conversation_page(
+        50, cursor=(SAMPLE_TIME, 1), state="complete"
+    ),
+    "conversation list by date range": lambda: queries.conversation_page(
+        50, created_after=datetime(2023, 1, 1), created_before=SAMPLE_TIME
+    ),
+    "completed applications export": lambda: queries.completed_applications(),
+    "completed applications export since watermark": lambda: queries.completed_applications(since=SAMPLE_TIME),
+}
+
+# A table read start to finish, or rows sorted outside an index
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+def _seed(session: Session):
+    """One conversation with a message and a vehicle, so child loads run."""
+    session.add(Conversation(
+        session_id=SAMPLE_SESSION,
+        created_at=SAMPLE_TIME,
+        messages=[Message(role="assistant", content="Hi")],
+        vehicles=[Vehicle(vin="1HGCM82633A004352")]
+    ))
+    session.commit()
+
+
+def _statements(connection: Connection, query: Select) -> List[Tuple[str, tuple]]:
+    """Run a query and return every SQL statement it issued (selectin loads included)."""
+    statements: List[Tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        with Session(bind=connection) as session:
+            session.execute(query).all()
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+    return statements
+
+
+def _problems(plan: List[str]) -> List[str]:
+    problems = []
+    for detail in plan:
+        scan = FULL_SCAN.match(detail)
+        if scan:
+            problems.append(f"full scan of {scan.group(1)}")
+        elif TEMP_SORT in detail:
+            problems.append(f"sort without an index ({detail})")
+    return problems
+
+
+def check_query_plans() -> List[Dict[str, object]]:
+    """
+    Migrate a scratch SQLite database to head and EXPLAIN every statement
+    the hot queries issue. Returns one report per statement; any entry with
+    problems means a hot path lost its index.
+    """
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    reports = []
+    try:
+        with engine.begin() as connection:
+            migrate(connection)
+        with engine.connect() as connection:
+            with Session(bind=connection) as session:
+                _seed(session)
+            for name, build in HOT_QUERIES.items():
+                for statement, parameters in _statements(connection, build()):
+                    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    plan = [row[-1] for row in rows]
+                    reports.append({
+                        "query": name,
+                        "sql": " ".join(statement.split()),
+                        "plan": plan,
+                        "problems": _problems(plan),
+                    })
+    finally:
+        engine.dispose()
+        os.remove(path)
+    return reports
@@ -51,6 +51,25 @@ class ConversationResponse(BaseModel):
         from_attributes = True
 
 
+class ConversationSummary(BaseModel):
+    session_id: str
+    current_state: str
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    vehicles_count: int
+    messages_count: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ConversationPage(BaseModel):
+    conversations: List[ConversationSummary]
+    next_cursor: Optional[str] = None
+
+
 class ChatRequest(BaseModel):
     session_id: str
     message: str
@@ -62,3 +81,21 @@ class ChatResponse(BaseModel):
     current_state: str
     is_complete: bool
 
+
+
+class IngestRowResult(BaseModel):
+    row: int
+    status: str  # complete, incomplete or failed
+    session_id: Optional[str] = None
+    current_state: Optional[str] = None
+    field: Optional[str] = None
+    error: Optional[str] = None
+
+
+class IngestReport(BaseModel):
+    rows: int
+    complete: int
+    incomplete: int
+    failed: int
+    seconds: float
+    results: List[IngestRowResult]
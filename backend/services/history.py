@@ -0,0 +1,55 @@
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from queries import recent_messages
+
+
+# Rough average for English chat text; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+# Chat format overhead per message (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt tokens for one chat message."""
+    return MESSAGE_OVERHEAD_TOKENS + -(-len(text) // CHARS_PER_TOKEN)
+
+
+class HistoryProvider:
+    """
+    Recent chat history for LLM prompts. Reads the last `window` messages
+    with one ordered, limited query on (conversation_id, id), so the cost
+    of a turn doesn't grow with the length of the transcript. With a token
+    budget, the oldest of those are dropped until the rest fit.
+    """
+
+    def __init__(
+        self,
+        window: int = config.HISTORY_WINDOW,
+        token_budget: int = config.HISTORY_TOKEN_BUDGET
+    ):
+        self.window = window
+        self.token_budget = token_budget
+
+    async def recent(self, db: AsyncSession, conversation_id: int) -> List[Dict[str, str]]:
+        """Persisted messages of a conversation, oldest first."""
+        if self.window <= 0:
+            return []
+        result = await db.execute(recent_messages(conversation_id, self.window))
+        history = [{"role": row.role, "content": row.content or ""} for row in reversed(result.all())]
+        return self.trim(history)
+
+    def trim(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Keep the newest messages that fit the token budget (0 = no budget)."""
+        if self.token_budget <= 0:
+            return history
+        used = 0
+        start = len(history)
+        while start > 0:
+            used += estimate_tokens(history[start - 1]["content"])
+            if used > self.token_budget:
+                break
+            start -= 1
+        return history[start:]
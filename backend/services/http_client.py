@@ -0,0 +1,66 @@
+import httpx
+from typing import Dict
+
+import config
+from services.metrics import InstrumentedTransport
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# Per-upstream client settings: base URL and default request timeout
+UPSTREAMS = {
+    "nhtsa": {"base_url": "https://vpic.nhtsa.dot.gov/api/vehicles", "timeout": 10.0},
+    "zenquotes": {"base_url": "https://zenquotes.io/api", "timeout": 5.0},
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    upstream = UPSTREAMS[name]
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(
+        limits=limits,
+        http2=config.HTTP2_ENABLED and HTTP2_AVAILABLE,
+    )
+    return httpx.AsyncClient(
+        base_url=upstream["base_url"],
+        timeout=upstream["timeout"],
+        # Request timings and failures are exported on /metrics
+        transport=InstrumentedTransport(transport, name),
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """
+    Return the shared pooled client for an upstream.
+    Clients are normally opened in the app lifespan; one is created lazily
+    if a service is used outside the app (scripts, REPL).
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+async def open_clients():
+    """Create one pooled client per upstream."""
+    for name in UPSTREAMS:
+        get_client(name)
+
+
+async def close_clients():
+    """Close all pooled clients, draining their keep-alive connections."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
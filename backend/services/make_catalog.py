@@ -0,0 +1,176 @@
+import asyncio
+import re
+import time
+from urllib.parse import quote
+from typing import Dict, Optional, Tuple
+
+import config
+from services.http_client import get_client
+from services.vpic_snapshot import get_snapshot
+
+
+# vPIC model-year coverage is only reliable from the 17-character VIN era on
+MIN_INDEXED_YEAR = 1981
+
+
+class MakeCatalog:
+    """
+    In-memory index of vehicle makes from NHTSA vPIC.
+    Loaded at startup, refreshed in the background on a TTL, and looked up
+    without any network call on the hot path. Whether a make has models in
+    a given year is fetched on first use, waiting at most
+    `year_lookup_timeout` seconds, and remembered.
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.MAKE_CATALOG_TTL,
+        retry_after: float = 30.0,
+        year_lookup_timeout: float = config.MAKE_YEAR_LOOKUP_TIMEOUT
+    ):
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.year_lookup_timeout = year_lookup_timeout
+        # normalized make -> display name
+        self._makes: Dict[str, str] = {}
+        # normalized make -> {model year: has models that year}
+        self._years: Dict[str, Dict[int, bool]] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # (normalized make, year) -> fetch in flight, shared by concurrent lookups
+        self._year_tasks: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    @staticmethod
+    def normalize(make: str) -> str:
+        """Uppercase and drop punctuation/whitespace ("Mercedes-Benz" == "MERCEDES BENZ")."""
+        return re.sub(r'[^A-Z0-9]', '', make.upper())
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._makes)
+
+    async def _fetch_makes(self) -> Dict[str, str]:
+        # Prefer the offline vPIC snapshot; the live API is only a fallback
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            makes = snapshot.makes()
+            if makes:
+                return makes
+
+        client = get_client("nhtsa")
+        makes: Dict[str, str] = {}
+
+        response = await client.get("/GetAllMakes?format=json")
+        response.raise_for_status()
+        for r in response.json().get("Results", []):
+            name = (r.get("Make_Name") or "").strip()
+            if name:
+                makes[self.normalize(name)] = name
+
+        # Passenger-car makes win on normalization collisions
+        response = await client.get("/GetMakesForVehicleType/car?format=json")
+        response.raise_for_status()
+        for r in response.json().get("Results", []):
+            name = (r.get("MakeName") or "").strip()
+            if name:
+                makes[self.normalize(name)] = name
+
+        return makes
+
+    def load_makes(self, makes: Dict[str, str]):
+        """Swap in a freshly built make index."""
+        self._makes = makes
+        self._loaded_at = time.monotonic()
+
+    async def refresh(self) -> bool:
+        """Reload the make list from vPIC. Returns False if the fetch failed."""
+        try:
+            makes = await self._fetch_makes()
+        except Exception:
+            return False
+        if not makes:
+            return False
+        self.load_makes(makes)
+        return True
+
+    async def _refresh_loop(self, loaded: bool):
+        while True:
+            await asyncio.sleep(self.ttl if loaded else self.retry_after)
+            loaded = await self.refresh()
+
+    async def start(self):
+        """
+        Load the catalog, then keep it fresh in the background. If the first
+        load fails it is retried every `retry_after` seconds; until then
+        makes can't be verified.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            loaded = await self.refresh()
+            self._refresh_task = asyncio.create_task(self._refresh_loop(loaded))
+
+    async def stop(self):
+        """Cancel the background refresh loop and any pending year lookups."""
+        tasks = list(self._year_tasks.values())
+        if self._refresh_task is not None:
+            tasks.append(self._refresh_task)
+            self._refresh_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def lookup(self, make: str) -> Optional[str]:
+        """Return the canonical make name, or None if it is unknown."""
+        return self._makes.get(self.normalize(make))
+
+    async def has_models_for_year(self, make: str, year: int) -> Optional[bool]:
+        """
+        Whether vPIC lists any models for this make in the given model year.
+        On a miss the answer is fetched, waiting at most `year_lookup_timeout`
+        seconds; None if it is still unknown (before MIN_INDEXED_YEAR, or the
+        fetch failed or is still running; a late answer is kept for next time).
+        """
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            known = snapshot.has_models_for_year(make, year)
+            if known is not None:
+                return known
+
+        key = self.normalize(make)
+        known = self._years.get(key, {}).get(year)
+        if known is not None or year < MIN_INDEXED_YEAR:
+            return known
+
+        task = self._year_tasks.get((key, year))
+        if task is None:
+            task = asyncio.create_task(self._fetch_year(key, make, year))
+            self._year_tasks[(key, year)] = task
+            task.add_done_callback(self._year_fetched)
+        try:
+            # Shielded so a timeout doesn't cancel the fetch for later lookups
+            await asyncio.wait_for(asyncio.shield(task), self.year_lookup_timeout)
+        except Exception:
+            # Timed out or failed
+            return None
+        return self._years.get(key, {}).get(year)
+
+    def _year_fetched(self, task: asyncio.Task):
+        for pending, other in list(self._year_tasks.items()):
+            if other is task:
+                del self._year_tasks[pending]
+        # A failure nobody waited for is retried on the next lookup
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_year(self, key: str, make: str, year: int):
+        response = await get_client("nhtsa").get(
+            f"/GetModelsForMakeYear/make/{quote(make)}/modelyear/{year}?format=json"
+        )
+        response.raise_for_status()
+        count = response.json().get("Count", 0)
+        self._years.setdefault(key, {})[year] = count > 0
+
+
+make_catalog = MakeCatalog()
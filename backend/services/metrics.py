@@ -0,0 +1,223 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A minimal counter/histogram registry rather than the prometheus_client
+package: everything runs on the event loop, so there is no locking, and
+recording a value is a dict lookup and a bisect.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+TURN_SECONDS = registry.register(Histogram(
+    "chatbot_turn_seconds",
+    "Chat turn duration, by the state answered and the turn outcome.",
+    ("state", "outcome"),
+))
+SPAN_SECONDS = registry.register(Histogram(
+    "chatbot_turn_span_seconds",
+    "Time spent in each part of a chat turn.",
+    ("span", "state", "outcome"),
+))
+UPSTREAM_SECONDS = registry.register(Histogram(
+    "chatbot_upstream_request_seconds",
+    "External API request duration (NHTSA, ZenQuotes, OpenAI).",
+    ("upstream",),
+))
+UPSTREAM_ERRORS = registry.register(Counter(
+    "chatbot_upstream_errors_total",
+    "Failed external API requests, by kind (timeout, rate_limited, http_error, error).",
+    ("upstream", "kind"),
+))
+LLM_TOKENS = registry.register(Counter(
+    "chatbot_llm_tokens_total",
+    "OpenAI token usage reported by completions, by purpose and kind (prompt, completion).",
+    ("purpose", "kind"),
+))
+
+
+def record_llm_usage(purpose: str, usage: Any):
+    """Count the tokens from a completion's `usage`, if it has one."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, purpose=purpose, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, purpose=purpose, kind="completion")
+
+
+class TurnTimer:
+    """
+    Span timings of one chat turn. Spans are kept until the turn ends, when
+    its outcome is known, and then recorded with the state and outcome.
+    """
+
+    __slots__ = ("state", "outcome", "started", "spans")
+
+    def __init__(self, state: str):
+        self.state = state
+        self.outcome: Optional[str] = None
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, time.perf_counter() - started))
+
+    def add(self, name: str, seconds: float):
+        self.spans.append((name, seconds))
+
+    def finish(self, outcome: Optional[str] = None):
+        outcome = outcome or self.outcome or "unknown"
+        TURN_SECONDS.observe(time.perf_counter() - self.started, state=self.state, outcome=outcome)
+        for name, seconds in self.spans:
+            SPAN_SECONDS.observe(seconds, span=name, state=self.state, outcome=outcome)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Times every request to an upstream and counts its failures."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str):
+        self.transport = transport
+        self.upstream = upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            UPSTREAM_ERRORS.inc(upstream=self.upstream, kind="timeout")
+            raise
+        except Exception:
+            UPSTREAM_ERRORS.inc(upstream=self.upstream, kind="error")
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=self.upstream)
+        if response.status_code == 429:
+            UPSTREAM_ERRORS.inc(upstream=self.upstream, kind="rate_limited")
+        elif response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(upstream=self.upstream, kind="http_error")
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
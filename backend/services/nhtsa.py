@@ -1,151 +1,172 @@
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+
+from services.http_client import get_client
+from services.make_catalog import make_catalog
+from services.vin import check_vin, NORTH_AMERICA, WMI_MANUFACTURERS
+from services.vin_cache import vin_cache
+from services.vpic_snapshot import get_snapshot
 
 
 class NHTSAService:
     """Service for validating vehicles against NHTSA API."""
     
-    BASE_URL = "https://vpic.nhtsa.dot.gov/api/vehicles"
-    
     @staticmethod
     async def decode_vin(vin: str) -> Dict[str, Any]:
         """
-        Decode a VIN using NHTSA API with multiple validation passes.
+        Decode a VIN, answering repeat lookups from the VIN result cache.
         Returns vehicle information if valid, or error info if invalid.
         
+        Structurally malformed VINs (bad characters, or a failed check digit
+        or model-year code on a North American VIN) are rejected locally
+        without any network call.
+        """
+        check = check_vin(vin)
+        if not check.valid:
+            return {"valid": False, "error": check.error}
+        
+        # Answer from the offline vPIC snapshot when configured; the live
+        # API is only used for VINs the snapshot can't decode
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            result = snapshot.decode_vin(check)
+            if result is not None:
+                return result
+        
+        result = await vin_cache.get_or_load(check.vin, NHTSAService._fetch_vin)
+        
+        # Fill gaps in the NHTSA decode from the VIN structure itself
+        if result.get("valid"):
+            if not result.get("year") and check.model_year and check.vin[0] in NORTH_AMERICA:
+                result["year"] = str(check.model_year)
+            if check.warnings:
+                result["warnings"] = check.warnings
+        return result
+    
+    @staticmethod
+    async def _fetch_vin(vin: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Decode a VIN using NHTSA API with multiple validation passes.
+        Returns (result, cacheable); transient failures are not cacheable.
+        
         NHTSA Error Codes:
         0 = No errors
         1-6 = Warnings but VIN structure is valid
         7+ = Invalid VIN format
-        
-        Note: We don't validate checksums locally because not all manufacturers
-        follow the standard strictly, and NHTSA accepts VINs without valid checksums.
         """
         # Use DecodeVinValues for better validation
-        url = f"{NHTSAService.BASE_URL}/DecodeVinValues/{vin}?format=json"
+        url = f"/DecodeVinValues/{vin}?format=json"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get("Results", [])
-                
-                if not results:
-                    return {
-                        "valid": False,
-                        "error": "Could not decode VIN. Please verify it's correct."
-                    }
-                
-                # Extract data from results
-                result_data = results[0] if results else {}
-                
-                # Get error code and convert to int safely
-                error_code_raw = result_data.get("ErrorCode", "0")
-                try:
-                    error_code = int(str(error_code_raw).strip()) if error_code_raw else 0
-                except (ValueError, TypeError):
-                    error_code = 0
-                
-                # Extract vehicle information
-                make = result_data.get("Make")
-                model = result_data.get("Model")
-                year = result_data.get("ModelYear")
-                body_class = result_data.get("BodyClass")
-                
-                # Error codes 0-6 are acceptable (0 = perfect, 1-6 = warnings but valid)
-                # Error codes 7+ indicate invalid VIN structure
-                if error_code >= 7:
-                    error_text = result_data.get("ErrorText", "Invalid VIN format")
-                    return {
-                        "valid": False,
-                        "error": f"Invalid VIN: {error_text}"
-                    }
-                
-                # Must have at least a make to be considered valid
-                if not make or make.strip() == "":
-                    return {
-                        "valid": False,
-                        "error": "Could not decode VIN. Please verify it's correct."
-                    }
-                
-                # Additional validation: reject if make seems like a manufacturer code (contains +)
-                # or if it's obviously not a consumer vehicle
-                suspicious_makes = ["SHERMAN + REILLY", "INCOMPLETE", "NOT APPLICABLE"]
-                if make.upper() in suspicious_makes or "+" in make:
-                    # For non-consumer vehicles, require at least a year to accept
-                    if not year or year.strip() == "":
-                        return {
-                            "valid": False,
-                            "error": "This VIN doesn't appear to be for a standard consumer vehicle."
-                        }
-                
-                # Stricter validation: For consumer vehicles, we should have at least make and year
-                # If NHTSA gives us incomplete data on what should be a normal car, it's suspicious
-                if error_code >= 1 and (not year or not model):
-                    # Warn user but don't block - could be an older vehicle
-                    pass
-                
+        client = get_client("nhtsa")
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            data = response.json()
+            
+            results = data.get("Results", [])
+            
+            if not results:
                 return {
-                    "valid": True,
-                    "make": make,
-                    "model": model,
-                    "year": year,
-                    "body_class": body_class,
-                    "error_code": error_code  # Include for debugging
-                }
-                
-            except httpx.TimeoutException:
+                    "valid": False,
+                    "error": "Could not decode VIN. Please verify it's correct."
+                }, True
+            
+            # Extract data from results
+            result_data = results[0] if results else {}
+            
+            # Get error code and convert to int safely
+            error_code_raw = result_data.get("ErrorCode", "0")
+            try:
+                error_code = int(str(error_code_raw).strip()) if error_code_raw else 0
+            except (ValueError, TypeError):
+                error_code = 0
+            
+            # Extract vehicle information
+            # Fall back to the make implied by a well-known WMI
+            make = (result_data.get("Make") or "").strip() or WMI_MANUFACTURERS.get(vin[:3])
+            model = result_data.get("Model")
+            year = result_data.get("ModelYear")
+            body_class = result_data.get("BodyClass")
+            
+            # Error codes 0-6 are acceptable (0 = perfect, 1-6 = warnings but valid)
+            # Error codes 7+ indicate invalid VIN structure
+            if error_code >= 7:
+                error_text = result_data.get("ErrorText", "Invalid VIN format")
                 return {
                     "valid": False,
-                    "error": "Vehicle verification service timed out. Please try again."
-                }
-            except Exception as e:
+                    "error": f"Invalid VIN: {error_text}"
+                }, True
+            
+            # Must have at least a make to be considered valid
+            if not make or make.strip() == "":
                 return {
                     "valid": False,
-                    "error": f"Error verifying vehicle: {str(e)}"
-                }
-    
+                    "error": "Could not decode VIN. Please verify it's correct."
+                }, True
+            
+            # Additional validation: reject if make seems like a manufacturer code (contains +)
+            # or if it's obviously not a consumer vehicle
+            suspicious_makes = ["SHERMAN + REILLY", "INCOMPLETE", "NOT APPLICABLE"]
+            if make.upper() in suspicious_makes or "+" in make:
+                # For non-consumer vehicles, require at least a year to accept
+                if not year or year.strip() == "":
+                    return {
+                        "valid": False,
+                        "error": "This VIN doesn't appear to be for a standard consumer vehicle."
+                    }, True
+            
+            # Stricter validation: For consumer vehicles, we should have at least make and year
+            # If NHTSA gives us incomplete data on what should be a normal car, it's suspicious
+            if error_code >= 1 and (not year or not model):
+                # Warn user but don't block - could be an older vehicle
+                pass
+            
+            return {
+                "valid": True,
+                "make": make,
+                "model": model,
+                "year": year,
+                "body_class": body_class,
+                "error_code": error_code  # Include for debugging
+            }, True
+            
+        except httpx.TimeoutException:
+            return {
+                "valid": False,
+                "error": "Vehicle verification service timed out. Please try again."
+            }, False
+        except Exception as e:
+            return {
+                "valid": False,
+                "error": f"Error verifying vehicle: {str(e)}"
+            }, False
+
     @staticmethod
     async def validate_year_make(year: int, make: str) -> Dict[str, Any]:
         """
-        Validate that a make exists for a given year using NHTSA API.
+        Validate that a make exists for a given year against the NHTSA make
+        catalog loaded at startup. The year is checked with a bounded vPIC
+        lookup the first time a make/year is seen.
         """
-        url = f"{NHTSAService.BASE_URL}/GetMakesForVehicleType/car?format=json"
+        if not make_catalog.is_loaded:
+            # Catalog unavailable (it is retried in the background), assume
+            # valid to not block user
+            return {"valid": True, "warning": "Could not verify make, proceeding anyway."}
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get("Results", [])
-                makes = [r.get("MakeName", "").upper() for r in results]
-                
-                if make.upper() in makes:
-                    return {"valid": True}
-                
-                # Also check against all makes
-                all_makes_url = f"{NHTSAService.BASE_URL}/GetAllMakes?format=json"
-                response = await client.get(all_makes_url, timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get("Results", [])
-                all_makes = [r.get("Make_Name", "").upper() for r in results]
-                
-                if make.upper() in all_makes:
-                    return {"valid": True}
-                
-                return {
-                    "valid": False,
-                    "error": f"'{make}' doesn't appear to be a valid vehicle make. Please check the spelling."
-                }
-                
-            except httpx.TimeoutException:
-                # On timeout, assume valid to not block user
-                return {"valid": True, "warning": "Could not verify make, proceeding anyway."}
-            except Exception:
-                return {"valid": True, "warning": "Could not verify make, proceeding anyway."}
-
+        canonical = make_catalog.lookup(make)
+        if canonical is None:
+            return {
+                "valid": False,
+                "error": f"'{make}' doesn't appear to be a valid vehicle make. Please check the spelling."
+            }
+        
+        has_models = await make_catalog.has_models_for_year(canonical, year)
+        if has_models is False:
+            return {
+                "valid": False,
+                "error": f"We couldn't find any {year} models from {canonical.title()}. Please check the year and make."
+            }
+        if has_models is None:
+            return {"valid": True, "make": canonical, "warning": f"Could not verify {year} models, proceeding anyway."}
+        
+        return {"valid": True, "make": canonical}
@@ -1,8 +1,15 @@
+import json
 import os
+import time
+import openai
 from openai import AsyncOpenAI
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator
 from dotenv import load_dotenv
 
+from intents import MATCHERS
+from services.metrics import UPSTREAM_ERRORS, UPSTREAM_SECONDS, record_llm_usage
+from services.response_cache import ResponseCache
+
 load_dotenv()
 
 
@@ -12,6 +19,8 @@ class OpenAIService:
     def __init__(self):
         self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = "gpt-4o-mini"
+        self.response_cache = ResponseCache()
+        self.frustration = MATCHERS["frustration"]
     
     def _get_system_prompt(self, current_state: str, context: Dict) -> str:
         """Generate system prompt based on current conversation state."""
@@ -62,15 +71,15 @@ CRITICAL RULES:
         
         return f"{base_prompt}\n\n=== YOUR CURRENT TASK (DO EXACTLY THIS) ===\n{state_instruction}\n===========================================\n{context_str}"
     
-    async def generate_response(
+    def _build_messages(
         self,
         current_state: str,
         user_message: str,
         conversation_history: List[Dict[str, str]],
         context: Dict,
         additional_context: Optional[str] = None
-    ) -> str:
-        """Generate a response using OpenAI."""
+    ) -> List[Dict[str, str]]:
+        """Build the chat completion messages for a turn."""
         
         system_prompt = self._get_system_prompt(current_state, context)
         
@@ -79,13 +88,73 @@ CRITICAL RULES:
         
         messages = [{"role": "system", "content": system_prompt}]
         
-        # Add recent conversation history (last 10 messages for context)
-        for msg in conversation_history[-10:]:
+        # Add recent conversation history (already windowed by HistoryProvider)
+        for msg in conversation_history:
             messages.append({"role": msg["role"], "content": msg["content"]})
         
         # Add current user message
         messages.append({"role": "user", "content": user_message})
         
+        return messages
+    
+    def _fallback_response(self, current_state: str) -> str:
+        """Fallback response if OpenAI fails."""
+        fallback_responses = {
+            "zip_code": "Could you please provide your ZIP code?",
+            "full_name": "What is your full name?",
+            "email": "What is your email address?",
+            "vehicle_choice": "Would you like to enter a VIN or provide Year, Make, and Body Type?",
+            "vehicle_vin": "Please enter the 17-character VIN.",
+            "vehicle_year": "What year is the vehicle?",
+            "vehicle_make": "What is the make of the vehicle?",
+            "vehicle_body": "What is the body type?",
+            "vehicle_use": "How do you use this vehicle? (Commuting, Commercial, Farming, Business)",
+            "blind_spot_warning": "Does this vehicle have blind spot warning? (Yes/No)",
+            "commute_days": "How many days per week do you commute?",
+            "commute_miles": "How many miles is your one-way commute?",
+            "annual_mileage": "Thank you! Now, what is your estimated annual mileage for this vehicle?",
+            "add_another_vehicle": "Would you like to add another vehicle?",
+            "license_type": "Great! Now, what type of US driver's license do you have? (Foreign, Personal, Commercial)",
+            "license_status": "What is your license status? (Valid/Suspended)",
+            "complete": "Thank you! Your information has been collected successfully. You can now start a new session if needed."
+        }
+        return fallback_responses.get(current_state, "I'm sorry, could you repeat that?")
+    
+    @staticmethod
+    def _record_error(error: Exception):
+        """Count a failed completion on /metrics."""
+        if isinstance(error, openai.APITimeoutError):
+            kind = "timeout"
+        elif isinstance(error, openai.RateLimitError):
+            kind = "rate_limited"
+        elif isinstance(error, openai.APIStatusError):
+            kind = "http_error"
+        else:
+            kind = "error"
+        UPSTREAM_ERRORS.inc(upstream="openai", kind=kind)
+    
+    async def generate_response(
+        self,
+        current_state: str,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        context: Dict,
+        additional_context: Optional[str] = None
+    ) -> str:
+        """Generate a response using OpenAI."""
+        
+        cache_key = None
+        if self.response_cache.enabled_for(current_state):
+            cache_key = self.response_cache.key(current_state, user_message, context, additional_context)
+            cached = self.response_cache.get(cache_key, user_message, context)
+            if cached is not None:
+                return cached
+        
+        messages = self._build_messages(
+            current_state, user_message, conversation_history, context, additional_context
+        )
+        
+        started = time.perf_counter()
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
@@ -93,41 +162,124 @@ CRITICAL RULES:
                 max_tokens=200,
                 temperature=0.7
             )
+            record_llm_usage("reply", getattr(response, "usage", None))
+            
+            content = response.choices[0].message.content.strip()
+            if cache_key is not None:
+                self.response_cache.put(cache_key, content, user_message, context)
+            return content
+            
+        except Exception as e:
+            self._record_error(e)
+            return self._fallback_response(current_state)
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream="openai")
+    
+    async def stream_response(
+        self,
+        current_state: str,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        context: Dict,
+        additional_context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Generate a response using OpenAI, yielding tokens as they arrive."""
+        
+        cache_key = None
+        if self.response_cache.enabled_for(current_state):
+            cache_key = self.response_cache.key(current_state, user_message, context, additional_context)
+            cached = self.response_cache.get(cache_key, user_message, context)
+            if cached is not None:
+                yield cached
+                return
+        
+        messages = self._build_messages(
+            current_state, user_message, conversation_history, context, additional_context
+        )
+        
+        started = False
+        chunks = []
+        request_started = time.perf_counter()
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=200,
+                temperature=0.7,
+                stream=True,
+                # Token usage arrives in a final chunk without choices
+                stream_options={"include_usage": True}
+            )
             
-            return response.choices[0].message.content.strip()
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    record_llm_usage("reply", chunk.usage)
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    # Drop leading whitespace like generate_response's strip()
+                    if not started:
+                        content = content.lstrip()
+                        if not content:
+                            continue
+                        started = True
+                    chunks.append(content)
+                    yield content
             
+            if cache_key is not None and chunks:
+                self.response_cache.put(cache_key, "".join(chunks).strip(), user_message, context)
+            
+        except Exception as e:
+            self._record_error(e)
+            # Only fall back if nothing was sent yet; a partial reply stands
+            if not started:
+                yield self._fallback_response(current_state)
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - request_started, upstream="openai")
+    
+    async def extract_fields(self, message: str, fields: Dict[str, str]) -> Dict[str, str]:
+        """
+        Extract the described fields from a message with a JSON-mode
+        completion. Returns only the fields found; {} if the call fails.
+        """
+        
+        field_list = "\n".join(f"- {name}: {description}" for name, description in fields.items())
+        prompt = (
+            "Extract these fields from the user's message if they are present:\n"
+            f"{field_list}\n\n"
+            "Reply with a JSON object mapping field names to the values as written "
+            "by the user. Leave out fields that are not in the message; do not guess."
+        )
+        
+        started = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": message}
+                ],
+                max_tokens=200,
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+            record_llm_usage("extract", getattr(response, "usage", None))
+            data = json.loads(response.choices[0].message.content)
         except Exception as e:
-            # Fallback response if OpenAI fails
-            fallback_responses = {
-                "zip_code": "Could you please provide your ZIP code?",
-                "full_name": "What is your full name?",
-                "email": "What is your email address?",
-                "vehicle_choice": "Would you like to enter a VIN or provide Year, Make, and Body Type?",
-                "vehicle_vin": "Please enter the 17-character VIN.",
-                "vehicle_year": "What year is the vehicle?",
-                "vehicle_make": "What is the make of the vehicle?",
-                "vehicle_body": "What is the body type?",
-                "vehicle_use": "How do you use this vehicle? (Commuting, Commercial, Farming, Business)",
-                "blind_spot_warning": "Does this vehicle have blind spot warning? (Yes/No)",
-                "commute_days": "How many days per week do you commute?",
-                "commute_miles": "How many miles is your one-way commute?",
-                "annual_mileage": "Thank you! Now, what is your estimated annual mileage for this vehicle?",
-                "add_another_vehicle": "Would you like to add another vehicle?",
-                "license_type": "Great! Now, what type of US driver's license do you have? (Foreign, Personal, Commercial)",
-                "license_status": "What is your license status? (Valid/Suspended)",
-                "complete": "Thank you! Your information has been collected successfully. You can now start a new session if needed."
-            }
-            return fallback_responses.get(current_state, "I'm sorry, could you repeat that?")
+            self._record_error(e)
+            return {}
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream="openai")
+        
+        if not isinstance(data, dict):
+            return {}
+        return {
+            name: str(value) for name, value in data.items()
+            if name in fields and value not in (None, "")
+        }
     
     async def check_frustration(self, message: str) -> bool:
         """Check if user message indicates frustration."""
-        frustration_keywords = [
-            "frustrated", "angry", "annoyed", "speak to human", "talk to someone",
-            "real person", "agent", "representative", "this is ridiculous",
-            "hate this", "stupid", "useless", "waste of time", "give up",
-            "help me", "not working", "doesn't work", "broken"
-        ]
-        
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in frustration_keywords)
+        return self.frustration.matches(message)
 
@@ -0,0 +1,140 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional
+
+import config
+
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+NUMBER_PATTERN = re.compile(r'\d[\d,]*\d|\d')
+QUOTED_PATTERN = re.compile(r"'[^']*'")
+SLOT_MARKER = re.compile(r'⟦(\w+)⟧')
+
+# Values shorter than this stay literal in keys and responses: swapping a
+# "5" out of a reply would also rewrite unrelated text like "1-5"
+MIN_SLOT_LENGTH = 3
+
+
+def _slots(user_message: str, context: Dict[str, Any]) -> Dict[str, str]:
+    """
+    User-specific values for a turn, by slot name. Context values come first
+    so a ZIP typed by the user is named "zip_code", not "input_number0".
+    """
+    slots: Dict[str, str] = {}
+    full_name = context.get("full_name")
+    if full_name:
+        slots["full_name"] = str(full_name).title()
+        slots["first_name"] = str(full_name).split()[0].title()
+    for name in ("email", "zip_code"):
+        if context.get(name):
+            slots[name] = str(context[name])
+    for i, email in enumerate(EMAIL_PATTERN.findall(user_message)):
+        slots[f"input_email{i}"] = email
+    for i, number in enumerate(NUMBER_PATTERN.findall(user_message)):
+        slots[f"input_number{i}"] = number
+
+    unique: Dict[str, str] = {}
+    seen = set()
+    for name, value in slots.items():
+        if len(value) >= MIN_SLOT_LENGTH and value.lower() not in seen:
+            seen.add(value.lower())
+            unique[name] = value
+    return unique
+
+
+def _replace_slots(text: str, slots: Dict[str, str], marker: str) -> str:
+    """Replace slot values in text (longest first, case-insensitive, whole words)."""
+    for name, value in sorted(slots.items(), key=lambda s: -len(s[1])):
+        pattern = re.compile(r'(?<!\w)' + re.escape(value) + r'(?!\w)', re.IGNORECASE)
+        text = pattern.sub(marker.format(name=name), text)
+    return text
+
+
+class ResponseCache:
+    """
+    LRU cache of generated replies keyed on (state, validity, error class,
+    normalized prompt digest). User-specific values are stored as slots and
+    refilled from the current session on a hit, so no PII crosses sessions;
+    context the prompt shows that can't be a slot (vehicles_count,
+    license_type, ...) is part of the key. Only states that opt in are cached.
+    """
+
+    def __init__(
+        self,
+        max_size: int = config.RESPONSE_CACHE_SIZE,
+        states: FrozenSet[str] = config.RESPONSE_CACHE_STATES
+    ):
+        self.max_size = max_size
+        self.states = states
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.hits_by_state: Dict[str, int] = {}
+
+    def enabled_for(self, state: str) -> bool:
+        return "*" in self.states or state in self.states
+
+    def key(
+        self,
+        current_state: str,
+        user_message: str,
+        context: Dict[str, Any],
+        additional_context: Optional[str] = None
+    ) -> str:
+        slots = _slots(user_message, context)
+        message = _replace_slots(user_message.strip(), slots, "<{name}>")
+        message = " ".join(message.lower().split())
+        validity = "invalid" if additional_context else "valid"
+        # Error text sometimes quotes the input back; the input is already in the digest
+        error_class = QUOTED_PATTERN.sub("'…'", additional_context or "")
+        error_class = _replace_slots(error_class, slots, "<{name}>")
+        # A reply may repeat any context value; those not refilled as slots
+        # must match exactly
+        facts = "\x1e".join(sorted(f"{name}={value}" for name, value in context.items() if name not in slots))
+        digest = hashlib.sha1(f"{message}\x1f{error_class}\x1f{facts}".encode()).hexdigest()
+        return f"{current_state}:{validity}:{digest}"
+
+    def get(self, key: str, user_message: str, context: Dict[str, Any]) -> Optional[str]:
+        """Return the cached reply with this session's values filled in."""
+        template = self._entries.get(key)
+        if template is None:
+            self.misses += 1
+            return None
+
+        slots = _slots(user_message, context)
+        missing = [name for name in SLOT_MARKER.findall(template) if name not in slots]
+        if missing:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        state = key.split(":", 1)[0]
+        self.hits_by_state[state] = self.hits_by_state.get(state, 0) + 1
+        return SLOT_MARKER.sub(lambda m: slots[m.group(1)], template)
+
+    def put(self, key: str, response: str, user_message: str, context: Dict[str, Any]):
+        """Store a reply with this session's values replaced by slots."""
+        slots = _slots(user_message, context)
+        self._entries[key] = _replace_slots(response, slots, "⟦{name}⟧")
+        self._entries.move_to_end(key)
+        self.stores += 1
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "hits_by_state": dict(self.hits_by_state),
+        }
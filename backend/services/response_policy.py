@@ -0,0 +1,148 @@
+import json
+import string
+from typing import Any, Dict, Optional
+
+import config
+
+
+# Turn outcomes a policy rule can match on
+VALID = "valid"                 # input accepted, state advanced
+INVALID = "invalid"             # input rejected with a validation error
+UNRECOGNIZED = "unrecognized"   # input not understood, no specific error
+QUESTION = "question"           # user asked something free-form
+OUTCOMES = (VALID, INVALID, UNRECOGNIZED, QUESTION)
+
+TEMPLATE = "template"
+LLM = "llm"
+
+DEFAULT_RULES = {
+    "*": {VALID: TEMPLATE, INVALID: LLM, UNRECOGNIZED: LLM, QUESTION: LLM},
+}
+
+# Templates by outcome, then by the state being asked after the turn
+DEFAULT_TEMPLATES = {
+    VALID: {
+        "full_name": "Thanks! What is your full name?",
+        "email": "Nice to meet you, {first_name}! What is your email address?",
+        "vehicle_choice": "Got it. Now let's add your vehicle. Would you like to provide the VIN, or enter the Year, Make, and Body Type?",
+        "vehicle_vin": "Sure. Please enter the vehicle's 17-character VIN.",
+        "vehicle_year": "No problem. What year is the vehicle?",
+        "vehicle_make": "Thanks. What is the vehicle's make (e.g., Toyota, Ford, Honda)?",
+        "vehicle_body": "Got it. What is the vehicle's body type (e.g., Sedan, SUV, Truck, Coupe)?",
+        "vehicle_use": "Great, I have the vehicle details. How do you use this vehicle? (Commuting, Commercial, Farming, or Business)",
+        "blind_spot_warning": "Thanks. Does this vehicle have blind spot warning equipment? (Yes/No)",
+        "commute_days": "Got it. How many days per week do you use this vehicle for commuting?",
+        "commute_miles": "Thanks. How many miles is your one-way commute to work or school?",
+        "annual_mileage": "Thanks. What is your estimated annual mileage for this vehicle?",
+        "add_another_vehicle": "That vehicle is all set. Would you like to add another vehicle to your policy?",
+        "license_type": "Now a quick question about you. What type of US driver's license do you have? (Foreign, Personal, or Commercial)",
+        "license_status": "Thanks. What is your license status? (Valid or Suspended)",
+        "complete": "Thank you, {first_name}! Your information has been collected successfully.",
+    },
+    INVALID: {
+        "*": "{error}",
+    },
+    UNRECOGNIZED: {
+        "vehicle_choice": "Would you like to provide the VIN, or enter the Year, Make, and Body Type?",
+    },
+}
+
+
+_formatter = string.Formatter()
+
+
+def _fill(template: str, params: Dict[str, Any]) -> Optional[str]:
+    """Format a template, or None if a placeholder it uses has no value."""
+    values = {}
+    for _, name, _, _ in _formatter.parse(template):
+        if name is None:
+            continue
+        value = params.get(name)
+        if value is None or value == "":
+            return None
+        values[name] = value
+    return template.format_map(values).strip() or None
+
+
+class ResponsePolicy:
+    """
+    Decides, per state and turn outcome, whether a reply comes from a
+    parameterized template or from the LLM.
+    Rules are keyed by the state the user was answering ("*" = any state);
+    templates by the state being asked after the turn.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Dict[str, Dict[str, str]]] = None,
+        templates: Optional[Dict[str, Dict[str, str]]] = None
+    ):
+        self.rules = {state: dict(r) for state, r in DEFAULT_RULES.items()}
+        for state, r in (rules or {}).items():
+            self.rules.setdefault(state, {}).update(r)
+        self.templates = {outcome: dict(t) for outcome, t in DEFAULT_TEMPLATES.items()}
+        for outcome, t in (templates or {}).items():
+            self.templates.setdefault(outcome, {}).update(t)
+        self.template_turns = 0
+        self.llm_turns = 0
+
+    @classmethod
+    def from_config(cls) -> "ResponsePolicy":
+        """Load overrides from RESPONSE_POLICY_PATH ({"rules": ..., "templates": ...})."""
+        if not config.RESPONSE_POLICY_PATH:
+            return cls()
+        with open(config.RESPONSE_POLICY_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(rules=data.get("rules"), templates=data.get("templates"))
+
+    @staticmethod
+    def classify(accepted: bool, error: Optional[str], user_message: str) -> str:
+        """Classify a turn's outcome."""
+        if "?" in user_message:
+            return QUESTION
+        if accepted:
+            return VALID
+        return INVALID if error else UNRECOGNIZED
+
+    def _rule(self, state: str, outcome: str) -> str:
+        for key in (state, "*"):
+            action = self.rules.get(key, {}).get(outcome)
+            if action:
+                return action
+        return LLM
+
+    def _template(self, state: str, outcome: str) -> Optional[str]:
+        templates = self.templates.get(outcome, {})
+        return templates.get(state, templates.get("*"))
+
+    def render(
+        self,
+        answered_state: str,
+        next_state: str,
+        outcome: str,
+        params: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Return the templated reply, or None if this turn should go to the LLM
+        (by rule, because no template covers it, or because a value the
+        template needs is missing).
+        """
+        response = None
+        if self._rule(answered_state, outcome) == TEMPLATE:
+            template = self._template(next_state, outcome)
+            if template:
+                response = _fill(template, params)
+
+        if response is None:
+            self.llm_turns += 1
+        else:
+            self.template_turns += 1
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        turns = self.template_turns + self.llm_turns
+        return {
+            "template_turns": self.template_turns,
+            "llm_turns": self.llm_turns,
+            "template_ratio": round(self.template_turns / turns, 4) if turns else 0.0,
+        }
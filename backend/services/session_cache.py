@@ -0,0 +1,548 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from database import SessionLocal
+from models import Conversation, ConversationState, Message, WriteBehindCheckpoint
+from queries import conversation_by_session, recent_messages
+from services.history import HistoryProvider
+
+
+CONVERSATION_FIELDS = ("current_state", "zip_code", "full_name", "email", "license_type", "license_status")
+VEHICLE_FIELDS = (
+    "vin", "year", "make", "body_type", "vehicle_use", "blind_spot_warning",
+    "days_per_week", "one_way_miles", "annual_mileage", "created_at",
+)
+CHECKPOINT_NAME = "session_journal"
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class VehicleState:
+    """A vehicle of a resident session (same attributes as models.Vehicle)."""
+
+    __slots__ = VEHICLE_FIELDS
+
+    def __init__(self, **values: Any):
+        for name in VEHICLE_FIELDS:
+            setattr(self, name, values.get(name))
+        if self.created_at is None:
+            self.created_at = datetime.utcnow()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in VEHICLE_FIELDS}
+
+
+class SessionState:
+    """
+    Resident state of an active conversation. Has the attributes the
+    conversation engine reads on models.Conversation, so turns run against
+    it unchanged, plus a ring buffer of recent messages for prompts.
+    """
+
+    __slots__ = CONVERSATION_FIELDS + ("session_id", "created_at", "vehicles", "history", "lock", "last_access", "pending")
+
+    def __init__(self, session_id: str, history_window: int, created_at: Optional[datetime] = None):
+        for name in CONVERSATION_FIELDS:
+            setattr(self, name, None)
+        self.current_state = ConversationState.ZIP_CODE.value
+        self.session_id = session_id
+        self.created_at = created_at or datetime.utcnow()
+        self.vehicles: List[VehicleState] = []
+        self.history: Deque[Dict[str, str]] = deque(maxlen=history_window)
+        self.lock = asyncio.Lock()
+        self.last_access = time.monotonic()
+        self.pending = 0  # journaled turns not yet in the database
+
+    @classmethod
+    def from_model(
+        cls,
+        conversation: Conversation,
+        history: List[Dict[str, str]],
+        history_window: int
+    ) -> "SessionState":
+        state = cls(conversation.session_id, history_window, conversation.created_at)
+        for name in CONVERSATION_FIELDS:
+            setattr(state, name, getattr(conversation, name))
+        state.vehicles = [
+            VehicleState(**{name: getattr(vehicle, name) for name in VEHICLE_FIELDS})
+            for vehicle in conversation.vehicles
+        ]
+        state.history.extend(history)
+        return state
+
+    def add_vehicle(self) -> VehicleState:
+        """Start a new vehicle on this conversation."""
+        vehicle = VehicleState()
+        self.vehicles.append(vehicle)
+        return vehicle
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "fields": {name: getattr(self, name) for name in CONVERSATION_FIELDS},
+            "vehicles": [vehicle.to_dict() for vehicle in self.vehicles],
+        }
+
+    def restore(self, snapshot: Dict[str, Any]):
+        for name, value in snapshot["fields"].items():
+            setattr(self, name, value)
+        self.vehicles = [VehicleState(**values) for values in snapshot["vehicles"]]
+
+
+class Journal:
+    """
+    Append-only JSON-lines file of committed turns. Concurrent turns share
+    fsyncs: one fsync covers every record written before it started.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._syncing: Optional[asyncio.Future] = None
+
+    def open(self) -> List[Dict[str, Any]]:
+        """Open for appending and return the records already in the file."""
+        records = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Torn final write from a crash; that turn was never acknowledged
+                        break
+        self._file = open(self.path, "a", encoding="utf-8")
+        return records
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    async def append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._written += 1
+        if self.fsync:
+            await self._sync(self._written)
+        else:
+            self._file.flush()
+
+    async def _sync(self, target: int):
+        while self._synced < target:
+            if self._syncing is None:
+                self._syncing = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._syncing)
+
+    async def _fsync(self):
+        upto = self._written
+        try:
+            self._file.flush()
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+            self._synced = upto
+        finally:
+            self._syncing = None
+
+    def truncate(self):
+        """Drop every record (all of them are in the database)."""
+        self._file.flush()
+        self._file.truncate(0)
+        self._file.seek(0)
+
+
+class CachedTurn:
+    """
+    One chat turn on a resident session. Changes are made in memory under
+    the session's lock; on success they are journaled and queued for the
+    database, on failure the session is restored to where it was.
+    """
+
+    def __init__(self, cache: "SessionCache", state: SessionState):
+        self.cache = cache
+        self.state = state
+        self._messages: List[Dict[str, Any]] = []
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+    async def __aenter__(self) -> "CachedTurn":
+        await self.state.lock.acquire()
+        self._snapshot = self.state.snapshot()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self.cache.commit(self.state, self._messages)
+            else:
+                self.state.restore(self._snapshot)
+        except BaseException:
+            # Not journaled, so not committed
+            self.state.restore(self._snapshot)
+            raise
+        finally:
+            self.state.lock.release()
+
+    def add_message(self, role: str, content: str):
+        self._messages.append({"role": role, "content": content, "timestamp": _timestamp(datetime.utcnow())})
+
+    async def history(self) -> List[Dict[str, str]]:
+        """Prior messages from the ring buffer (this turn's are added on commit)."""
+        return self.cache.history.trim(list(self.state.history))
+
+
+class SessionCache:
+    """
+    Active conversations held in memory so turns don't read the database.
+    Committed turns go to a durable journal, then a background writer
+    applies them to the database in batches; the database stays the system
+    of record and is caught up from the journal on startup. Idle sessions
+    are evicted once their writes have landed. A turn the database keeps
+    rejecting is set aside after `max_attempts` so it can't hold up the
+    turns behind it.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = config.SESSION_CACHE_IDLE_TTL,
+        journal_path: str = config.SESSION_JOURNAL_PATH,
+        fsync: bool = config.SESSION_JOURNAL_FSYNC,
+        write_delay: float = config.SESSION_WRITE_BEHIND_DELAY,
+        batch_size: int = config.SESSION_WRITE_BEHIND_BATCH,
+        max_attempts: int = config.SESSION_WRITE_MAX_ATTEMPTS,
+        rejected_path: str = config.SESSION_REJECTED_PATH,
+        history: Optional[HistoryProvider] = None
+    ):
+        self.idle_ttl = idle_ttl
+        self.write_delay = write_delay
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.rejected_path = rejected_path
+        self.history = history or HistoryProvider()
+        self.journal = Journal(journal_path, fsync) if journal_path else None
+        self._sessions: Dict[str, SessionState] = {}
+        self._queue: Deque[Dict[str, Any]] = deque()
+        # Queued records whose journal write hasn't finished; the writer stops at the first
+        self._journaling: Set[int] = set()
+        self._attempts: Dict[int, int] = {}
+        # Seqs already in the rejected file, so a replayed record isn't added twice
+        self._rejected_seqs: Set[int] = set()
+        self._seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._drain_lock: Optional[asyncio.Lock] = None
+        self._tasks: List[asyncio.Task] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.records_written = 0
+        self.batches_written = 0
+        self.replayed = 0
+        self.write_errors = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    async def open(self):
+        """Apply any journaled turns the database is missing, then start the writer."""
+        self._wakeup = asyncio.Event()
+        self._drain_lock = asyncio.Lock()
+        self._rejected_seqs = self._read_rejected()
+        if self.journal:
+            records = self.journal.open()
+            applied = await self._applied_seq()
+            self._seq = max([applied] + [record["seq"] for record in records])
+            self._queue.extend(record for record in records if record["seq"] > applied)
+            self.replayed = len(self._queue)
+            while True:
+                try:
+                    await self.flush()
+                    break
+                except OperationalError:
+                    raise
+                except Exception:
+                    # Retried until the record at fault is set aside
+                    continue
+            self.journal.truncate()
+        self._tasks = [
+            asyncio.create_task(self._write_loop()),
+            asyncio.create_task(self._evict_loop()),
+        ]
+
+    async def close(self):
+        """Stop the background tasks and write everything still queued."""
+        # Under the drain lock, so a batch being written isn't cancelled
+        # halfway through its transaction
+        async with self._drain_lock:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+        if self.journal:
+            self.journal.close()
+
+    def create(self, session_id: str) -> SessionState:
+        """A new conversation; it reaches the database with its first turn."""
+        state = SessionState(session_id, self.history.window)
+        self._sessions[session_id] = state
+        return state
+
+    async def get(self, db: AsyncSession, session_id: str) -> Optional[SessionState]:
+        """The resident session, loaded from the database on a miss (None if unknown)."""
+        state = self._sessions.get(session_id)
+        if state is not None:
+            self.hits += 1
+            state.last_access = time.monotonic()
+            return state
+
+        self.misses += 1
+        result = await db.execute(conversation_by_session(session_id))
+        conversation = result.scalars().first()
+        if conversation is None:
+            return None
+        result = await db.execute(recent_messages(conversation.id, self.history.window))
+        history = [{"role": row.role, "content": row.content or ""} for row in reversed(result.all())]
+        state = SessionState.from_model(conversation, history, self.history.window)
+        # Another request may have loaded it while this one waited on the database
+        return self._sessions.setdefault(session_id, state)
+
+    def begin(self, state: SessionState) -> CachedTurn:
+        return CachedTurn(self, state)
+
+    async def commit(self, state: SessionState, messages: List[Dict[str, Any]]):
+        """Journal a turn, then let the writer take it. Raises if the journal write fails."""
+        self._seq += 1
+        record = {
+            "seq": self._seq,
+            "session_id": state.session_id,
+            "created_at": _timestamp(state.created_at),
+            "updated_at": _timestamp(datetime.utcnow()),
+            "conversation": {name: getattr(state, name) for name in CONVERSATION_FIELDS},
+            "vehicles": [
+                {**vehicle.to_dict(), "created_at": _timestamp(vehicle.created_at)}
+                for vehicle in state.vehicles
+            ],
+            "messages": messages,
+        }
+        # Queued now to keep seq order, but held back from the writer until durable
+        self._queue.append(record)
+        if self.journal:
+            self._journaling.add(record["seq"])
+            try:
+                await self.journal.append(record)
+            except BaseException:
+                self._queue.remove(record)
+                raise
+            finally:
+                self._journaling.discard(record["seq"])
+        state.pending += 1
+        state.history.extend({"role": m["role"], "content": m["content"]} for m in messages)
+        state.last_access = time.monotonic()
+        self._wakeup.set()
+
+    async def flush(self):
+        """Write every journaled turn to the database now."""
+        async with self._drain_lock:
+            while True:
+                batch = self._ready()
+                if not batch:
+                    break
+                try:
+                    await self._apply(batch)
+                except OperationalError:
+                    # Database unavailable or locked: keep everything for the next pass
+                    raise
+                except Exception:
+                    # Find the record at fault by writing them one at a time, in order
+                    for record in batch:
+                        await self._apply_one(record)
+                    continue
+                self._written(batch)
+            if self.journal and not self._queue:
+                self.journal.truncate()
+
+    def _ready(self) -> List[Dict[str, Any]]:
+        """The next batch from the head of the queue, up to a record still being journaled."""
+        batch = []
+        for record in self._queue:
+            if len(batch) == self.batch_size or record["seq"] in self._journaling:
+                break
+            batch.append(record)
+        return batch
+
+    def _written(self, batch: List[Dict[str, Any]]):
+        for record in batch:
+            self._queue.popleft()
+            self._attempts.pop(record["seq"], None)
+            state = self._sessions.get(record["session_id"])
+            if state is not None:
+                state.pending -= 1
+        self.records_written += len(batch)
+        self.batches_written += 1
+
+    async def _apply_one(self, record: Dict[str, Any]):
+        """
+        Write one record on its own. If it fails `max_attempts` times it is
+        set aside in the rejected file and dropped from the queue; until
+        then the error propagates and the record is retried.
+        """
+        try:
+            await self._apply([record])
+        except OperationalError:
+            raise
+        except Exception as e:
+            attempts = self._attempts[record["seq"]] = self._attempts.get(record["seq"], 0) + 1
+            if attempts < self.max_attempts:
+                raise
+            await self._reject(record, e)
+            self._queue.popleft()
+            del self._attempts[record["seq"]]
+            state = self._sessions.get(record["session_id"])
+            if state is not None:
+                state.pending -= 1
+            return
+        self._written([record])
+
+    def _read_rejected(self) -> Set[int]:
+        seqs: Set[int] = set()
+        if self.rejected_path and os.path.exists(self.rejected_path):
+            with open(self.rejected_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        seqs.add(json.loads(line)["record"]["seq"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        return seqs
+
+    async def _reject(self, record: Dict[str, Any], error: Exception):
+        """
+        Set a record aside, then move the checkpoint past it so a journal
+        replay skips it. Safe to repeat if the checkpoint write fails.
+        """
+        self.last_error = repr(error)
+        if record["seq"] not in self._rejected_seqs:
+            if self.rejected_path:
+                with open(self.rejected_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"error": repr(error), "record": record}, separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._rejected_seqs.add(record["seq"])
+            self.rejected += 1
+        # Every earlier record is written (this one is at the head of the queue)
+        async with SessionLocal() as db:
+            await self._checkpoint(db, record["seq"])
+            await db.commit()
+
+    async def _applied_seq(self) -> int:
+        async with SessionLocal() as db:
+            checkpoint = await db.get(WriteBehindCheckpoint, CHECKPOINT_NAME)
+            return checkpoint.seq if checkpoint else 0
+
+    async def _apply(self, records: List[Dict[str, Any]]):
+        """Apply journal records to the database in one transaction."""
+        async with SessionLocal() as db:
+            conversations: Dict[str, Conversation] = {}
+            for record in records:
+                session_id = record["session_id"]
+                conversation = conversations.get(session_id)
+                if conversation is None:
+                    result = await db.execute(conversation_by_session(session_id))
+                    conversation = result.scalars().first()
+                    if conversation is None:
+                        conversation = Conversation(
+                            session_id=session_id,
+                            created_at=_datetime(record["created_at"]),
+                            messages=[],
+                            vehicles=[]
+                        )
+                        db.add(conversation)
+                    conversations[session_id] = conversation
+
+                for name, value in record["conversation"].items():
+                    setattr(conversation, name, value)
+                conversation.updated_at = _datetime(record["updated_at"])
+                # Vehicles are only ever appended and load in id order, so
+                # position identifies them
+                for i, values in enumerate(record["vehicles"]):
+                    vehicle = conversation.vehicles[i] if i < len(conversation.vehicles) else conversation.add_vehicle()
+                    for name, value in values.items():
+                        setattr(vehicle, name, _datetime(value) if name == "created_at" else value)
+                for message in record["messages"]:
+                    db.add(Message(
+                        conversation=conversation,
+                        role=message["role"],
+                        content=message["content"],
+                        timestamp=_datetime(message["timestamp"])
+                    ))
+
+            await self._checkpoint(db, records[-1]["seq"])
+            await db.commit()
+
+    @staticmethod
+    async def _checkpoint(db: AsyncSession, seq: int):
+        """Stage the seq of the last record applied."""
+        checkpoint = await db.get(WriteBehindCheckpoint, CHECKPOINT_NAME)
+        if checkpoint is None:
+            db.add(WriteBehindCheckpoint(name=CHECKPOINT_NAME, seq=seq))
+        else:
+            checkpoint.seq = seq
+
+    async def _write_loop(self):
+        failures = 0
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Let a burst of turns accumulate into one transaction; back off
+            # while writes are failing
+            await asyncio.sleep(self.write_delay * 2 ** min(failures, 6))
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                # Records stay queued and journaled; retry on the next pass
+                failures += 1
+                self.write_errors += 1
+                self.last_error = repr(e)
+                self._wakeup.set()
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(self.idle_ttl / 2, 60.0)))
+            cutoff = time.monotonic() - self.idle_ttl
+            for session_id, state in list(self._sessions.items()):
+                if state.last_access < cutoff and not state.pending and not state.lock.locked():
+                    del self._sessions[session_id]
+                    self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "queued": len(self._queue),
+            "records_written": self.records_written,
+            "batches_written": self.batches_written,
+            "replayed": self.replayed,
+            "write_errors": self.write_errors,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+session_cache = SessionCache()
@@ -0,0 +1,126 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+# ISO 3779 / 49 CFR 565 transliteration values and position weights
+TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    "A": 1, "B": 2, "C": 3, "D": 4, "E": 5, "F": 6, "G": 7, "H": 8,
+    "J": 1, "K": 2, "L": 3, "M": 4, "N": 5, "P": 7, "R": 9,
+    "S": 2, "T": 3, "U": 4, "V": 5, "W": 6, "X": 7, "Y": 8, "Z": 9,
+}
+WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+VIN_PATTERN = re.compile(r'^[A-HJ-NPR-Z0-9]{17}$')
+
+# Position 10 model-year codes, starting at 1980 (repeats every 30 years)
+YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+
+# First WMI characters for North America, where the check digit and
+# model-year code are mandatory (49 CFR 565)
+NORTH_AMERICA = frozenset("12345")
+
+# Common World Manufacturer Identifiers, used as the make when a decode
+# doesn't return one
+WMI_MANUFACTURERS = {
+    "1C3": "Chrysler", "1C4": "Chrysler", "1C6": "Ram", "1FA": "Ford", "1FM": "Ford",
+    "1FT": "Ford", "1FD": "Ford", "1G1": "Chevrolet", "1GC": "Chevrolet", "1GN": "Chevrolet",
+    "1G4": "Buick", "1G6": "Cadillac", "1GT": "GMC", "1GK": "GMC", "1HG": "Honda",
+    "1J4": "Jeep", "1N4": "Nissan", "1N6": "Nissan", "1VW": "Volkswagen", "1YV": "Mazda",
+    "1ZV": "Ford", "19U": "Acura", "19X": "Honda", "2C3": "Chrysler", "2C4": "Chrysler",
+    "2FA": "Ford", "2FM": "Ford", "2G1": "Chevrolet", "2HG": "Honda", "2HK": "Honda",
+    "2HM": "Hyundai", "2T1": "Toyota", "2T3": "Toyota", "3C4": "Chrysler", "3C6": "Ram",
+    "3FA": "Ford", "3G1": "Chevrolet", "3GN": "Chevrolet", "3HG": "Honda", "3N1": "Nissan",
+    "3VW": "Volkswagen", "4S3": "Subaru", "4S4": "Subaru", "4T1": "Toyota", "4T3": "Toyota",
+    "4JG": "Mercedes-Benz", "5FN": "Honda", "5J6": "Honda", "5N1": "Nissan", "5NP": "Hyundai",
+    "5TD": "Toyota", "5TF": "Toyota", "5UX": "BMW", "5XY": "Kia", "5YJ": "Tesla",
+    "7SA": "Tesla", "JA3": "Mitsubishi", "JF1": "Subaru", "JF2": "Subaru", "JHM": "Honda",
+    "JM1": "Mazda", "JN1": "Nissan", "JN8": "Nissan", "JT2": "Toyota", "JTD": "Toyota",
+    "JTE": "Toyota", "JTH": "Lexus", "JTJ": "Lexus", "JTM": "Toyota", "KL4": "Buick",
+    "KM8": "Hyundai", "KMH": "Hyundai", "KNA": "Kia", "KND": "Kia", "LRW": "Tesla",
+    "SAJ": "Jaguar", "SAL": "Land Rover", "SCC": "Lotus", "VF1": "Renault", "VF3": "Peugeot",
+    "WA1": "Audi", "WAU": "Audi", "WBA": "BMW", "WBS": "BMW", "WDB": "Mercedes-Benz",
+    "WDD": "Mercedes-Benz", "WMW": "MINI", "WP0": "Porsche", "WP1": "Porsche",
+    "WVG": "Volkswagen", "WVW": "Volkswagen", "YV1": "Volvo", "YV4": "Volvo",
+    "ZAM": "Maserati", "ZFF": "Ferrari", "ZHW": "Lamborghini",
+}
+
+
+@dataclass
+class VinCheck:
+    """Result of local structural VIN validation (no I/O)."""
+    vin: str
+    valid: bool
+    error: Optional[str] = None
+    warnings: List[str] = field(default_factory=list)
+    wmi: Optional[str] = None
+    manufacturer: Optional[str] = None
+    model_year: Optional[int] = None
+    check_digit_ok: Optional[bool] = None
+
+
+def compute_check_digit(vin: str) -> str:
+    """Expected position-9 check digit ('0'-'9' or 'X')."""
+    total = sum(TRANSLITERATION[c] * w for c, w in zip(vin, WEIGHTS))
+    remainder = total % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+def decode_model_year(vin: str) -> Optional[int]:
+    """
+    Decode the model year from position 10.
+    For North American passenger vehicles a numeric position 7 means the
+    1980-2009 cycle and a letter means 2010-2039.
+    """
+    index = YEAR_CODES.find(vin[9])
+    if index < 0:
+        return None
+    year = 1980 + index
+    if vin[6].isalpha():
+        year += 30
+    return year
+
+
+def check_vin(vin: str) -> VinCheck:
+    """
+    Structurally validate a VIN before any network lookup.
+    Check digit and model-year code failures reject North American VINs;
+    for other regions they are advisory warnings only.
+    """
+    vin = vin.strip().upper()
+
+    if len(vin) != 17:
+        return VinCheck(vin, False, "A VIN must be exactly 17 characters.")
+    if not VIN_PATTERN.match(vin):
+        return VinCheck(vin, False, "A VIN can only contain letters and numbers, and never I, O or Q.")
+
+    wmi = vin[:3]
+    # Low-volume manufacturers use '9' in position 3 plus positions 12-14
+    if wmi[2] == "9":
+        wmi = wmi + vin[11:14]
+    north_american = vin[0] in NORTH_AMERICA
+    check = VinCheck(
+        vin,
+        True,
+        wmi=wmi,
+        manufacturer=WMI_MANUFACTURERS.get(vin[:3]),
+    )
+
+    check.check_digit_ok = vin[8] == compute_check_digit(vin)
+    if not check.check_digit_ok:
+        if north_american:
+            check.valid = False
+            check.error = "That VIN doesn't look right (the check digit doesn't match). Please double-check it."
+            return check
+        check.warnings.append("Check digit does not match (not required outside North America).")
+
+    check.model_year = decode_model_year(vin)
+    if check.model_year is None:
+        if north_american:
+            check.valid = False
+            check.error = "That VIN doesn't look right (invalid model year code). Please double-check it."
+            return check
+        check.warnings.append("Position 10 is not a model-year code.")
+
+    return check
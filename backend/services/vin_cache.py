@@ -0,0 +1,191 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiosqlite
+
+import config
+
+
+# A loader returns the decode result and whether it may be cached
+# (timeouts and transport errors are transient and never cached).
+VinLoader = Callable[[str], Awaitable[Tuple[Dict[str, Any], bool]]]
+
+
+class VinCache:
+    """
+    Bounded LRU + TTL cache for VIN decode results.
+    Valid and invalid results expire separately, concurrent lookups for the
+    same VIN share one upstream call, and entries can optionally be backed by
+    an on-disk SQLite table so they survive restarts. The disk tier is best
+    effort: if it fails (locked, corrupt, disk full) the lookup carries on
+    from memory and the error is counted.
+    """
+
+    def __init__(
+        self,
+        max_size: int = config.VIN_CACHE_SIZE,
+        valid_ttl: float = config.VIN_CACHE_TTL,
+        invalid_ttl: float = config.VIN_CACHE_NEGATIVE_TTL,
+        db_path: Optional[str] = config.VIN_CACHE_DB_PATH or None
+    ):
+        self.max_size = max_size
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.db_path = db_path
+        # vin -> (expires_at, result)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._db: Optional[aiosqlite.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        self.last_disk_error: Optional[str] = None
+
+    @staticmethod
+    def normalize(vin: str) -> str:
+        return vin.strip().upper()
+
+    async def open(self):
+        """Open the on-disk backing store, if configured."""
+        if not self.db_path or self._db is not None:
+            return
+        try:
+            self._db = await aiosqlite.connect(self.db_path)
+            await self._db.execute("PRAGMA journal_mode=WAL")
+            await self._db.execute("PRAGMA synchronous=NORMAL")
+            await self._db.execute(
+                "CREATE TABLE IF NOT EXISTS vin_cache ("
+                "vin TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            await self._db.execute("DELETE FROM vin_cache WHERE expires_at <= ?", (time.time(),))
+            await self._db.commit()
+        except Exception as e:
+            # Run memory-only
+            self._disk_error(e)
+            await self.close()
+
+    async def close(self):
+        if self._db is not None:
+            db, self._db = self._db, None
+            try:
+                await db.close()
+            except Exception as e:
+                self._disk_error(e)
+
+    def _get_memory(self, vin: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(vin)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.time():
+            del self._entries[vin]
+            return None
+        self._entries.move_to_end(vin)
+        return result
+
+    def _put_memory(self, vin: str, result: Dict[str, Any], expires_at: float):
+        self._entries[vin] = (expires_at, result)
+        self._entries.move_to_end(vin)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_error(self, error: Exception):
+        self.disk_errors += 1
+        self.last_disk_error = repr(error)
+
+    async def _get_disk(self, vin: str) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        try:
+            async with self._db.execute(
+                "SELECT result, expires_at FROM vin_cache WHERE vin = ? AND expires_at > ?",
+                (vin, time.time())
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            result = json.loads(row[0])
+        except Exception as e:
+            # Treated as a miss
+            self._disk_error(e)
+            return None
+        self._put_memory(vin, result, row[1])
+        return result
+
+    async def _put_disk(self, vin: str, result: Dict[str, Any], expires_at: float):
+        if self._db is None:
+            return
+        try:
+            await self._db.execute(
+                "INSERT OR REPLACE INTO vin_cache (vin, result, expires_at) VALUES (?, ?, ?)",
+                (vin, json.dumps(result), expires_at)
+            )
+            await self._db.commit()
+        except Exception as e:
+            # The result is still returned and cached in memory
+            self._disk_error(e)
+
+    async def _load(self, vin: str, loader: VinLoader) -> Dict[str, Any]:
+        try:
+            result = await self._get_disk(vin)
+            if result is not None:
+                self.disk_hits += 1
+                return result
+
+            self.misses += 1
+            result, cacheable = await loader(vin)
+            if cacheable:
+                ttl = self.valid_ttl if result.get("valid") else self.invalid_ttl
+                expires_at = time.time() + ttl
+                self._put_memory(vin, result, expires_at)
+                await self._put_disk(vin, result, expires_at)
+            return result
+        finally:
+            self._inflight.pop(vin, None)
+
+    async def get_or_load(self, vin: str, loader: VinLoader) -> Dict[str, Any]:
+        """
+        Return the cached result for a VIN, calling `loader` on a miss.
+        Callers get their own copy, so mutating it never touches the cache.
+        """
+        vin = self.normalize(vin)
+
+        result = self._get_memory(vin)
+        if result is not None:
+            self.hits += 1
+            return dict(result)
+
+        task = self._inflight.get(vin)
+        if task is None:
+            task = asyncio.create_task(self._load(vin, loader))
+            self._inflight[vin] = task
+        else:
+            self.coalesced += 1
+
+        # Shield so one cancelled caller doesn't abort the shared lookup
+        return dict(await asyncio.shield(task))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "disk_errors": self.disk_errors,
+            "last_disk_error": self.last_disk_error,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+
+vin_cache = VinCache()
@@ -0,0 +1,229 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import config
+from services.vin import VinCheck
+
+
+SCHEMA = """
+CREATE TABLE wmi (
+    wmi TEXT PRIMARY KEY,
+    manufacturer TEXT,
+    make TEXT,
+    vehicle_type TEXT
+) WITHOUT ROWID;
+CREATE TABLE makes (
+    make_key TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE make_years (
+    make_key TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    PRIMARY KEY (make_key, year)
+) WITHOUT ROWID;
+CREATE TABLE patterns (
+    wmi TEXT NOT NULL,
+    vds TEXT NOT NULL,
+    year_from INTEGER NOT NULL,
+    year_to INTEGER NOT NULL,
+    wildcards INTEGER NOT NULL,
+    make TEXT,
+    model TEXT,
+    body_class TEXT
+);
+CREATE INDEX ix_patterns_wmi_year ON patterns (wmi, year_from, year_to);
+"""
+
+
+def make_key(make: str) -> str:
+    """Same normalization as MakeCatalog.normalize."""
+    return re.sub(r'[^A-Z0-9]', '', make.upper())
+
+
+def _field(row: Dict[str, Any], *names: str) -> Optional[str]:
+    """First non-empty value among vPIC's alternative column names."""
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read a vPIC dump file: CSV with a header row, a JSON array, or a saved
+    vPIC API response ({"Results": [...]}).
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("Results", [])
+        yield from data
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+
+def build_snapshot(
+    path: str,
+    wmi_files: Iterable[str] = (),
+    make_files: Iterable[str] = (),
+    pattern_files: Iterable[str] = ()
+) -> Dict[str, int]:
+    """
+    Build a snapshot database from vPIC dump files, replacing any existing one.
+
+    Expected columns (vPIC names, alternatives accepted):
+    - WMI files: WMI, Manufacturer/ManufacturerName/Name, Make/MakeName, VehicleType
+    - make files: Make_Name/MakeName/Make/Name
+    - pattern files: WMI, VDS (positions 4-8, '*' or '?' = any character,
+      [A-C] character classes allowed), FromYear/YearFrom, ToYear/YearTo,
+      Make, Model, BodyClass
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+    counts = {"wmi": 0, "makes": 0, "patterns": 0}
+
+    def add_make(name: Optional[str]):
+        if name:
+            conn.execute("INSERT OR IGNORE INTO makes VALUES (?, ?)", (make_key(name), name))
+
+    for wmi_file in wmi_files:
+        for row in read_records(wmi_file):
+            wmi = _field(row, "WMI", "Wmi")
+            if not wmi:
+                continue
+            make = _field(row, "Make", "MakeName", "Make_Name")
+            conn.execute(
+                "INSERT OR REPLACE INTO wmi VALUES (?, ?, ?, ?)",
+                (wmi.upper(), _field(row, "Manufacturer", "ManufacturerName", "Name"),
+                 make, _field(row, "VehicleType", "VehicleTypeName"))
+            )
+            add_make(make)
+            counts["wmi"] += 1
+
+    for make_file in make_files:
+        for row in read_records(make_file):
+            add_make(_field(row, "Make_Name", "MakeName", "Make", "Name"))
+            counts["makes"] += 1
+
+    for pattern_file in pattern_files:
+        for row in read_records(pattern_file):
+            wmi = _field(row, "WMI", "Wmi")
+            vds = _field(row, "VDS", "Pattern", "Keys")
+            year_from = _field(row, "FromYear", "YearFrom")
+            if not (wmi and vds and year_from):
+                continue
+            vds = vds.upper().replace("*", "?")
+            make = _field(row, "Make", "MakeName", "Make_Name")
+            year_from = int(year_from)
+            year_to = int(_field(row, "ToYear", "YearTo") or year_from)
+            conn.execute(
+                "INSERT INTO patterns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (wmi.upper(), vds, year_from, year_to, vds.count("?"),
+                 make, _field(row, "Model", "ModelName", "Model_Name"), _field(row, "BodyClass"))
+            )
+            if make:
+                add_make(make)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO make_years VALUES (?, ?)",
+                    [(make_key(make), year) for year in range(year_from, year_to + 1)]
+                )
+            counts["patterns"] += 1
+
+    counts["makes"] = conn.execute("SELECT COUNT(*) FROM makes").fetchone()[0]
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, path)
+    return counts
+
+
+class VPICSnapshot:
+    """
+    Read-only, SQLite-indexed snapshot of vPIC reference data (WMIs, makes,
+    model-year/body-class patterns). Opened memory-mapped; every lookup is an
+    indexed local query.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={config.VPIC_SNAPSHOT_MMAP_SIZE}")
+        self._conn.execute("PRAGMA query_only=ON")
+
+    def close(self):
+        self._conn.close()
+
+    def makes(self) -> Dict[str, str]:
+        """All makes as normalized key -> display name."""
+        return dict(self._conn.execute("SELECT make_key, name FROM makes"))
+
+    def has_models_for_year(self, make: str, year: int) -> Optional[bool]:
+        """None if the snapshot has no model-year data for this make."""
+        key = make_key(make)
+        known = self._conn.execute(
+            "SELECT 1 FROM make_years WHERE make_key = ? LIMIT 1", (key,)
+        ).fetchone()
+        if known is None:
+            return None
+        return self._conn.execute(
+            "SELECT 1 FROM make_years WHERE make_key = ? AND year = ?", (key, year)
+        ).fetchone() is not None
+
+    def decode_vin(self, check: VinCheck) -> Optional[Dict[str, Any]]:
+        """
+        Decode a structurally valid VIN from the snapshot.
+        Returns None when the snapshot cannot fully answer (unknown WMI, no
+        model year, or no matching pattern) so the caller can fall back.
+        """
+        wmi_row = self._conn.execute(
+            "SELECT make FROM wmi WHERE wmi IN (?, ?) ORDER BY length(wmi) DESC LIMIT 1",
+            (check.wmi, check.vin[:3])
+        ).fetchone()
+        if wmi_row is None or check.model_year is None:
+            return None
+
+        pattern = self._conn.execute(
+            "SELECT make, model, body_class FROM patterns "
+            "WHERE wmi IN (?, ?) AND year_from <= ? AND year_to >= ? AND ? GLOB vds "
+            "ORDER BY wildcards LIMIT 1",
+            (check.wmi, check.vin[:3], check.model_year, check.model_year, check.vin[3:8])
+        ).fetchone()
+        if pattern is None:
+            return None
+
+        make, model, body_class = pattern
+        return {
+            "valid": True,
+            "make": make or wmi_row[0] or check.manufacturer,
+            "model": model,
+            "year": str(check.model_year),
+            "body_class": body_class,
+            "source": "snapshot"
+        }
+
+
+_snapshot: Optional[VPICSnapshot] = None
+_snapshot_checked = False
+
+
+def get_snapshot() -> Optional[VPICSnapshot]:
+    """The configured snapshot, or None when offline mode is not set up."""
+    global _snapshot, _snapshot_checked
+    if not _snapshot_checked:
+        _snapshot_checked = True
+        path = config.VPIC_SNAPSHOT_PATH
+        if path and os.path.exists(path):
+            _snapshot = VPICSnapshot(path)
+    return _snapshot
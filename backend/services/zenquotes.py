@@ -1,30 +1,208 @@
-import httpx
-from typing import Optional
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+import config
+from services.http_client import get_client
+
+
+Quote = Tuple[str, str]
+
+# Served when the pool is empty (startup, ZenQuotes down or rate-limited)
+OFFLINE_QUOTES: Tuple[Quote, ...] = (
+    ("The journey of a thousand miles begins with one step.", "Lao Tzu"),
+    ("Nature does not hurry, yet everything is accomplished.", "Lao Tzu"),
+    ("It does not matter how slowly you go as long as you do not stop.", "Confucius"),
+    ("You have power over your mind, not outside events. Realize this, and you will find strength.", "Marcus Aurelius"),
+    ("The happiness of your life depends upon the quality of your thoughts.", "Marcus Aurelius"),
+    ("We suffer more often in imagination than in reality.", "Seneca"),
+    ("Difficulties strengthen the mind, as labor does the body.", "Seneca"),
+    ("Patience is bitter, but its fruit is sweet.", "Jean-Jacques Rousseau"),
+    ("Adopt the pace of nature: her secret is patience.", "Ralph Waldo Emerson"),
+    ("With the new day comes new strength and new thoughts.", "Eleanor Roosevelt"),
+    ("Keep your face always toward the sunshine, and shadows will fall behind you.", "Walt Whitman"),
+    ("In the middle of difficulty lies opportunity.", "Albert Einstein"),
+    ("Act as if what you do makes a difference. It does.", "William James"),
+    ("Well done is better than well said.", "Benjamin Franklin"),
+    ("Tension is who you think you should be. Relaxation is who you are.", "Chinese Proverb"),
+    ("Smooth seas do not make skillful sailors.", "African Proverb"),
+    ("Fall seven times, stand up eight.", "Japanese Proverb"),
+    ("This too shall pass.", "Persian Proverb"),
+    ("Breathe. You're going to be okay.", "Unknown"),
+    ("One small step at a time is still progress.", "Unknown"),
+)
+
+# ZenQuotes answers over-limit requests with a 200 and a notice in place of
+# quotes; those entries carry its own name as the author
+ZENQUOTES_AUTHOR = "zenquotes.io"
+
+
+def format_quote(quote: Quote) -> str:
+    return f'"{quote[0]}" - {quote[1]}'
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class QuotePool:
+    """
+    Quotes prefetched from ZenQuotes, so a frustrated user never waits on
+    the network. Quotes are drawn at random and not repeated until the pool
+    is refilled; when it drops to `low_water` a background task fetches a
+    new batch, no more often than `min_interval` and never before a 429's
+    Retry-After has passed. An empty pool falls back to OFFLINE_QUOTES.
+    """
+
+    def __init__(
+        self,
+        capacity: int = config.QUOTE_POOL_SIZE,
+        low_water: int = config.QUOTE_POOL_LOW_WATER,
+        min_interval: float = config.QUOTE_FETCH_MIN_INTERVAL,
+        max_backoff: float = 15 * 60
+    ):
+        self.capacity = capacity
+        self.low_water = low_water
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self._quotes: List[Quote] = []
+        self._wanted: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_fetch = 0.0
+        self._failures = 0
+        self.served = 0
+        self.offline_served = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.rate_limited = 0
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def take(self) -> Quote:
+        """A random quote, without any I/O."""
+        if len(self._quotes) <= self.low_water and self._wanted is not None:
+            self._wanted.set()
+        if not self._quotes:
+            self.offline_served += 1
+            return random.choice(OFFLINE_QUOTES)
+        # Swap-remove so each quote is served once per batch
+        index = random.randrange(len(self._quotes))
+        self._quotes[index], self._quotes[-1] = self._quotes[-1], self._quotes[index]
+        self.served += 1
+        return self._quotes.pop()
+
+    def add(self, quotes: List[Quote]) -> int:
+        """Add new quotes up to capacity. Returns how many were added."""
+        known = set(self._quotes)
+        added = 0
+        for quote in quotes:
+            if len(self._quotes) >= self.capacity:
+                break
+            if quote not in known:
+                known.add(quote)
+                self._quotes.append(quote)
+                added += 1
+        return added
+
+    async def refill(self) -> bool:
+        """
+        Fetch one batch from ZenQuotes. Returns False if the request failed
+        or was rate-limited; the next attempt is then pushed back.
+        """
+        self.fetches += 1
+        try:
+            response = await get_client("zenquotes").get("/quotes")
+            if response.status_code == 429:
+                self.rate_limited += 1
+                self._back_off(_retry_after(response.headers.get("Retry-After")))
+                return False
+            response.raise_for_status()
+            quotes = [
+                (item["q"].strip(), (item.get("a") or "Unknown").strip())
+                for item in response.json()
+                if isinstance(item, dict) and item.get("q") and item.get("a") != ZENQUOTES_AUTHOR
+            ]
+        except Exception:
+            self.fetch_errors += 1
+            self._back_off(None)
+            return False
+
+        if not quotes:
+            # Only the over-limit notice came back
+            self.rate_limited += 1
+            self._back_off(None)
+            return False
+        self.add(quotes)
+        self._failures = 0
+        self._next_fetch = time.monotonic() + self.min_interval
+        return True
+
+    def _back_off(self, delay: Optional[float]):
+        self._failures += 1
+        if delay is None:
+            delay = min(self.max_backoff, self.min_interval * 2 ** self._failures)
+        self._next_fetch = time.monotonic() + max(delay, self.min_interval)
+
+    async def _refill_loop(self):
+        while True:
+            await self._wanted.wait()
+            wait = self._next_fetch - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._wanted.clear()
+            await self.refill()
+            if len(self._quotes) <= self.low_water:
+                self._wanted.set()
+
+    def start(self):
+        """Start the background refill task and fetch the first batch."""
+        if self._task is None or self._task.done():
+            # Created here so it belongs to the running loop
+            self._wanted = asyncio.Event()
+            self._wanted.set()
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        """Cancel the background refill task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._quotes),
+            "served": self.served,
+            "offline_served": self.offline_served,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "rate_limited": self.rate_limited,
+        }
+
+
+quote_pool = QuotePool()
 
 
 class ZenQuotesService:
     """Service to fetch calming quotes when user is frustrated."""
-    
-    BASE_URL = "https://zenquotes.io/api/quotes"
-    
+
     @staticmethod
     async def get_quote() -> str:
         """
-        Fetch a random inspirational quote.
+        Return a random inspirational quote from the prefetched pool.
         Returns a formatted quote string.
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(ZenQuotesService.BASE_URL, timeout=5.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data and len(data) > 0:
-                    quote = data[0]
-                    return f'"{quote.get("q", "Stay positive!")}" - {quote.get("a", "Unknown")}'
-                
-                return "Take a deep breath. Everything will be okay."
-                
-            except Exception:
-                return "Take a deep breath. We're here to help you."
-
+        return format_quote(quote_pool.take())
@@ -0,0 +1,452 @@
+import re
+from dataclasses import dataclass, field as dataclass_field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from intents import MATCHERS
+from models import ConversationState as S
+from services.make_catalog import make_catalog
+
+
+# Returned by an extractor that found nothing usable in the message
+NO_MATCH = object()
+
+Validation = Tuple[bool, Any, Optional[str]]
+# (extracted value, conversation, NHTSAService) -> (is_valid, value, error)
+Validator = Callable[[Any, Any, Any], Awaitable[Validation]]
+Transition = Union[str, Callable[[Any, Any], str]]
+
+ZIP_PATTERN = re.compile(r'\b(\d{5})\b')
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+VIN_PATTERN = re.compile(r'\b([A-HJ-NPR-Z0-9]{17})\b')
+YEAR_PATTERN = re.compile(r'\b(19\d{2}|20\d{2})\b')
+DAYS_PATTERN = re.compile(r'\b([1-7])\b')
+NUMBER_PATTERN = re.compile(r'\b(\d+)\b')
+
+# Multi-field messages ("94107, Jane Doe, jane@x.com") are split into segments
+# (commas inside numbers like "12,000" don't split)
+FIELD_SEPARATOR = re.compile(r'[;\n]|,(?!\d{3}\b)')
+NAME_PREFIX = re.compile(r"^(?:my name is|name is|name:?|i am|i'm)\s+", re.IGNORECASE)
+NAME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z'.-]*(?:\s+[A-Za-z][A-Za-z'.-]*)+$")
+MAKE_PATTERN = re.compile(r"^[A-Za-z][A-Za-z -]{1,30}$")
+DAYS_WITH_UNIT_PATTERN = re.compile(r'\b([1-7])\s*days?\b', re.IGNORECASE)
+MILES_PATTERN = re.compile(r'\b(\d[\d,]*)\s*(?:miles?|mi)\b', re.IGNORECASE)
+ANNUAL_PATTERN = re.compile(r'\b(?:a|per|each|every)\s+year\b|\bannual(?:ly)?\b|\byearly\b|/\s*(?:yr|year)\b', re.IGNORECASE)
+
+MIN_YEAR = 1900
+MAX_YEAR = 2026
+BODY_TYPES = ('sedan', 'suv', 'truck', 'coupe', 'hatchback', 'van', 'wagon', 'convertible', 'minivan', 'pickup')
+
+
+def current_vehicle(conversation) -> Any:
+    """The vehicle being configured (the last one added), if any."""
+    return conversation.vehicles[-1] if conversation.vehicles else None
+
+
+def split_fields(text: str) -> List[str]:
+    """Non-empty, stripped segments of a message."""
+    return [segment.strip() for segment in FIELD_SEPARATOR.split(text) if segment.strip()]
+
+
+def choose(intent: str, values: Optional[Dict[str, Any]] = None) -> Callable[[str], Any]:
+    """
+    Extractor for a multiple-choice answer: the highest-priority label of
+    the intent set found in the text, mapped through `values` if given.
+    """
+    matcher = MATCHERS[intent]
+    values = values or {}
+
+    def extract(text: str) -> Any:
+        label = matcher.first(text)
+        return NO_MATCH if label is None else values.get(label, label)
+    return extract
+
+
+def positive_int(pattern: "re.Pattern", strip: str = "") -> Callable[[str], Any]:
+    """Extractor for the first number matched by pattern, if it is above zero."""
+    def extract(text: str) -> Any:
+        match = pattern.search(text.replace(strip, "") if strip else text)
+        if match and int(match.group(1)) > 0:
+            return int(match.group(1))
+        return NO_MATCH
+    return extract
+
+
+# --- Extractors: local, no I/O -------------------------------------------------
+
+def _any_text(text: str) -> Any:
+    return text
+
+
+def _at_least_two_chars(text: str) -> Any:
+    return text if len(text) >= 2 else NO_MATCH
+
+
+def _zip_code(text: str) -> Any:
+    match = ZIP_PATTERN.search(text)
+    return match.group(1) if match else NO_MATCH
+
+
+def _email(text: str) -> Any:
+    match = EMAIL_PATTERN.search(text)
+    return match.group(0).lower() if match else NO_MATCH
+
+
+def _vin(text: str) -> Any:
+    match = VIN_PATTERN.search(text.upper())
+    return match.group(1) if match else NO_MATCH
+
+
+_choose_vehicle_entry = choose('vehicle_choice')
+
+
+def _vehicle_choice(text: str) -> Any:
+    # A VIN typed straight away skips the VIN question
+    vin = _vin(text)
+    if vin is not NO_MATCH:
+        return {'choice': 'vin', 'vin': vin}
+    return _choose_vehicle_entry(text)
+
+
+_vehicle_use = choose('vehicle_use')
+_blind_spot_warning = choose('blind_spot_warning', {'yes': True, 'no': False})
+_add_another_vehicle = choose('add_another_vehicle', {'yes': True, 'no': False})
+_license_type = choose('license_type')
+_license_status = choose('license_status')
+
+
+def _year(text: str) -> Any:
+    match = YEAR_PATTERN.search(text)
+    if match and MIN_YEAR <= int(match.group(1)) <= MAX_YEAR:
+        return int(match.group(1))
+    return NO_MATCH
+
+
+def _body_type(text: str) -> Any:
+    lower = text.lower()
+    for body in BODY_TYPES:
+        if body in lower:
+            return body.title()
+    # Accept any reasonable input
+    return text.title() if len(text) >= 2 else NO_MATCH
+
+
+# --- Scanners: stricter extractors for one segment of a multi-field message ----
+
+def _lead_name(text: str) -> Any:
+    # Answering the name question: the prefix is optional
+    name = NAME_PREFIX.sub("", text)
+    return name if NAME_PATTERN.match(name) else NO_MATCH
+
+
+def _scan_name(text: str) -> Any:
+    # Any two words look like a name ("San Francisco", "I think"), so a
+    # name is only taken from a later segment that says it is one
+    if not NAME_PREFIX.match(text):
+        return NO_MATCH
+    name = _lead_name(text)
+    return name if name is not NO_MATCH and len(name.split()) <= 4 else NO_MATCH
+
+
+def _scan_vehicle_choice(text: str) -> Any:
+    # Only a VIN settles the choice; "vin"/"manual" answers need the question
+    vin = _vin(text)
+    return {'choice': 'vin', 'vin': vin} if vin is not NO_MATCH else NO_MATCH
+
+
+def _scan_make(text: str) -> Any:
+    # Only a make in the NHTSA catalog; free text is left for the make question
+    if not MAKE_PATTERN.match(text) or make_catalog.lookup(text) is None:
+        return NO_MATCH
+    return text
+
+
+def _scan_body_type(text: str) -> Any:
+    lower = text.lower()
+    for body in BODY_TYPES:
+        if body in lower:
+            return body.title()
+    return NO_MATCH
+
+
+def _scan_blind_spot_warning(text: str) -> Any:
+    return _blind_spot_warning(text) if 'blind' in text.lower() else NO_MATCH
+
+
+_miles = positive_int(MILES_PATTERN, strip=",")
+
+
+def _scan_commute_miles(text: str) -> Any:
+    return NO_MATCH if ANNUAL_PATTERN.search(text) else _miles(text)
+
+
+def _scan_annual_mileage(text: str) -> Any:
+    return _miles(text) if ANNUAL_PATTERN.search(text) else NO_MATCH
+
+
+# --- Validators: may call NHTSA ------------------------------------------------
+
+async def _decode_vin(vin: str, nhtsa) -> Validation:
+    result = await nhtsa.decode_vin(vin)
+    if result.get('valid'):
+        result['vin'] = vin
+        return True, result, None
+    return False, None, result.get('error', 'Invalid VIN.')
+
+
+async def _validate_vehicle_choice(value: Any, conversation, nhtsa) -> Validation:
+    if isinstance(value, dict):
+        is_valid, vin_data, error = await _decode_vin(value['vin'], nhtsa)
+        if not is_valid:
+            return False, None, error
+        return True, {'choice': 'vin', 'vin_data': vin_data}, None
+    return True, value, None
+
+
+async def _validate_vin(value: Any, conversation, nhtsa) -> Validation:
+    return await _decode_vin(value, nhtsa)
+
+
+async def _validate_make(value: Any, conversation, nhtsa) -> Validation:
+    vehicle = current_vehicle(conversation)
+    year = vehicle.year if vehicle else 2020
+    result = await nhtsa.validate_year_make(year, value)
+    if result.get('valid'):
+        return True, value.title(), None
+    return False, None, result.get('error', 'Invalid make.')
+
+
+# --- Custom savers and transitions ---------------------------------------------
+
+def _set_vin_data(vehicle, vin_data: Dict[str, Any]):
+    vehicle.vin = vin_data.get('vin')
+    vehicle.year = int(vin_data.get('year')) if vin_data.get('year') else None
+    vehicle.make = vin_data.get('make')
+    vehicle.body_type = vin_data.get('body_class')
+
+
+def _save_vehicle_choice(conversation, value: Any):
+    # Create a new vehicle entry, with the VIN data if the user gave one
+    vehicle = conversation.add_vehicle()
+    if isinstance(value, dict) and 'vin_data' in value:
+        _set_vin_data(vehicle, value['vin_data'])
+
+
+def _save_vin(conversation, value: Any):
+    vehicle = current_vehicle(conversation)
+    if vehicle and isinstance(value, dict):
+        _set_vin_data(vehicle, value)
+
+
+def _after_vehicle_choice(value: Any, conversation) -> str:
+    if isinstance(value, dict) and 'vin_data' in value:
+        return S.VEHICLE_USE.value
+    if value == 'vin':
+        return S.VEHICLE_VIN.value
+    return S.VEHICLE_YEAR.value
+
+
+def _after_blind_spot_warning(value: Any, conversation) -> str:
+    vehicle = current_vehicle(conversation)
+    if vehicle and vehicle.vehicle_use == 'commuting':
+        return S.COMMUTE_DAYS.value
+    return S.ANNUAL_MILEAGE.value
+
+
+def _after_add_another_vehicle(value: Any, conversation) -> str:
+    return S.VEHICLE_CHOICE.value if value else S.LICENSE_TYPE.value
+
+
+def _after_license_type(value: Any, conversation) -> str:
+    # Foreign licenses have no status to ask about
+    return S.COMPLETE.value if value == 'foreign' else S.LICENSE_STATUS.value
+
+
+@dataclass
+class StateSpec:
+    """
+    One state of the onboarding flow.
+
+    extract pulls a candidate value out of the message locally (NO_MATCH if
+    there is none, which fails with `error`); validate optionally checks it
+    against an external service. The accepted value is stored on `field`
+    ("name" on the conversation, "vehicle.name" on the current vehicle) or
+    by a custom `save`, and `transition` gives the next state: a state
+    name, or a function of (value, conversation) whose possible results
+    are listed in `next_states`.
+
+    For messages that answer several questions at once, `scan` is a
+    stricter extractor for one segment of the message (`lead`, if set,
+    replaces it for the first segment when this state was the question
+    asked), and `describe` tells the LLM extractor what to look for. States
+    without them are only filled when asked.
+    """
+    state: str
+    extract: Callable[[str], Any]
+    transition: Transition
+    error: Optional[str] = None
+    validate: Optional[Validator] = None
+    field: Optional[str] = None
+    save: Optional[Callable[[Any, Any], None]] = None
+    next_states: Tuple[str, ...] = ()
+    scan: Optional[Callable[[str], Any]] = None
+    lead: Optional[Callable[[str], Any]] = None
+    describe: Optional[str] = None
+    _setter: Optional[Callable[[Any, Any], None]] = dataclass_field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.save:
+            self._setter = self.save
+        elif self.field and self.field.startswith("vehicle."):
+            name = self.field.split(".", 1)[1]
+
+            def set_on_vehicle(conversation, value):
+                vehicle = current_vehicle(conversation)
+                if vehicle:
+                    setattr(vehicle, name, value)
+            self._setter = set_on_vehicle
+        elif self.field:
+            name = self.field
+            self._setter = lambda conversation, value: setattr(conversation, name, value)
+
+    @property
+    def targets(self) -> Tuple[str, ...]:
+        """Every state this one can lead to."""
+        return (self.transition,) if isinstance(self.transition, str) else self.next_states
+
+    async def parse(self, text: str, conversation, nhtsa) -> Validation:
+        """Validate the (stripped) message: (is_valid, extracted_value, error_message)."""
+        value = self.extract(text)
+        if value is NO_MATCH:
+            return False, None, self.error
+        return await self.check(value, conversation, nhtsa)
+
+    async def check(self, value: Any, conversation, nhtsa) -> Validation:
+        """Validate an already extracted value."""
+        if self.validate:
+            return await self.validate(value, conversation, nhtsa)
+        return True, value, None
+
+    def apply(self, conversation, value: Any):
+        """Stage the accepted value on the conversation."""
+        if self._setter:
+            self._setter(conversation, value)
+
+    def next_state(self, value: Any, conversation) -> str:
+        if isinstance(self.transition, str):
+            return self.transition
+        return self.transition(value, conversation)
+
+
+FLOW = (
+    StateSpec(S.ZIP_CODE.value, _zip_code, S.FULL_NAME.value,
+              error="Please provide a valid 5-digit ZIP code.", field="zip_code",
+              scan=_zip_code, describe="5-digit US ZIP code"),
+    StateSpec(S.FULL_NAME.value, _at_least_two_chars, S.EMAIL.value,
+              error="Please provide your full name.", field="full_name",
+              scan=_scan_name, lead=_lead_name, describe="the person's full name"),
+    StateSpec(S.EMAIL.value, _email, S.VEHICLE_CHOICE.value,
+              error="Please provide a valid email address.", field="email",
+              scan=_email, describe="email address"),
+    # No error: an unrecognized answer just re-asks the question
+    StateSpec(S.VEHICLE_CHOICE.value, _vehicle_choice, _after_vehicle_choice,
+              validate=_validate_vehicle_choice, save=_save_vehicle_choice,
+              next_states=(S.VEHICLE_USE.value, S.VEHICLE_VIN.value, S.VEHICLE_YEAR.value),
+              scan=_scan_vehicle_choice),
+    StateSpec(S.VEHICLE_VIN.value, _vin, S.VEHICLE_USE.value,
+              error="Please provide a valid 17-character VIN.", validate=_validate_vin, save=_save_vin,
+              scan=_vin, describe="17-character vehicle identification number (VIN)"),
+    StateSpec(S.VEHICLE_YEAR.value, _year, S.VEHICLE_MAKE.value,
+              error="Please provide a valid vehicle year (e.g., 2020).", field="vehicle.year",
+              scan=_year, describe="vehicle model year"),
+    StateSpec(S.VEHICLE_MAKE.value, _at_least_two_chars, S.VEHICLE_BODY.value,
+              error="Please provide the vehicle make.", validate=_validate_make, field="vehicle.make",
+              scan=_scan_make, describe="vehicle manufacturer (make), e.g. Toyota"),
+    StateSpec(S.VEHICLE_BODY.value, _body_type, S.VEHICLE_USE.value,
+              error="Please provide the body type (e.g., Sedan, SUV, Truck).", field="vehicle.body_type",
+              scan=_scan_body_type, describe="vehicle body type, e.g. Sedan, SUV, Truck"),
+    StateSpec(S.VEHICLE_USE.value, _vehicle_use, S.BLIND_SPOT_WARNING.value,
+              error="Please specify: Commuting, Commercial, Farming, or Business.", field="vehicle.vehicle_use",
+              scan=_vehicle_use, describe="vehicle use: commuting, commercial, farming or business"),
+    StateSpec(S.BLIND_SPOT_WARNING.value, _blind_spot_warning, _after_blind_spot_warning,
+              error="Please answer Yes or No.", field="vehicle.blind_spot_warning",
+              next_states=(S.COMMUTE_DAYS.value, S.ANNUAL_MILEAGE.value),
+              scan=_scan_blind_spot_warning, describe="whether the vehicle has blind spot warning: yes or no"),
+    StateSpec(S.COMMUTE_DAYS.value, positive_int(DAYS_PATTERN), S.COMMUTE_MILES.value,
+              error="Please provide days per week (1-7).", field="vehicle.days_per_week",
+              scan=positive_int(DAYS_WITH_UNIT_PATTERN), describe="days per week the vehicle is used for commuting"),
+    StateSpec(S.COMMUTE_MILES.value, positive_int(NUMBER_PATTERN), S.ADD_ANOTHER_VEHICLE.value,
+              error="Please provide the one-way distance in miles.", field="vehicle.one_way_miles",
+              scan=_scan_commute_miles, describe="one-way commute distance in miles"),
+    StateSpec(S.ANNUAL_MILEAGE.value, positive_int(NUMBER_PATTERN, strip=","), S.ADD_ANOTHER_VEHICLE.value,
+              error="Please provide estimated annual mileage.", field="vehicle.annual_mileage",
+              scan=_scan_annual_mileage, describe="estimated annual mileage"),
+    StateSpec(S.ADD_ANOTHER_VEHICLE.value, _add_another_vehicle, _after_add_another_vehicle,
+              error="Would you like to add another vehicle? (Yes/No)",
+              next_states=(S.VEHICLE_CHOICE.value, S.LICENSE_TYPE.value)),
+    StateSpec(S.LICENSE_TYPE.value, _license_type, _after_license_type,
+              error="Please specify: Foreign, Personal, or Commercial.", field="license_type",
+              next_states=(S.COMPLETE.value, S.LICENSE_STATUS.value),
+              scan=_license_type, describe="US driver's license type: foreign, personal or commercial"),
+    StateSpec(S.LICENSE_STATUS.value, _license_status, S.COMPLETE.value,
+              error="Please specify: Valid or Suspended.", field="license_status",
+              scan=_license_status, describe="driver's license status: valid or suspended"),
+    StateSpec(S.COMPLETE.value, _any_text, S.COMPLETE.value),
+)
+
+INITIAL_STATE = S.ZIP_CODE.value
+TERMINAL_STATES = frozenset({S.COMPLETE.value})
+
+
+def _reachable(start: Iterable[str], edges: Dict[str, Tuple[str, ...]]) -> set:
+    seen = set(start)
+    stack = list(seen)
+    while stack:
+        for target in edges.get(stack.pop(), ()):
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+def validate_flow(specs: Iterable[StateSpec], initial: str, terminal: Iterable[str]) -> Dict[str, StateSpec]:
+    """
+    Check the flow graph and return it keyed by state. Raises ValueError on
+    duplicate or missing states, transitions to unknown states, states
+    unreachable from `initial`, and dead ends that can't reach `terminal`.
+    """
+    states: Dict[str, StateSpec] = {}
+    for spec in specs:
+        if spec.state in states:
+            raise ValueError(f"State '{spec.state}' is defined twice")
+        if not spec.targets:
+            raise ValueError(f"State '{spec.state}' has a transition function but no next_states")
+        states[spec.state] = spec
+
+    terminal = set(terminal)
+    missing = ({s.value for s in S} | terminal | {initial}) - set(states)
+    if missing:
+        raise ValueError(f"No spec for states: {', '.join(sorted(missing))}")
+
+    edges = {state: spec.targets for state, spec in states.items()}
+    for state, targets in edges.items():
+        unknown = set(targets) - set(states)
+        if unknown:
+            raise ValueError(f"State '{state}' transitions to unknown states: {', '.join(sorted(unknown))}")
+
+    unreachable = set(states) - _reachable([initial], edges)
+    if unreachable:
+        raise ValueError(f"Unreachable states: {', '.join(sorted(unreachable))}")
+
+    reverse: Dict[str, Tuple[str, ...]] = {}
+    for state, targets in edges.items():
+        for target in targets:
+            reverse[target] = reverse.get(target, ()) + (state,)
+    dead_ends = set(states) - _reachable(terminal, reverse)
+    if dead_ends:
+        raise ValueError(f"States that can never complete: {', '.join(sorted(dead_ends))}")
+
+    return states
+
+
+# Compiled once at import; the app won't start with a broken flow
+STATES = validate_flow(FLOW, INITIAL_STATE, TERMINAL_STATES)
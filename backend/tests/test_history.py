@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database import Base
+from models import Conversation, Message
+from query_plans import check_query_plans
+from services.history import HistoryProvider, estimate_tokens
+
+
+def _recent(provider: HistoryProvider, contents):
+    """Store a conversation with these messages and read its history window."""
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                conversation = Conversation(
+                    session_id="test",
+                    messages=[Message(role="user", content=content) for content in contents]
+                )
+                db.add(conversation)
+                await db.commit()
+                return await provider.recent(db, conversation.id)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def test_recent_reads_only_the_last_window_oldest_first():
+    history = _recent(HistoryProvider(window=3, token_budget=0), ["m1", "m2", "m3", "m4", "m5"])
+    assert history == [{"role": "user", "content": content} for content in ("m3", "m4", "m5")]
+
+
+def test_recent_with_a_zero_window_is_empty():
+    assert _recent(HistoryProvider(window=0, token_budget=0), ["m1", "m2"]) == []
+
+
+def test_trim_keeps_the_newest_messages_within_the_token_budget():
+    history = [{"role": "user", "content": "x" * 40} for _ in range(4)] + [{"role": "user", "content": "last"}]
+    budget = estimate_tokens("x" * 40) + estimate_tokens("last")
+    assert HistoryProvider(window=10, token_budget=budget).trim(history) == history[-2:]
+    assert HistoryProvider(window=10, token_budget=0).trim(history) == history
+
+
+def test_hot_queries_use_indexes():
+    problems = [(report["query"], report["problems"]) for report in check_query_plans() if report["problems"]]
+    assert problems == []
@@ -0,0 +1,67 @@
+import asyncio
+
+from conversation_engine import ConversationEngine
+from services.make_catalog import make_catalog
+from services.session_cache import SessionState
+from state_machine import NO_MATCH, STATES, _scan_make
+
+
+def _session(state: str) -> SessionState:
+    session = SessionState(session_id="test", history_window=10)
+    session.current_state = state
+    return session
+
+
+def test_comma_inside_one_answer_is_kept(monkeypatch):
+    # The OpenAI client is created with the engine but not called here
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    engine = ConversationEngine()
+    assert ConversationEngine._leading_answer("full_name", "John Smith, Jr.") is NO_MATCH
+    is_valid, value, _ = asyncio.run(
+        engine._validate_and_extract("full_name", "John Smith, Jr.", _session("full_name"))
+    )
+    assert is_valid and value == "John Smith, Jr."
+
+
+def test_segments_split_when_the_next_one_answers_a_following_state():
+    assert ConversationEngine._leading_answer("zip_code", "94107, I'm Jane Doe, jane@x.com") == "94107"
+    assert ConversationEngine._leading_answer("full_name", "Jane Doe, jane@x.com") == "Jane Doe"
+
+
+def _fill(monkeypatch, state: str, message: str) -> SessionState:
+    """Run the multi-field prefill for a message answering `state`."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    engine = ConversationEngine()
+    session = _session(state)
+    leading = ConversationEngine._leading_answer(state, message)
+    if leading is not NO_MATCH:
+        spec = STATES[state]
+        spec.apply(session, leading)
+        session.current_state = spec.next_state(leading, session)
+        asyncio.run(engine._fill_following(state, message, session))
+    return session
+
+
+def test_zip_and_city_does_not_fill_the_name(monkeypatch):
+    assert ConversationEngine._leading_answer("zip_code", "94107, San Francisco") is NO_MATCH
+    assert ConversationEngine._leading_answer("zip_code", "94107, San Francisco, CA") is NO_MATCH
+    session = _fill(monkeypatch, "zip_code", "94107, San Francisco, CA")
+    assert session.full_name is None
+
+
+def test_zip_and_filler_phrase_does_not_fill_the_name(monkeypatch):
+    assert ConversationEngine._leading_answer("zip_code", "94107, I think") is NO_MATCH
+    assert _fill(monkeypatch, "zip_code", "94107, I think").full_name is None
+
+
+def test_name_after_zip_needs_a_prefix(monkeypatch):
+    session = _fill(monkeypatch, "zip_code", "94107, my name is Jane Doe, jane@x.com")
+    assert (session.zip_code, session.full_name, session.email) == ("94107", "Jane Doe", "jane@x.com")
+    assert session.current_state == "vehicle_choice"
+
+
+def test_make_followed_by_noise_fills_only_the_make(monkeypatch):
+    monkeypatch.setattr(make_catalog, "_makes", {"TOYOTA": "TOYOTA"})
+    assert ConversationEngine._leading_answer("vehicle_year", "2019, not sure") is NO_MATCH
+    assert ConversationEngine._leading_answer("vehicle_year", "2019, Toyota, lol") == 2019
+    assert _scan_make("Toyota") == "Toyota" and _scan_make("lol") is NO_MATCH
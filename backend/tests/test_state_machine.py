@@ -0,0 +1,39 @@
+import dataclasses
+
+import pytest
+
+from state_machine import FLOW, INITIAL_STATE, STATES, TERMINAL_STATES, validate_flow
+
+
+def _flow_with(state: str, **changes):
+    """FLOW with one state's spec changed."""
+    return [dataclasses.replace(spec, **changes) if spec.state == state else spec for spec in FLOW]
+
+
+def test_flow_is_valid():
+    assert set(validate_flow(FLOW, INITIAL_STATE, TERMINAL_STATES)) == {spec.state for spec in FLOW}
+
+
+@pytest.mark.parametrize("flow, error", [
+    (FLOW + FLOW[:1], "defined twice"),
+    ([spec for spec in FLOW if spec.state != "email"], "No spec for states: email"),
+    (_flow_with("zip_code", transition="nowhere"), "unknown states: nowhere"),
+    (_flow_with("license_status", transition="license_status"), "can never complete: license_status"),
+])
+def test_bad_flow_is_rejected(flow, error):
+    with pytest.raises(ValueError, match=error):
+        validate_flow(flow, INITIAL_STATE, TERMINAL_STATES)
+
+
+@pytest.mark.parametrize("state, text, value", [
+    # "no" outranks "yes" when a message has keywords of both
+    ("blind_spot_warning", "No, I don't have it", False),
+    ("blind_spot_warning", "Yes, it does", True),
+    ("blind_spot_warning", "It doesn't", False),
+    ("blind_spot_warning", "I know it has it, yes", True),
+    ("add_another_vehicle", "No, that's all, no more", False),
+    ("add_another_vehicle", "Yes, add another", True),
+    ("add_another_vehicle", "I'm done", False),
+])
+def test_yes_no_intent_priority(state, text, value):
+    assert STATES[state].extract(text) is value
@@ -13,6 +13,7 @@ function App() {
     currentState,
     isComplete,
     isLoading,
+    isTyping,
     error,
     startConversation,
     sendMessage,
@@ -29,7 +30,7 @@ function App() {
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
-  }, [messages, isLoading]);
+  }, [messages, isTyping]);
 
   return (
     <div className="app">
@@ -88,7 +89,7 @@ function App() {
             {messages.map((message) => (
               <ChatMessage key={message.id} message={message} />
             ))}
-            {isLoading && <TypingIndicator />}
+            {isTyping && <TypingIndicator />}
             <div ref={messagesEndRef} />
           </div>
         </div>
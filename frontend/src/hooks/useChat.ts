@@ -1,7 +1,8 @@
-import { useState, useCallback } from 'react';
-import type { Message, ChatResponse, StartConversationResponse } from '../types';
+import { useState, useCallback, useEffect, useRef } from 'react';
+import type { Message, ChatResponse, ChatSocketEvent, StartConversationResponse } from '../types';
 
 const API_BASE_URL = 'http://localhost:8000';
+const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
 
 export function useChat() {
   const [sessionId, setSessionId] = useState<string | null>(null);
@@ -9,12 +10,105 @@ export function useChat() {
   const [currentState, setCurrentState] = useState<string>('');
   const [isComplete, setIsComplete] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
+  const [isTyping, setIsTyping] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
+  // Open socket for the session once the server has bound it; null means HTTP
+  const socketRef = useRef<WebSocket | null>(null);
+  // A message sent over the socket that has no `done` yet
+  const turnPendingRef = useRef(false);
+  // Assistant message being filled in from `token` events
+  const streamingIdRef = useRef<number | null>(null);
+
+  useEffect(() => {
+    if (!sessionId || typeof WebSocket === 'undefined') return;
+
+    const socket = new WebSocket(`${WS_BASE_URL}/ws/chat/${sessionId}`);
+
+    const endTurn = () => {
+      turnPendingRef.current = false;
+      streamingIdRef.current = null;
+      setIsLoading(false);
+      setIsTyping(false);
+    };
+
+    socket.onmessage = (event: MessageEvent<string>) => {
+      const data: ChatSocketEvent = JSON.parse(event.data);
+
+      switch (data.type) {
+        case 'ready':
+          socketRef.current = socket;
+          break;
+        case 'ping':
+          socket.send(JSON.stringify({ type: 'pong' }));
+          break;
+        case 'typing':
+          setIsTyping(true);
+          break;
+        case 'token': {
+          setIsTyping(false);
+          const id = streamingIdRef.current;
+          if (id === null) {
+            const newId = Date.now() + 1;
+            streamingIdRef.current = newId;
+            setMessages(prev => [...prev, {
+              id: newId,
+              role: 'assistant',
+              content: data.text.trimStart(),
+              timestamp: new Date().toISOString(),
+            }]);
+          } else {
+            setMessages(prev => prev.map(m => m.id === id ? { ...m, content: m.content + data.text } : m));
+          }
+          break;
+        }
+        case 'done': {
+          const id = streamingIdRef.current;
+          if (id === null) {
+            setMessages(prev => [...prev, {
+              id: Date.now() + 1,
+              role: 'assistant',
+              content: data.response,
+              timestamp: new Date().toISOString(),
+            }]);
+          } else {
+            setMessages(prev => prev.map(m => m.id === id ? { ...m, content: data.response } : m));
+          }
+          setCurrentState(data.current_state);
+          setIsComplete(data.is_complete);
+          endTurn();
+          break;
+        }
+        case 'error':
+          setError(data.detail);
+          endTurn();
+          break;
+      }
+    };
+
+    socket.onclose = () => {
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+      }
+      // Later messages go over HTTP; an unanswered one may still have been saved
+      if (turnPendingRef.current) {
+        setError('Connection lost. Please send your message again.');
+        endTurn();
+      }
+    };
+
+    return () => {
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+      }
+      socket.close();
+    };
+  }, [sessionId]);
+
   const startConversation = useCallback(async () => {
     setIsLoading(true);
     setError(null);
-    
+
     try {
       const response = await fetch(`${API_BASE_URL}/api/conversation/start`, {
         method: 'POST',
@@ -28,7 +122,7 @@ export function useChat() {
       }
 
       const data: StartConversationResponse = await response.json();
-      
+
       setSessionId(data.session_id);
       setCurrentState(data.current_state);
       setMessages([{
@@ -59,6 +153,16 @@ export function useChat() {
     setIsLoading(true);
     setError(null);
 
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      // The reply arrives as socket events
+      turnPendingRef.current = true;
+      socket.send(JSON.stringify({ type: 'message', message: content.trim() }));
+      return;
+    }
+
+    setIsTyping(true);
+
     try {
       const response = await fetch(`${API_BASE_URL}/api/chat`, {
         method: 'POST',
@@ -91,6 +195,7 @@ export function useChat() {
       setError(err instanceof Error ? err.message : 'Failed to send message');
     } finally {
       setIsLoading(false);
+      setIsTyping(false);
     }
   }, [sessionId]);
 
@@ -100,6 +205,7 @@ export function useChat() {
     setCurrentState('');
     setIsComplete(false);
     setIsLoading(false);
+    setIsTyping(false);
     setError(null);
     // Automatically start a new conversation
     await startConversation();
@@ -111,10 +217,10 @@ export function useChat() {
     currentState,
     isComplete,
     isLoading,
+    isTyping,
     error,
     startConversation,
     sendMessage,
     resetChat,
   };
 }
-
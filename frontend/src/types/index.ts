@@ -18,6 +18,16 @@ export interface StartConversationResponse {
   current_state: string;
 }
 
+// Frames sent by the server over /ws/chat/{session_id}
+export type ChatSocketEvent =
+  | { type: 'ready'; session_id: string; current_state: string; is_complete: boolean }
+  | { type: 'typing' }
+  | { type: 'token'; text: string }
+  | ({ type: 'done' } & ChatResponse)
+  | { type: 'ping' }
+  | { type: 'pong' }
+  | { type: 'error'; detail: string };
+
 export interface ConversationState {
   sessionId: string | null;
   messages: Message[];